@@ -1,137 +1,189 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from models import db, Equipo, Host, Mesero, RegistroDiarioHosteo, CorteDiarioHosteo
+from flask import (Flask, Blueprint, Response, render_template, request, jsonify, redirect, url_for,
+                   abort, after_this_request, current_app, stream_with_context)
+from flask.cli import with_appcontext
+from models import (db, Equipo, Host, Mesero, RegistroDiarioHosteo, CorteDiarioHosteo, DiaArchivado,
+                    DiaMaterializado)
 from config import Config
-from datetime import datetime, date
-from sqlalchemy import func
+from datetime import datetime, date, timedelta
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
 from zoneinfo import ZoneInfo
-from flask import render_template_string
+import click
+import hashlib
+import hmac
+import importlib
+from catalogos import (configurar_caches, equipo_por_clave_lider, host_por_clave,
+                       mesero_por_clave, get_equipo, get_host, get_mesero,
+                       hosts_de_equipo, lista_meseros)
+from confirmaciones import aplicar_confirmaciones
+from contadores import contar_altas
+from credenciales import (COOKIE_MESERO, con_token_mesero, emitir_token_mesero, huella_clave,
+                          mesero_del_token, migrar_claves)
+from cortes import materializar_dias, materializar_resumenes, resumen_cortes, verificar_resumenes
+from enrutamiento import configurar_enrutamiento, solo_lectura
+from eventos import broker, publicar_registro
+from exportar import FORMATOS, exportacion, nombre_archivo, parquet_disponible
+from generador import generar_catalogos, generar_registros, solo_base_local
+from ingesta import insertar_lote
+from metrics import instrumentar, exposicion
+from plantillas import configurar_plantillas, huella_plantillas
+from versiones import marcar_fechas, version_reporte
+from rangos import serie_diaria, resumen_serie, ranking_hosts_rango, ranking_meseros_rango, cerrar_rango
+from retencion import (archivar_mes, crear_particiones, inicio_mes, meses_por_archivar, particionada,
+                       particionar_registros, siguiente_mes)
+from queries import (get_latest_fecha_equipo, get_latest_fecha_mesero,
+                     get_latest_fecha_global, get_latest_fecha_host, registros_del_dia, dia_archivado,
+                     pagina_registros, parse_cursor,
+                     ranking_hosts, ranking_meseros, resumen_desde_ranking, resumen_mesero)
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+# Views live on a blueprint so create_app() can build independent apps
+bp = Blueprint('terraza', __name__)
 
 def get_cdmx_time():
     return datetime.now(ZoneInfo("America/Mexico_City"))
 
-# NEW: helpers to pick latest date with data
-def get_latest_fecha_equipo(equipo_id):
-    return db.session.query(func.max(RegistroDiarioHosteo.fecha))\
-        .join(Host, RegistroDiarioHosteo.id_host == Host.id_host)\
-        .filter(Host.id_equipo == equipo_id).scalar()
+def resumen_reporte(fecha, ranking, equipo_id=None):
+    # Closed days read their stat cards from the materialized corte when present
+    if fecha < get_cdmx_time().date():
+        resumen = resumen_cortes(fecha, equipo_id)
+        if resumen is not None:
+            return resumen
+    return resumen_desde_ranking(ranking)
 
-def get_latest_fecha_mesero(mesero_id):
-    return db.session.query(func.max(RegistroDiarioHosteo.fecha))\
-        .filter(RegistroDiarioHosteo.id_mesero == mesero_id).scalar()
+def get_rango_param():
+    # ?fecha_inicio=&fecha_fin= ; None if absent or invalid so views keep using ?fecha=
+    try:
+        inicio = datetime.strptime(request.args.get('fecha_inicio', ''), '%Y-%m-%d').date()
+        fin = datetime.strptime(request.args.get('fecha_fin', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return (inicio, fin) if inicio <= fin else (fin, inicio)
 
-def get_latest_fecha_global():
-    return db.session.query(func.max(RegistroDiarioHosteo.fecha)).scalar()
+# Query params the paginated views read; anything else is dropped from the page links
+ARGS_PAGINACION = ('fecha', 'fecha_inicio', 'fecha_fin', 'host_id')
 
-@app.route('/')
+def pagina_actual(query):
+    # One keyset page of a registros_del_dia() query, driven by ?despues=<cursor>
+    registros, siguiente = pagina_registros(query,
+                                            parse_cursor(request.args.get('despues')),
+                                            current_app.config['REGISTROS_POR_PAGINA'])
+    # A stray param could collide with a view arg or with url_for's own (endpoint, _external...)
+    args = {k: request.args[k] for k in ARGS_PAGINACION if k in request.args}
+    paginacion = {
+        'siguiente_url': url_for(request.endpoint, **request.view_args, **args, despues=siguiente) if siguiente else None,
+        'primera_url': url_for(request.endpoint, **request.view_args, **args) if 'despues' in request.args else None,
+    }
+    return registros, paginacion
+
+def mesero_autenticado(token=None, clave=None):
+    # id of the mesero behind the request: the signed token (cookie, or `token`
+    # for API clients) is checked in-process; a clave costs one hashed lookup
+    mesero_id = mesero_del_token(token or request.cookies.get(COOKIE_MESERO))
+    if mesero_id is None:
+        mesero = mesero_por_clave((clave or '').strip())
+        mesero_id = mesero.id_mesero if mesero else None
+    return mesero_id
+
+def url_en_vivo(endpoint, fecha, **values):
+    # Live updates only make sense on today's first page
+    if fecha != get_cdmx_time().date() or 'despues' in request.args:
+        return None
+    return url_for(endpoint, **values)
+
+def condicional(desde, hasta, fija=True):
+    # ETag from the data versions of [desde, hasta]. A matching If-None-Match
+    # gets its 304 here, before any of the report queries run. `fija` is False
+    # when the URL did not pin the date (latest day with data): the same URL
+    # moves to today's page once today has data.
+    hoy = get_cdmx_time().date()
+    catalogos, datos = version_reporte(desde, hasta)
+    # hasta >= hoy is part of the key: today's page carries the live stream, tomorrow it won't
+    huella = current_app.config['HUELLA_PLANTILLAS']
+    firma = f'{huella}|{request.full_path}|{desde}|{hasta}|{hasta >= hoy}|{catalogos}|{datos}'
+    etag = hashlib.sha1(firma.encode()).hexdigest()[:20]
+
+    @after_this_request
+    def encabezados_cache(response):
+        if response.status_code in (200, 304):
+            response.set_etag(etag)
+            response.cache_control.private = True
+            if fija and hasta < hoy:
+                # Closed days only change through late confirmations; browsers revalidate after this
+                response.cache_control.max_age = current_app.config['REPORTE_MAX_AGE_PASADO']
+            else:
+                response.cache_control.no_cache = True
+        return response
+
+    if etag in request.if_none_match:
+        return Response(status=304)
+    return None
+
+def render_reporte_rango(equipo, rango, equipo_id=None):
+    hoy = get_cdmx_time().date()
+    dias = serie_diaria(*rango, hoy, equipo_id=equipo_id)
+    return render_template('reporte.html',
+                         equipo=equipo,
+                         ranking=ranking_hosts_rango(*rango, hoy, equipo_id=equipo_id),
+                         # Meseros work across equipos, so only the total report ranks them
+                         ranking_meseros=ranking_meseros_rango(*rango) if equipo_id is None else None,
+                         registros=[],
+                         paginacion={},
+                         dias=dias,
+                         rango_cerrado=rango[1] < hoy,
+                         fecha_inicio=rango[0].isoformat(),
+                         fecha_fin=rango[1].isoformat(),
+                         fecha_reporte=rango[1].isoformat(),
+                         **resumen_serie(dias))
+
+@bp.route('/')
 def index():
     # Landing page with three role buttons and prompt-based key entry
-    return render_template_string("""
-    {% extends "base.html" %}
-    {% block title %}Inicio{% endblock %}
-    {% block content %}
-    <div class="header">
-        <h1>Bienvenido</h1>
-        <p>Selecciona una opción</p>
-        <div class="no-print" style="margin-top:10px;">
-            <button class="btn" onclick="goHost()">Hosteos</button>
-            <button class="btn" onclick="goMesero()">Meseros</button>
-            <button class="btn" onclick="goReportes()">Reportes</button>
-        </div>
-    </div>
-    {% endblock %}
-    {% block scripts %}
-    <script>
-    function goHost(){
-        const clave = prompt('Clave de host');
-        if (!clave) return;
-        fetch(`/access/host?clave=${encodeURIComponent(clave)}`)
-        .then(r => r.json()).then(d => {
-            if (d.success) {
-                window.location.href = `/equipo/${d.id_equipo}?host_id=${d.id_host}`;
-            } else {
-                alert(d.error || 'Clave inválida');
-            }
-        });
-    }
-    function goMesero(){
-        const clave = prompt('Clave de mesero');
-        if (!clave) return;
-        fetch(`/access/mesero?clave=${encodeURIComponent(clave)}`)
-        .then(r => r.json()).then(d => {
-            if (d.success) {
-                const today = new Date().toISOString().split('T')[0];
-                window.location.href = `/mesero/${d.id_mesero}?fecha=${today}&clave=${encodeURIComponent(clave)}`;
-            } else {
-                alert(d.error || 'Clave inválida');
-            }
-        });
-    }
-    function goReportes(){
-        const clave = prompt('Clave de líder');
-        if (!clave) return;
-        fetch(`/access/lider?clave=${encodeURIComponent(clave)}`)
-        .then(r => r.json()).then(d => {
-            if (d.success) {
-                const today = new Date().toISOString().split('T')[0];
-                if (d.id_equipo == 777) {
-                    window.location.href = `/reporte-total?fecha=${today}`;
-                } else {
-                    window.location.href = `/reporte/${d.id_equipo}?fecha=${today}`;
-                }
-            } else {
-                alert(d.error || 'Clave inválida');
-            }
-        });
-    }
-    </script>
-    {% endblock %}
-    """)
+    return render_template('index.html')
 
-@app.route('/access/host')
+@bp.route('/access/host')
 def access_host():
     clave = request.args.get('clave', '').strip()
-    host = Host.query.filter_by(clave_host=clave).first()
+    host = host_por_clave(clave)
     if not host:
         return jsonify(success=False, error='Clave de host inválida'), 404
     return jsonify(success=True, id_equipo=host.id_equipo, id_host=host.id_host)
 
-@app.route('/access/mesero')
+@bp.route('/access/mesero')
 def access_mesero():
     clave = request.args.get('clave', '').strip()
-    mesero = Mesero.query.filter_by(clave_mesero=clave).first()
+    mesero = mesero_por_clave(clave)
     if not mesero:
         return jsonify(success=False, error='Clave de mesero inválida'), 404
-    return jsonify(success=True, id_mesero=mesero.id_mesero)
+    # From here on the mesero's pages and confirmations carry the token, not the clave
+    return con_token_mesero(jsonify(success=True, id_mesero=mesero.id_mesero,
+                                    token=emitir_token_mesero(mesero.id_mesero)),
+                            mesero.id_mesero)
 
-@app.route('/access/lider')
+@bp.route('/access/lider')
 def access_lider():
     clave = request.args.get('clave', '').strip()
-    equipo = Equipo.query.filter_by(clave_lider=clave).first()
+    equipo = equipo_por_clave_lider(clave)
     if not equipo:
         return jsonify(success=False, error='Clave de líder inválida'), 404
     return jsonify(success=True, id_equipo=equipo.id_equipo)
 
-@app.route('/equipo/<int:equipo_id>', methods=['GET', 'POST'])
+@bp.route('/equipo/<int:equipo_id>', methods=['GET', 'POST'])
 def equipo_form(equipo_id):
-    equipo = Equipo.query.get_or_404(equipo_id)
-    hosts = Host.query.filter_by(id_equipo=equipo_id).all()
-    meseros = Mesero.query.all()
+    equipo = get_equipo(equipo_id) or abort(404)
+    hosts = hosts_de_equipo(equipo_id)
+    meseros = lista_meseros()
     locked_host_id = request.args.get('host_id', type=int)
-    locked_host = Host.query.get(locked_host_id) if locked_host_id else None
+    locked_host = get_host(locked_host_id) if locked_host_id else None
     if locked_host and locked_host.id_equipo != equipo_id:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     if request.method == 'POST':
         # Enforce locked host if present
         id_host = locked_host.id_host if locked_host else request.form.get('id_host')
         # Validate host belongs to equipo
-        host_obj = Host.query.get_or_404(int(id_host))
+        host_obj = get_host(int(id_host)) or abort(404)
         if host_obj.id_equipo != equipo_id:
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         registro = RegistroDiarioHosteo(
             id_host=id_host,
             numero_personas=request.form.get('numero_personas'),
@@ -139,46 +191,115 @@ def equipo_form(equipo_id):
             confirmada=False
         )
         db.session.add(registro)
+        contar_altas([registro])
+        marcar_fechas([registro.fecha])
         db.session.commit()
-        return redirect(url_for('equipo_form', equipo_id=equipo_id, host_id=locked_host_id) if locked_host_id else url_for('equipo_form', equipo_id=equipo_id))
+        publicar_registro(registro)
+        return redirect(url_for('.equipo_form', equipo_id=equipo_id, host_id=locked_host_id) if locked_host_id else url_for('.equipo_form', equipo_id=equipo_id))
     
     # Registros del día
     hoy = get_cdmx_time().date()
-    registros = RegistroDiarioHosteo.query.join(Host).filter(
-        Host.id_equipo == equipo_id,
-        RegistroDiarioHosteo.fecha == hoy
-    ).order_by(RegistroDiarioHosteo.hora.desc()).all()
+    registros, paginacion = pagina_actual(registros_del_dia(hoy, equipo_id=equipo_id))
     
     return render_template('equipo.html', 
                          equipo=equipo, 
                          hosts=hosts, 
                          meseros=meseros,
                          registros=registros,
+                         paginacion=paginacion,
+                         stream_url=url_en_vivo('.stream_equipo', hoy, equipo_id=equipo_id),
+                         fecha_reporte=hoy.isoformat(),
                          locked_host=locked_host)
 
-@app.route('/api/confirmar/<int:registro_id>', methods=['POST'])
+@bp.route('/api/equipo/<int:equipo_id>/registros', methods=['POST'])
+def ingesta_registros(equipo_id):
+    # Bulk insert from host tablets: {host_id?, registros: [{clave_idempotencia,
+    # id_host, id_mesero, numero_personas, registrado_en}, ...]}
+    get_equipo(equipo_id) or abort(404)
+    data = request.get_json() or {}
+    registros = data.get('registros')
+    if (not isinstance(registros, list) or len(registros) > current_app.config['MAX_REGISTROS_POR_LOTE']
+            or not all(isinstance(r, dict) for r in registros)):
+        return jsonify({'success': False, 'error': 'Lote inválido'}), 400
+    locked_host_id = data.get('host_id')
+    if locked_host_id:
+        # Same rule as the form: a locked tablet only registers for its host
+        registros = [dict(r, id_host=locked_host_id) for r in registros]
+
+    resultados, nuevos = insertar_lote(equipo_id, registros, get_cdmx_time(),
+                                       timedelta(hours=current_app.config['INGESTA_MAX_ANTIGUEDAD_HORAS']))
+    db.session.commit()
+    for registro in nuevos:
+        publicar_registro(registro)
+    return jsonify({'success': True,
+                    'resultados': [dict(clave_idempotencia=clave, **r) for clave, r in resultados.items()]})
+
+@bp.route('/api/confirmar/<int:registro_id>', methods=['POST'])
 def confirmar_registro(registro_id):
-    registro = RegistroDiarioHosteo.query.get_or_404(registro_id)
     data = request.get_json() or {}
-    # Enforce: only assigned mesero with valid clave can confirm
-    mesero_clave = data.get('mesero_clave')
-    mesero = Mesero.query.filter_by(clave_mesero=mesero_clave).first()
-    if not mesero or mesero.id_mesero != registro.id_mesero:
+    # Enforce: only the assigned mesero (token or clave) can confirm
+    mesero_id = mesero_autenticado(data.get('token'), data.get('mesero_clave'))
+    if mesero_id is None:
+        RegistroDiarioHosteo.query.get_or_404(registro_id)
         return jsonify({'success': False, 'error': 'No autorizado'}), 403
-    registro.confirmada = data.get('confirmada', False)
+    confirmada = data.get('confirmada', False)
+    if not isinstance(confirmada, bool):
+        # "false" or 0 must not confirm a mesa by truthiness
+        return jsonify({'success': False, 'error': 'confirmada debe ser true o false'}), 400
+    resultados, cambiados = aplicar_confirmaciones(mesero_id, [(registro_id, confirmada)], get_cdmx_time().date())
+    resultado = resultados[registro_id]
+    if not resultado['success']:
+        if resultado['status'] == 404:
+            abort(404)
+        return jsonify({'success': False, 'error': resultado['error']}), resultado['status']
     db.session.commit()
-    return jsonify({'success': True, 'confirmada': registro.confirmada})
+    for registro in cambiados:
+        publicar_registro(registro, 'confirmacion')
+    return jsonify({'success': True, 'confirmada': resultado['confirmada']})
 
-@app.route('/mesero/<int:mesero_id>')
+@bp.route('/api/confirmar', methods=['POST'])
+def confirmar_lote():
+    # Bulk version: {confirmaciones: [{id_registro_hosteo, confirmada}, ...]} plus
+    # the token cookie, or `token` / `mesero_clave` in the body
+    data = request.get_json() or {}
+    mesero_id = mesero_autenticado(data.get('token'), data.get('mesero_clave'))
+    if mesero_id is None:
+        return jsonify({'success': False, 'error': 'No autorizado'}), 403
+    confirmaciones = data.get('confirmaciones')
+    if not isinstance(confirmaciones, list) or len(confirmaciones) > current_app.config['MAX_CONFIRMACIONES_POR_LOTE']:
+        return jsonify({'success': False, 'error': 'Lote inválido'}), 400
+    try:
+        pares = [(int(c['id_registro_hosteo']), c.get('confirmada', False)) for c in confirmaciones]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Lote inválido'}), 400
+    if not all(isinstance(confirmada, bool) for _, confirmada in pares):
+        return jsonify({'success': False, 'error': 'confirmada debe ser true o false'}), 400
+
+    resultados, cambiados = aplicar_confirmaciones(mesero_id, pares, get_cdmx_time().date())
+    db.session.commit()
+    for registro in cambiados:
+        publicar_registro(registro, 'confirmacion')
+    return jsonify({'success': True,
+                    'resultados': [dict(id_registro_hosteo=id_registro,
+                                        **{k: v for k, v in r.items() if k != 'status'})
+                                   for id_registro, r in resultados.items()]})
+
+@bp.route('/mesero/<int:mesero_id>')
 def vista_mesero(mesero_id):
-    # Require clave param to view
-    clave = request.args.get('clave', '').strip()
-    mesero = Mesero.query.get_or_404(mesero_id)
-    if not mesero.clave_mesero or mesero.clave_mesero != clave:
-        return "No autorizado", 403
+    mesero = get_mesero(mesero_id) or abort(404)
+    if mesero_del_token(request.cookies.get(COOKIE_MESERO)) != mesero_id:
+        # Old links carry ?clave=: trade it once for the token cookie and drop it from the URL
+        autenticado = mesero_por_clave(request.args.get('clave', '').strip())
+        if not autenticado or autenticado.id_mesero != mesero_id:
+            return "No autorizado", 403
+        args = {k: v for k, v in request.args.items() if k != 'clave'}
+        return con_token_mesero(redirect(url_for('.vista_mesero', mesero_id=mesero_id, **args)), mesero_id)
 
+    rango = get_rango_param()
     fecha_param = request.args.get('fecha')
-    if fecha_param:
+    if rango:
+        fecha_reporte = rango[1]
+    elif fecha_param:
         try:
             fecha_reporte = datetime.strptime(fecha_param, '%Y-%m-%d').date()
         except:
@@ -188,258 +309,559 @@ def vista_mesero(mesero_id):
         # default to latest date with data for this mesero
         fecha_reporte = get_latest_fecha_mesero(mesero_id) or get_cdmx_time().date()
 
-    registros = RegistroDiarioHosteo.query.filter(
-        RegistroDiarioHosteo.id_mesero == mesero_id,
-        RegistroDiarioHosteo.fecha == fecha_reporte
-    ).order_by(RegistroDiarioHosteo.hora.desc()).all()
-
-    total_hosteos = len(registros)
-    confirmados = sum(1 for r in registros if r.confirmada)
-    no_confirmados = total_hosteos - confirmados
-    total_personas = sum(r.numero_personas for r in registros)
-    personas_confirmadas = sum(r.numero_personas for r in registros if r.confirmada)
-
-    # Render lightweight view reusing table UX
-    return render_template_string("""
-    {% extends "base.html" %}
-    {% block title %}Mesero {{ mesero.nombre_mesero }}{% endblock %}
-    {% block content %}
-    <div class="breadcrumb no-print"><a href="{{ url_for('index') }}">← Inicio</a></div>
-    <div class="header">
-        <h1>Registros de Hoy - Mesero {{ mesero.nombre_mesero }}</h1>
-        <p>Fecha: {{ fecha_reporte }}</p>
-    </div>
-    <div class="form-card no-print">
-        <div class="fecha-selector">
-            <label for="fecha-input">Selecciona una fecha:</label>
-            <input type="date" id="fecha-input" value="{{ fecha_reporte }}">
-            <button onclick="filtrarPorFecha()">🔍 Filtrar</button>
-            <button onclick="irAHoy()" class="btn btn-hoy">📅 Ir a Hoy</button>
-        </div>
-    </div>
-    <div class="stats-grid">
-        <div class="stat-card"><div class="stat-label">👥 Total Personas</div><div class="stat-value">{{ total_personas }}</div></div>
-        <div class="stat-card"><div class="stat-label">✅ Personas Confirmadas</div><div class="stat-value">{{ personas_confirmadas }}</div></div>
-        <div class="stat-card"><div class="stat-label">🍽️ Total Mesas</div><div class="stat-value">{{ total_hosteos }}</div></div>
-        <div class="stat-card"><div class="stat-label">✅ Mesas Confirmadas</div><div class="stat-value">{{ confirmados }}</div></div>
-        <div class="stat-card"><div class="stat-label">❌ Mesas No Confirmadas</div><div class="stat-value">{{ no_confirmados }}</div></div>
-    </div>
-    <div class="form-card">
-        <h2>Registros del Mesero</h2>
-        {% if registros %}
-        <div class="table-wrapper">
-            <table>
-                <thead><tr>
-                    <th>Hora</th>
-                    <th>Equipo</th>
-                    <th>Host</th>
-                    <th>Personas</th>
-                    <th>Confirmado</th>
-                </tr></thead>
-                <tbody>
-                {% for r in registros %}
-                    <tr>
-                        <td>{{ r.hora.strftime('%H:%M') }}</td>
-                        <td>{{ r.host.equipo.id_equipo if r.host and r.host.equipo else 'N/D' }}</td>
-                        <td>{{ r.host.nombre_host if r.host else 'N/D' }}</td>
-                        <td>{{ r.numero_personas }}</td>
-                        <td>
-                            <button type="button" class="status-btn" data-registro-id="{{ r.id_registro_hosteo }}" onclick="toggleConfirmacion(this)">
-                                <span class="{% if r.confirmada %}confirmada{% else %}no-confirmada{% endif %}">
-                                    {% if r.confirmada %}✅{% else %}❌{% endif %}
-                                </span>
-                            </button>
-                        </td>
-                    </tr>
-                {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        {% else %}
-        <p style="text-align:center;color:#999;padding:20px;">Sin registros para esta fecha</p>
-        {% endif %}
-    </div>
-    {% endblock %}
-    {% block scripts %}
-    <script>
-    function filtrarPorFecha(){
-        const fecha = document.getElementById('fecha-input').value;
-        const clave = encodeURIComponent('{{ clave }}');
-        window.location.href = `/mesero/{{ mesero.id_mesero }}?fecha=${fecha}&clave=${clave}`;
-    }
-    function irAHoy(){
-        const today = new Date().toISOString().split('T')[0];
-        const clave = encodeURIComponent('{{ clave }}');
-        window.location.href = `/mesero/{{ mesero.id_mesero }}?fecha=${today}&clave=${clave}`;
-    }
-    function toggleConfirmacion(btn){
-        const registroId = btn.dataset.registroId;
-        const span = btn.querySelector('span');
-        const isConfirmada = span.classList.contains('confirmada');
-        const nuevaConfirmacion = !isConfirmada;
-        fetch(`/api/confirmar/${encodeURIComponent(registroId)}`, {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({confirmada: nuevaConfirmacion, mesero_clave: '{{ clave }}'})
-        })
-        .then(r=>r.json())
-        .then(data=>{
-            if (data.success) {
-                span.textContent = data.confirmada ? '✅' : '❌';
-                span.className = data.confirmada ? 'confirmada' : 'no-confirmada';
-            } else {
-                alert(data.error || 'No autorizado');
-            }
-        })
-        .catch(err=>console.error('Error confirmación:', err));
-    }
-    </script>
-    {% endblock %}
-    """, mesero=mesero, registros=registros,
-       total_hosteos=total_hosteos, confirmados=confirmados,
-       no_confirmados=no_confirmados, total_personas=total_personas,
-       personas_confirmadas=personas_confirmadas, fecha_reporte=fecha_reporte.isoformat(),
-       clave=clave)
-
-@app.route('/reporte/<int:equipo_id>')
+    if rango:
+        registros, paginacion = [], {}
+        dias = serie_diaria(*rango, get_cdmx_time().date(), mesero_id=mesero_id)
+        resumen = resumen_serie(dias)
+    else:
+        registros, paginacion = pagina_actual(registros_del_dia(fecha_reporte, mesero_id=mesero_id))
+        dias = []
+        resumen = resumen_mesero(fecha_reporte, mesero_id)
+
+    return render_template('mesero.html',
+                         mesero=mesero,
+                         registros=registros,
+                         dias=dias,
+                         rango_cerrado=bool(rango) and rango[1] < get_cdmx_time().date(),
+                         paginacion=paginacion,
+                         archivado=not rango and not registros and dia_archivado(fecha_reporte),
+                         fecha_reporte=fecha_reporte.isoformat(),
+                         fecha_inicio=rango[0].isoformat() if rango else None,
+                         fecha_fin=rango[1].isoformat() if rango else None,
+                         **resumen)
+
+@bp.route('/api/tendencia')
+@solo_lectura
+def tendencia():
+    # JSON daily series for charts: ambito = total | equipo | host | mesero
+    rango = get_rango_param()
+    if not rango:
+        return jsonify(success=False, error='fecha_inicio y fecha_fin son requeridas (AAAA-MM-DD)'), 400
+    ambito = request.args.get('ambito', 'total')
+    id_ = request.args.get('id', type=int)
+    if ambito not in ('total', 'equipo', 'host', 'mesero') or (ambito != 'total' and id_ is None):
+        return jsonify(success=False, error='ámbito inválido'), 400
+    if ambito == 'mesero':
+        # Same rule as vista_mesero: a mesero only sees their own numbers
+        get_mesero(id_) or abort(404)
+        if mesero_autenticado(request.args.get('token'), request.args.get('clave')) != id_:
+            return jsonify(success=False, error='No autorizado'), 403
+
+    filtro = {} if ambito == 'total' else {f'{ambito}_id': id_}
+    dias = serie_diaria(*rango, get_cdmx_time().date(), **filtro)
+    return jsonify(success=True,
+                   fecha_inicio=rango[0].isoformat(),
+                   fecha_fin=rango[1].isoformat(),
+                   resumen=resumen_serie(dias),
+                   serie=[dict(d, fecha=d['fecha'].isoformat()) for d in dias])
+
+@bp.route('/exportar/<any(registros, cortes):tipo>')
+@solo_lectura
+def exportar(tipo):
+    # Streamed download for accounting: ?fecha_inicio=&fecha_fin= (or ?fecha=), optional ?equipo= and ?formato=
+    rango = get_rango_param()
+    if not rango:
+        try:
+            fecha = datetime.strptime(request.args.get('fecha', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify(success=False, error='fecha o fecha_inicio y fecha_fin son requeridas (AAAA-MM-DD)'), 400
+        rango = (fecha, fecha)
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return jsonify(success=False, error='formato inválido'), 400
+    if formato == 'parquet' and not parquet_disponible():
+        return jsonify(success=False, error='Parquet requiere pyarrow en el servidor'), 501
+    equipo_id = request.args.get('equipo', type=int)
+    cerrado_hasta = cerrar_rango(*rango, get_cdmx_time().date())
+
+    return Response(stream_with_context(exportacion(tipo, formato, *rango, equipo_id, cerrado_hasta)),
+                    mimetype=FORMATOS[formato][0],
+                    headers={'Content-Disposition':
+                             f'attachment; filename="{nombre_archivo(tipo, formato, *rango, equipo_id)}"'})
+
+@bp.route('/reporte/<int:equipo_id>')
+@solo_lectura
 def reporte_equipo(equipo_id):
-    equipo = Equipo.query.get_or_404(equipo_id)
+    equipo = get_equipo(equipo_id) or abort(404)
+    rango = get_rango_param()
+    if rango:
+        no_modificado = condicional(*rango)
+        if no_modificado is not None:
+            return no_modificado
+        return render_reporte_rango(equipo, rango, equipo_id)
     fecha_param = request.args.get('fecha')
     
+    fecha_fija = False
     if fecha_param:
         try:
             fecha_reporte = datetime.strptime(fecha_param, '%Y-%m-%d').date()
+            fecha_fija = True
         except:
             fecha_reporte = get_latest_fecha_equipo(equipo_id) or get_cdmx_time().date()
     else:
         # default to latest date with data for this equipo
         fecha_reporte = get_latest_fecha_equipo(equipo_id) or get_cdmx_time().date()
+
+    no_modificado = condicional(fecha_reporte, fecha_reporte, fecha_fija)
+    if no_modificado is not None:
+        return no_modificado
     
     # Registros del día seleccionado con ordenamiento
-    registros = RegistroDiarioHosteo.query.join(Host).filter(
-        Host.id_equipo == equipo_id,
-        RegistroDiarioHosteo.fecha == fecha_reporte
-    ).order_by(RegistroDiarioHosteo.hora.desc()).all()
-    
-    total_hosteos = len(registros)
-    confirmados = sum(1 for r in registros if r.confirmada)
-    no_confirmados = total_hosteos - confirmados
-    total_personas = sum(r.numero_personas for r in registros)
-    personas_confirmadas = sum(r.numero_personas for r in registros if r.confirmada)
+    registros, paginacion = pagina_actual(registros_del_dia(fecha_reporte, equipo_id=equipo_id))
     
-    # Ranking de hosts
-    ranking = db.session.query(
-        Host.nombre_host,
-        Host.id_host,
-        func.count(RegistroDiarioHosteo.id_registro_hosteo).label('total'),
-        func.sum(RegistroDiarioHosteo.numero_personas).label('personas'),
-        Host.id_equipo.label('host_equipo_id')
-    ).join(RegistroDiarioHosteo).filter(
-        Host.id_equipo == equipo_id,
-        RegistroDiarioHosteo.fecha == fecha_reporte
-    ).group_by(Host.nombre_host, Host.id_host, Host.id_equipo)\
-     .order_by(func.count(RegistroDiarioHosteo.id_registro_hosteo).desc()).all()
+    # Ranking de hosts; las tarjetas salen de sus mismas filas agregadas
+    ranking = ranking_hosts(fecha_reporte, equipo_id=equipo_id)
+    resumen = resumen_reporte(fecha_reporte, ranking, equipo_id)
     
-    print(f"DEBUG - Equipo: {equipo.id_equipo}, Fecha: {fecha_reporte}, Total hosteos: {total_hosteos}")
+    current_app.logger.debug('Reporte equipo %s, fecha %s: %s hosteos', equipo.id_equipo, fecha_reporte, resumen['total_hosteos'])
     
     return render_template('reporte.html',
                          equipo=equipo,
-                         total_hosteos=total_hosteos,
-                         confirmados=confirmados,
-                         no_confirmados=no_confirmados,
-                         total_personas=total_personas,
-                         personas_confirmadas=personas_confirmadas,
                          ranking=ranking,
                          registros=registros,
-                         fecha_reporte=fecha_reporte.isoformat())
+                         paginacion=paginacion,
+                         stream_url=url_en_vivo('.stream_equipo', fecha_reporte, equipo_id=equipo_id),
+                         archivado=not registros and dia_archivado(fecha_reporte),
+                         fecha_reporte=fecha_reporte.isoformat(),
+                         **resumen)
+
+@bp.route('/reporte/<int:equipo_id>/host/<int:host_id>')
+@solo_lectura
+def reporte_host(equipo_id, host_id):
+    equipo = get_equipo(equipo_id) or abort(404)
+    host = get_host(host_id) or abort(404)
+    if host.id_equipo != equipo_id:
+        abort(404)
+
+    rango = get_rango_param()
+    if rango:
+        no_modificado = condicional(*rango)
+        if no_modificado is not None:
+            return no_modificado
+        dias = serie_diaria(*rango, get_cdmx_time().date(), host_id=host_id)
+        return render_template('reporte_host.html',
+                             equipo=equipo,
+                             host=host,
+                             registros=[],
+                             paginacion={},
+                             dias=dias,
+                             rango_cerrado=rango[1] < get_cdmx_time().date(),
+                             fecha_inicio=rango[0].isoformat(),
+                             fecha_fin=rango[1].isoformat(),
+                             fecha_reporte=rango[1].isoformat(),
+                             **resumen_serie(dias))
+
+    fecha_param = request.args.get('fecha')
+    fecha_fija = False
+    if fecha_param:
+        try:
+            fecha_reporte = datetime.strptime(fecha_param, '%Y-%m-%d').date()
+            fecha_fija = True
+        except:
+            fecha_reporte = get_latest_fecha_host(host_id) or get_cdmx_time().date()
+    else:
+        # default to latest date with data for this host
+        fecha_reporte = get_latest_fecha_host(host_id) or get_cdmx_time().date()
+
+    no_modificado = condicional(fecha_reporte, fecha_reporte, fecha_fija)
+    if no_modificado is not None:
+        return no_modificado
 
-@app.route('/reporte-total')
+    registros, paginacion = pagina_actual(registros_del_dia(fecha_reporte, host_id=host_id))
+    resumen = resumen_desde_ranking(ranking_hosts(fecha_reporte, host_id=host_id))
+
+    return render_template('reporte_host.html',
+                         equipo=equipo,
+                         host=host,
+                         registros=registros,
+                         paginacion=paginacion,
+                         archivado=not registros and dia_archivado(fecha_reporte),
+                         fecha_reporte=fecha_reporte.isoformat(),
+                         **resumen)
+
+@bp.route('/reporte-total')
+@solo_lectura
 def reporte_total():
     # Aggregate report across all equipos; uses same template with Equipo: id 777
+    rango = get_rango_param()
+    if rango:
+        no_modificado = condicional(*rango)
+        if no_modificado is not None:
+            return no_modificado
+        return render_reporte_rango(get_equipo(777), rango)
     fecha_param = request.args.get('fecha')
+    fecha_fija = False
     if fecha_param:
         try:
             fecha_reporte = datetime.strptime(fecha_param, '%Y-%m-%d').date()
+            fecha_fija = True
         except:
             fecha_reporte = get_latest_fecha_global() or get_cdmx_time().date()
     else:
         # default to latest date with data (global)
         fecha_reporte = get_latest_fecha_global() or get_cdmx_time().date()
 
-    registros = RegistroDiarioHosteo.query.filter(
-        RegistroDiarioHosteo.fecha == fecha_reporte
-    ).order_by(RegistroDiarioHosteo.hora.desc()).all()
-
-    total_hosteos = len(registros)
-    confirmados = sum(1 for r in registros if r.confirmada)
-    no_confirmados = total_hosteos - confirmados
-    total_personas = sum(r.numero_personas for r in registros)
-    personas_confirmadas = sum(r.numero_personas for r in registros if r.confirmada)
-
-    ranking = db.session.query(
-        Host.nombre_host,
-        Host.id_host,
-        func.count(RegistroDiarioHosteo.id_registro_hosteo).label('total'),
-        func.sum(RegistroDiarioHosteo.numero_personas).label('personas'),
-        Host.id_equipo.label('host_equipo_id')
-    ).join(RegistroDiarioHosteo).filter(
-        RegistroDiarioHosteo.fecha == fecha_reporte
-    ).group_by(Host.nombre_host, Host.id_host, Host.id_equipo)\
-     .order_by(func.count(RegistroDiarioHosteo.id_registro_hosteo).desc()).all()
-
-    equipo_control = Equipo.query.get(777)
+    no_modificado = condicional(fecha_reporte, fecha_reporte, fecha_fija)
+    if no_modificado is not None:
+        return no_modificado
+
+    registros, paginacion = pagina_actual(registros_del_dia(fecha_reporte))
+
+    ranking = ranking_hosts(fecha_reporte)
+    resumen = resumen_reporte(fecha_reporte, ranking)
+
+    equipo_control = get_equipo(777)
     return render_template('reporte.html',
                          equipo=equipo_control,
-                         total_hosteos=total_hosteos,
-                         confirmados=confirmados,
-                         no_confirmados=no_confirmados,
-                         total_personas=total_personas,
-                         personas_confirmadas=personas_confirmadas,
                          ranking=ranking,
+                         ranking_meseros=ranking_meseros(fecha_reporte),
                          registros=registros,
-                         fecha_reporte=fecha_reporte.isoformat())
+                         paginacion=paginacion,
+                         stream_url=url_en_vivo('.stream_global', fecha_reporte),
+                         archivado=not registros and dia_archivado(fecha_reporte),
+                         fecha_reporte=fecha_reporte.isoformat(),
+                         **resumen)
+
+def respuesta_sse(*canales):
+    # The generator never touches the DB, so no app context is kept open
+    sub = broker.suscribir(*canales, limite=current_app.config['SSE_MAX_CONEXIONES'])
+    if sub is None:
+        # Every stream pins a worker thread; past the cap, keep the threads for
+        # short requests and have the browser retry later
+        cuerpo = f'retry: {current_app.config["SSE_REINTENTO_MS"]}\n\n'
+    else:
+        cuerpo = broker.flujo_sse(sub, current_app.config['SSE_HEARTBEAT'])
+    return Response(cuerpo,
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/stream/global')
+def stream_global():
+    return respuesta_sse('global')
+
+@bp.route('/stream/equipo/<int:equipo_id>')
+def stream_equipo(equipo_id):
+    get_equipo(equipo_id) or abort(404)
+    return respuesta_sse(f'equipo:{equipo_id}')
+
+@bp.route('/stream/mesero/<int:mesero_id>')
+def stream_mesero(mesero_id):
+    get_mesero(mesero_id) or abort(404)
+    if mesero_autenticado(request.args.get('token'), request.args.get('clave')) != mesero_id:
+        return "No autorizado", 403
+    return respuesta_sse(f'mesero:{mesero_id}')
+
+@bp.route('/metrics')
+def metrics():
+    # Prometheus scrape; with METRICS_TOKEN set it requires 'Authorization: Bearer <token>'
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return "No autorizado", 403
+    texto = exposicion([('sse_connections', 'Conexiones SSE abiertas en este proceso', broker.conexiones())])
+    return Response(texto, mimetype='text/plain; version=0.0.4')
 
 # Script para inicializar DB con datos de prueba
-@app.cli.command()
+@click.command('init-db')
+@with_appcontext
 def init_db():
     """Inicializa la base de datos con datos de ejemplo"""
     db.create_all()
     
     # Crear equipos
     equipos = [
-        Equipo(id_equipo=1, lider_equipo='Ana García', clave_lider='julio2026'),
-        Equipo(id_equipo=2, lider_equipo='Carlos Ruiz', clave_lider='luis2026'),
-        Equipo(id_equipo=3, lider_equipo='María López', clave_lider='joel2026'),
-        Equipo(id_equipo=4, lider_equipo='Juan Pérez', clave_lider='gordo2026'),
-        Equipo(id_equipo=777, lider_equipo='Control', clave_lider='control2026'),
+        Equipo(id_equipo=1, lider_equipo='Ana García', clave_lider_hash=huella_clave('julio2026')),
+        Equipo(id_equipo=2, lider_equipo='Carlos Ruiz', clave_lider_hash=huella_clave('luis2026')),
+        Equipo(id_equipo=3, lider_equipo='María López', clave_lider_hash=huella_clave('joel2026')),
+        Equipo(id_equipo=4, lider_equipo='Juan Pérez', clave_lider_hash=huella_clave('gordo2026')),
+        Equipo(id_equipo=777, lider_equipo='Control', clave_lider_hash=huella_clave('control2026')),
     ]
     db.session.add_all(equipos)
     
     # Crear hosts
     hosts = [
-        Host(id_equipo=1, nombre_host='Yasmin', clave_host='host2026yasmin'),
-        Host(id_equipo=1, nombre_host='Karo', clave_host='host2026karo'),
-        Host(id_equipo=1, nombre_host='Diego', clave_host='host2026diego'),
-        Host(id_equipo=1, nombre_host='Julio', clave_host='host2026julio'),
-        Host(id_equipo=2, nombre_host='Daniela', clave_host='host2026daniela'),
-        Host(id_equipo=2, nombre_host='Antony', clave_host='host2026antony'),
+        Host(id_equipo=1, nombre_host='Yasmin', clave_host_hash=huella_clave('host2026yasmin')),
+        Host(id_equipo=1, nombre_host='Karo', clave_host_hash=huella_clave('host2026karo')),
+        Host(id_equipo=1, nombre_host='Diego', clave_host_hash=huella_clave('host2026diego')),
+        Host(id_equipo=1, nombre_host='Julio', clave_host_hash=huella_clave('host2026julio')),
+        Host(id_equipo=2, nombre_host='Daniela', clave_host_hash=huella_clave('host2026daniela')),
+        Host(id_equipo=2, nombre_host='Antony', clave_host_hash=huella_clave('host2026antony')),
     ]
     db.session.add_all(hosts)
     
     # Crear meseros
     meseros = [
-        Mesero(nombre_mesero='Julio', clave_mesero='mesero2026julio'),
-        Mesero(nombre_mesero='Yaky', clave_mesero='mesero2026yaky'),
-        Mesero(nombre_mesero='Rosaura', clave_mesero='mesero2026rosaura'),
-        Mesero(nombre_mesero='Karen', clave_mesero='mesero2026karen'),
-        Mesero(nombre_mesero='Mónica', clave_mesero='mesero2026monica'),
-        Mesero(nombre_mesero='Ana', clave_mesero='mesero2026ana'),
-        Mesero(nombre_mesero='Jatt', clave_mesero='mesero2026jatt'),
+        Mesero(nombre_mesero='Julio', clave_mesero_hash=huella_clave('mesero2026julio')),
+        Mesero(nombre_mesero='Yaky', clave_mesero_hash=huella_clave('mesero2026yaky')),
+        Mesero(nombre_mesero='Rosaura', clave_mesero_hash=huella_clave('mesero2026rosaura')),
+        Mesero(nombre_mesero='Karen', clave_mesero_hash=huella_clave('mesero2026karen')),
+        Mesero(nombre_mesero='Mónica', clave_mesero_hash=huella_clave('mesero2026monica')),
+        Mesero(nombre_mesero='Ana', clave_mesero_hash=huella_clave('mesero2026ana')),
+        Mesero(nombre_mesero='Jatt', clave_mesero_hash=huella_clave('mesero2026jatt')),
     ]
     db.session.add_all(meseros)
     
     db.session.commit()
     print('✅ Base de datos inicializada con éxito')
 
+@click.command('migrar-db')
+@with_appcontext
+def migrar_db():
+    """Crea tablas, columnas nuevas e índices faltantes en una base existente (idempotente)"""
+    db.create_all()
+    inspector = inspect(db.engine)
+    columnas = indices = 0
+    for table in db.metadata.sorted_tables:
+        # create_all skips existing tables; add columns introduced since (all nullable)
+        existentes = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existentes:
+                continue
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+            print(f'➕ Columna {column.name} agregada a {table.name}')
+            columnas += 1
+
+        existentes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existentes:
+                continue
+            index.create(bind=db.engine, checkfirst=True)
+            print(f'➕ Índice {index.name} creado en {table.name}')
+            indices += 1
+
+    if not db.session.query(DiaMaterializado.query.exists()).scalar():
+        # Bases from before dias_materializados: days with cortes or archived are already done
+        fechas = {f for (f,) in db.session.query(CorteDiarioHosteo.fecha).distinct()}
+        fechas.update(f for (f,) in db.session.query(DiaArchivado.fecha))
+        db.session.add_all(DiaMaterializado(fecha=f) for f in sorted(fechas))
+        db.session.commit()
+        if fechas:
+            print(f'➕ {len(fechas)} días anotados como materializados')
+    print(f'✅ Migración completa ({columnas} columnas y {indices} índices nuevos)')
+
+@click.command('materializar-cortes')
+@with_appcontext
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), help='Primer día (default: ayer).')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día (default: ayer).')
+def materializar_cortes_cli(desde, hasta):
+    """Calcula cortes y resúmenes diarios de los días cerrados en el rango"""
+    ayer = get_cdmx_time().date() - timedelta(days=1)
+    hasta = min(hasta.date() if hasta else ayer, ayer)
+    desde = desde.date() if desde else hasta
+    if desde > hasta:
+        raise click.BadParameter('Sólo se materializan días cerrados (anteriores a hoy)')
+    cortes, resumenes = materializar_dias(desde, hasta)
+    db.session.commit()
+    print(f'✅ {cortes} cortes y {resumenes} resúmenes materializados del {desde} al {hasta}')
+
+@click.command('reconciliar-contadores')
+@with_appcontext
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), help='Primer día (default: hoy).')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día (default: hoy).')
+@click.option('--reparar', is_flag=True, help='Reconstruye desde los registros los días con diferencias.')
+def reconciliar_contadores(desde, hasta, reparar):
+    """Compara los contadores por host y mesero con los registros y, con --reparar, los reconstruye"""
+    hoy = get_cdmx_time().date()
+    hasta = hasta.date() if hasta else hoy
+    desde = desde.date() if desde else hasta
+    if reparar and db.engine.dialect.name == 'postgresql':
+        # Holds off new altas and confirmaciones until the rebuild commits, so
+        # no increment lands between reading the rows and replacing the counters
+        db.session.execute(text('LOCK TABLE registro_diario_hosteos IN SHARE MODE'))
+
+    diferencias = verificar_resumenes(desde, hasta)
+    for tabla, fecha, id_, esperado, guardado in diferencias[:50]:
+        print(f'⚠️  {tabla} {fecha} id={id_}: registros {esperado} vs contador {guardado}')
+    if len(diferencias) > 50:
+        print(f'... y {len(diferencias) - 50} más')
+    if not diferencias:
+        db.session.rollback()
+        print(f'✅ Contadores correctos del {desde} al {hasta}')
+        return
+    if not reparar:
+        db.session.rollback()
+        raise SystemExit(f'❌ {len(diferencias)} diferencias; corre con --reparar para reconstruirlos')
+
+    dias_reparados = sorted({d[1] for d in diferencias})
+    for fecha in dias_reparados:
+        materializar_resumenes(fecha)
+    # Reports of these days change, so their ETags must too
+    marcar_fechas(dias_reparados)
+    db.session.commit()
+    restantes = verificar_resumenes(desde, hasta)
+    db.session.rollback()
+    if restantes:
+        raise SystemExit(f'❌ Siguen {len(restantes)} diferencias después de reconstruir')
+    print(f'✅ {len(dias_reparados)} días reconstruidos; contadores correctos del {desde} al {hasta}')
+
+@click.command('migrar-claves')
+@with_appcontext
+@click.option('--borrar-texto', is_flag=True, help='Vacía las columnas de claves en texto plano.')
+def migrar_claves_cli(borrar_texto):
+    """Guarda el hash de las claves en texto plano existentes (correr después de migrar-db)"""
+    actualizadas = migrar_claves(borrar_texto)
+    db.session.commit()
+    for tabla, n in actualizadas.items():
+        print(f'🔑 {tabla}: {n} claves migradas')
+    print('✅ Claves migradas' + (' y texto plano borrado' if borrar_texto else ''))
+
+def _meses_adelante(meses):
+    mes = inicio_mes(get_cdmx_time().date())
+    for _ in range(meses):
+        mes = siguiente_mes(mes)
+    return mes
+
+@click.command('particionar-registros')
+@with_appcontext
+@click.option('--meses', type=click.IntRange(min=1), default=3, help='Meses futuros con partición lista.')
+def particionar_registros_cli(meses):
+    """Convierte registro_diario_hosteos en tabla particionada por mes (Postgres, una sola vez)"""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('El particionado sólo aplica a Postgres')
+    if particionada():
+        raise click.ClickException('registro_diario_hosteos ya está particionada; usa flask crear-particiones')
+    copiadas = particionar_registros(_meses_adelante(meses))
+    db.session.commit()
+    print(f'✅ registro_diario_hosteos particionada por mes ({copiadas} registros copiados)')
+
+@click.command('crear-particiones')
+@with_appcontext
+@click.option('--meses', type=click.IntRange(min=1), default=3, help='Meses futuros con partición lista.')
+def crear_particiones_cli(meses):
+    """Crea las particiones mensuales faltantes hasta N meses adelante (correr cada mes)"""
+    if not particionada():
+        raise click.ClickException('registro_diario_hosteos no está particionada; corre flask particionar-registros')
+    creadas = crear_particiones(get_cdmx_time().date(), _meses_adelante(meses))
+    db.session.commit()
+    for mes, movidas in creadas:
+        print(f'➕ Partición {mes:%Y-%m}' + (f' ({movidas} registros movidos desde DEFAULT)' if movidas else ''))
+    print(f'✅ {len(creadas)} particiones nuevas')
+
+@click.command('archivar-registros')
+@with_appcontext
+@click.option('--dias', type=click.IntRange(min=2), help='Días recientes que conservan registros crudos (default: RETENCION_DIAS).')
+@click.option('--directorio', type=click.Path(file_okay=False), help='Destino de los archivos (default: ARCHIVO_DIR).')
+@click.option('--formato', type=click.Choice(list(FORMATOS)), help='default: parquet si pyarrow está instalado, si no csv comprimido.')
+@click.option('--simular', is_flag=True, help='Sólo lista los meses que se archivarían.')
+def archivar_registros_cli(dias, directorio, formato, simular):
+    """Mueve a archivos los registros más viejos que el horizonte; sus reportes siguen saliendo de cortes y resúmenes"""
+    ahora = get_cdmx_time()
+    hasta = ahora.date() - timedelta(days=dias or current_app.config['RETENCION_DIAS'])
+    directorio = directorio or current_app.config['ARCHIVO_DIR']
+    formato = formato or ('parquet' if parquet_disponible() else 'csv')
+    if formato == 'parquet' and not parquet_disponible():
+        raise click.ClickException('Parquet requiere pyarrow: pip install pyarrow')
+
+    meses = meses_por_archivar(hasta)
+    if simular:
+        db.session.rollback()
+        for mes, dias_mes in meses:
+            print(f'{mes:%Y-%m}: {len(dias_mes)} días, {sum(n for _, n in dias_mes)} registros')
+        print(f'✅ {len(meses)} meses por archivar hasta el {hasta}')
+        return
+    # One transaction per month keeps locks short; a failure leaves earlier months archived
+    for mes, dias_mes in meses:
+        ruta = archivar_mes(mes, dias_mes, hasta, directorio, formato, ahora.replace(tzinfo=None))
+        db.session.commit()
+        print(f'📦 {mes:%Y-%m}: {sum(n for _, n in dias_mes)} registros de {len(dias_mes)} días en {ruta}')
+    print(f'✅ Registros hasta el {hasta} archivados ({len(meses)} meses)')
+
+@click.command('generar-datos')
+@with_appcontext
+@solo_base_local
+@click.option('--equipos', type=int, default=20)
+@click.option('--hosts-por-equipo', type=int, default=12)
+@click.option('--meseros', type=int, default=250)
+@click.option('--dias', type=int, default=730, help='Días de historial hasta hoy.')
+@click.option('--por-dia', type=int, default=600, help='Promedio de registros por día (varía por día de la semana).')
+@click.option('--semilla', type=int, default=2026)
+def generar_datos(equipos, hosts_por_equipo, meseros, dias, por_dia, semilla):
+    """Genera equipos, hosts, meseros y años de registros sintéticos (sólo bases locales)"""
+    hoy = get_cdmx_time().date()
+    desde = hoy - timedelta(days=dias - 1)
+    nuevos, hosts, lista_meseros = generar_catalogos(equipos, hosts_por_equipo, meseros)
+    print(f'➕ {len(nuevos)} equipos, {len(hosts)} hosts y {len(lista_meseros)} meseros')
+    total = generar_registros(desde, hoy, por_dia, semilla)
+    print(f'➕ {total} registros del {desde} al {hoy}')
+    if desde < hoy:
+        cortes, resumenes = materializar_dias(desde, hoy - timedelta(days=1))
+        print(f'➕ {cortes} cortes y {resumenes} resúmenes materializados')
+    db.session.commit()
+    print('✅ Datos sintéticos generados')
+
+@click.command('exportar')
+@with_appcontext
+@click.argument('tipo', type=click.Choice(['registros', 'cortes']))
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), help='Primer día (default: inicio del mes pasado).')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día (default: fin del mes pasado).')
+@click.option('--equipo', 'equipo_id', type=int, help='Sólo un equipo (default: todos).')
+@click.option('--formato', type=click.Choice(list(FORMATOS)), default='csv')
+@click.option('--salida', type=click.Path(dir_okay=False, allow_dash=True),
+              help='Archivo destino; "-" para stdout (default: nombre según tipo y rango).')
+def exportar_cli(tipo, desde, hasta, equipo_id, formato, salida):
+    """Exporta registros crudos o cortes de un rango en CSV o Parquet, por streaming"""
+    fin_mes_pasado = get_cdmx_time().date().replace(day=1) - timedelta(days=1)
+    hasta = hasta.date() if hasta else fin_mes_pasado
+    desde = desde.date() if desde else min(hasta, fin_mes_pasado).replace(day=1)
+    if desde > hasta:
+        raise click.BadParameter('--desde debe ser anterior a --hasta')
+    if formato == 'parquet' and not parquet_disponible():
+        raise click.ClickException('Parquet requiere pyarrow: pip install pyarrow')
+    if tipo == 'registros':
+        archivados = DiaArchivado.query.filter(DiaArchivado.fecha >= desde, DiaArchivado.fecha <= hasta).count()
+        if archivados:
+            click.echo(f'⚠️  {archivados} días del rango están archivados; sus registros están en '
+                       f'{current_app.config["ARCHIVO_DIR"]}, no en la base', err=True)
+
+    salida = salida or nombre_archivo(tipo, formato, desde, hasta, equipo_id)
+    binario = formato == 'parquet'
+    with click.open_file(salida, 'wb' if binario else 'w', encoding=None if binario else 'utf-8') as f:
+        for pedazo in exportacion(tipo, formato, desde, hasta, equipo_id,
+                                  cerrar_rango(desde, hasta, get_cdmx_time().date())):
+            f.write(pedazo)
+    if salida != '-':
+        print(f'✅ {tipo} del {desde} al {hasta} exportados a {salida}')
+
+class GrupoPerezoso(click.Group):
+    """Grupo de comandos cuyo módulo se importa hasta que alguien lo usa.
+
+    Los workers también llaman create_app(); así no cargan el arnés de
+    benchmarks, que sólo se usa desde `flask bench ...`.
+    """
+
+    def __init__(self, name, modulo, **kwargs):
+        super().__init__(name, **kwargs)
+        self.modulo = modulo
+
+    def _grupo(self):
+        return getattr(importlib.import_module(self.modulo), self.name)
+
+    def list_commands(self, ctx):
+        return self._grupo().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self._grupo().get_command(ctx, cmd_name)
+
+bench = GrupoPerezoso('bench', 'bench', help='Benchmarks contra la base configurada.')
+
+def create_app(config=Config):
+    """Crea la app; cada worker de producción llama esto al arrancar (ver wsgi.py)"""
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    configurar_caches(app)
+    configurar_plantillas(app)
+    configurar_enrutamiento(app)
+    app.config['HUELLA_PLANTILLAS'] = huella_plantillas(app)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    instrumentar(app)
+    app.register_blueprint(bp)
+    for comando in (init_db, migrar_db, migrar_claves_cli, materializar_cortes_cli, reconciliar_contadores,
+                    particionar_registros_cli, crear_particiones_cli, archivar_registros_cli, generar_datos,
+                    exportar_cli, bench):
+        app.cli.add_command(comando)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,965 @@
+"""Benchmarks contra la base configurada en DATABASE_URL.
+
+Pensados para una base local (SQLite o Postgres), nunca para producción:
+algunos comandos siembran datos sintéticos en la base.
+"""
+import csv
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time as _time
+import tracemalloc
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from urllib import error as _urlerror, parse as _urlparse, request as _urlrequest
+from zoneinfo import ZoneInfo
+
+import click
+from flask import current_app, render_template, render_template_string
+from flask.cli import AppGroup
+from sqlalchemy import case, event, func, insert, select
+from werkzeug.serving import BaseWSGIServer
+
+from models import db, Equipo, Host, Mesero, RegistroDiarioHosteo, ResumenHostDiario, ResumenMeseroDiario
+from catalogos import claves_cache, mesero_por_clave
+from contadores import contar_altas
+from cortes import materializar_dias
+from credenciales import (COLUMNAS_CLAVE, COOKIE_MESERO, asignar_clave, emitir_token_mesero, huella_clave,
+                          mesero_del_token)
+from enrutamiento import REPLICA
+from eventos import Broker, broker as broker_app
+from exportar import COLUMNAS_REGISTROS, consulta_registros, exportacion
+from generador import filas_del_dia, solo_base_local
+from queries import (consulta_ranking_hosts, consulta_ranking_meseros, consulta_ultima_fecha, get_latest_fecha_global,
+                     ranking_hosts, ranking_meseros, registros_del_dia, resumen_mesero)
+from rangos import serie_diaria
+from versiones import marcar_fechas
+
+bench = AppGroup('bench', help='Benchmarks contra la base configurada.')
+
+# Full scans of the tables the hot queries read (the catalogs are small)
+_TABLAS_CALIENTES = r'(registro_diario_hosteos|resumen_host_diario|resumen_mesero_diario)'
+_SEQ_SCAN = re.compile(rf'Seq Scan on {_TABLAS_CALIENTES}|^(SCAN|SEARCH) (TABLE )?{_TABLAS_CALIENTES}$')
+
+
+def sembrar_historial(dias, por_dia, hasta=None, semilla=2026):
+    """Inserta `por_dia` registros sintéticos por día para los últimos `dias`"""
+    hosts = db.session.scalars(select(Host.id_host)).all()
+    meseros = db.session.scalars(select(Mesero.id_mesero)).all()
+    if not hosts or not meseros:
+        raise click.ClickException('No hay hosts o meseros; corre `flask init-db` primero')
+
+    hasta = hasta or date.today()
+    rng = random.Random(semilla)
+    for d in range(dias):
+        fecha = hasta - timedelta(days=d)
+        filas = filas_del_dia(rng, fecha, hosts, meseros, por_dia)
+        db.session.execute(insert(RegistroDiarioHosteo), filas)
+        contar_altas(SimpleNamespace(**f) for f in filas)
+        marcar_fechas([fecha])
+    db.session.commit()
+
+
+def _consultas_calientes(fecha, equipo_id, host_id, mesero_id):
+    # The same query builders the views use, so the plans follow the code
+    return {
+        'latest_fecha_equipo': consulta_ultima_fecha(equipo_id=equipo_id).statement,
+        'latest_fecha_host': consulta_ultima_fecha(host_id=host_id).statement,
+        'latest_fecha_mesero': consulta_ultima_fecha(mesero_id=mesero_id).statement,
+        'latest_fecha_global': consulta_ultima_fecha().statement,
+        'ranking_hosts_equipo': consulta_ranking_hosts(fecha, equipo_id=equipo_id).statement,
+        'ranking_meseros': consulta_ranking_meseros(fecha).statement,
+        'registros_equipo': registros_del_dia(fecha, equipo_id=equipo_id).statement,
+        'registros_mesero': registros_del_dia(fecha, mesero_id=mesero_id).statement,
+        'registros_global': registros_del_dia(fecha).statement,
+    }
+
+
+def _plan(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    prefijo = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    return [str(fila[-1]).strip() for fila in conn.exec_driver_sql(prefijo + sql)]
+
+
+def _tiempo_ms(conn, stmt, repeticiones):
+    inicio = _time.perf_counter()
+    for _ in range(repeticiones):
+        conn.execute(stmt).fetchall()
+    return (_time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+@bench.command('planes')
+@solo_base_local
+@click.option('--sembrar-dias', type=int, default=0,
+              help='Siembra este número de días de historial antes de medir (p. ej. 365).')
+@click.option('--por-dia', type=int, default=200, help='Registros sintéticos por día sembrado.')
+@click.option('--repeticiones', type=int, default=20)
+def planes(sembrar_dias, por_dia, repeticiones):
+    """Compara planes y tiempos de las consultas calientes con y sin índices"""
+    if sembrar_dias:
+        sembrar_historial(sembrar_dias, por_dia)
+        click.echo(f'🌱 Sembrados {sembrar_dias * por_dia} registros')
+
+    fecha = get_latest_fecha_global() or date.today()
+    host_id, equipo_id = db.session.execute(select(Host.id_host, Host.id_equipo).limit(1)).first()
+    mesero_id = db.session.scalar(select(Mesero.id_mesero).limit(1))
+    consultas = _consultas_calientes(fecha, equipo_id, host_id, mesero_id)
+    indices = [index for modelo in (RegistroDiarioHosteo, Host, ResumenHostDiario, ResumenMeseroDiario)
+               for index in modelo.__table__.indexes]
+
+    # Each pass uses a fresh connection: pysqlite caches prepared statements
+    # per connection and would keep reporting the plan from before the DROP.
+    # The indexes are left in place at the end, same as `flask migrar-db`.
+    resultados = {}
+    for etiqueta in ('sin índices', 'con índices'):
+        for index in indices:
+            if etiqueta == 'sin índices':
+                index.drop(db.engine, checkfirst=True)
+            else:
+                index.create(db.engine, checkfirst=True)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            resultados[etiqueta] = {n: (_plan(conn, s), _tiempo_ms(conn, s, repeticiones))
+                                   for n, s in consultas.items()}
+            conn.commit()
+
+    for nombre in consultas:
+        for etiqueta, por_consulta in resultados.items():
+            plan, ms = por_consulta[nombre]
+            seq = any(_SEQ_SCAN.search(linea) for linea in plan)
+            click.echo(f'{nombre:<22} {etiqueta:<12} {ms:8.2f} ms  '
+                       f'{"SEQ SCAN" if seq else "index"}')
+            for linea in plan:
+                click.echo(f'    {linea}')
+
+
+def _medir_ms(fn, repeticiones):
+    inicio = _time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = fn()
+    return (_time.perf_counter() - inicio) * 1000 / repeticiones, resultado
+
+
+@bench.command('rangos')
+@solo_base_local
+@click.option('--anios', type=int, default=3, help='Años de historial a sembrar (0 = usar la base tal cual).')
+@click.option('--por-dia', type=int, default=200, help='Registros sintéticos por día sembrado.')
+@click.option('--repeticiones', type=int, default=5)
+def rangos(anios, por_dia, repeticiones):
+    """Compara reportes por rango desde resúmenes diarios contra agregar registros"""
+    hasta = date.today() - timedelta(days=1)
+    if anios:
+        dias = anios * 365
+        sembrar_historial(dias, por_dia, hasta=hasta)
+        materializar_dias(hasta - timedelta(days=dias - 1), hasta)
+        db.session.commit()
+        click.echo(f'🌱 Sembrados {dias * por_dia} registros y materializados {dias} días')
+
+    equipo_id = db.session.scalar(select(Host.id_equipo).limit(1))
+    confirmada = RegistroDiarioHosteo.confirmada.is_(True)
+
+    def desde_registros(desde):
+        return db.session.query(
+            RegistroDiarioHosteo.fecha,
+            func.count(RegistroDiarioHosteo.id_registro_hosteo),
+            func.count(case((confirmada, 1))),
+            func.sum(RegistroDiarioHosteo.numero_personas),
+        ).join(Host, RegistroDiarioHosteo.id_host == Host.id_host).filter(
+            Host.id_equipo == equipo_id,
+            RegistroDiarioHosteo.fecha >= desde,
+            RegistroDiarioHosteo.fecha <= hasta
+        ).group_by(RegistroDiarioHosteo.fecha).all()
+
+    click.echo(f'{"días":>6} {"resúmenes":>12} {"registros":>12}')
+    for n in sorted({7, 31, 365, max(anios, 1) * 365}):
+        desde = hasta - timedelta(days=n - 1)
+        # hoy = hasta + 1 keeps the whole range on the materialized path
+        ms_resumen, serie = _medir_ms(
+            lambda: serie_diaria(desde, hasta, hasta + timedelta(days=1), equipo_id=equipo_id), repeticiones)
+        ms_registros, filas = _medir_ms(lambda: desde_registros(desde), repeticiones)
+        assert sum(d['total_hosteos'] for d in serie) == sum(f[1] for f in filas)
+        click.echo(f'{n:>6} {ms_resumen:>9.2f} ms {ms_registros:>9.2f} ms')
+
+
+def _ranking_agrupando(fecha, equipo_id=None):
+    # What ranking_hosts did before the counters: GROUP BY over the day's rows
+    R = RegistroDiarioHosteo
+    confirmada = R.confirmada.is_(True)
+    query = db.session.query(
+        Host.nombre_host, Host.id_host, func.count(R.id_registro_hosteo),
+        func.coalesce(func.sum(R.numero_personas), 0), Host.id_equipo,
+        func.count(case((confirmada, 1))),
+        func.coalesce(func.sum(case((confirmada, R.numero_personas), else_=0)), 0),
+    ).join(R, R.id_host == Host.id_host).filter(R.fecha == fecha)
+    if equipo_id is not None:
+        query = query.filter(Host.id_equipo == equipo_id)
+    return query.group_by(Host.nombre_host, Host.id_host, Host.id_equipo)\
+        .order_by(func.count(R.id_registro_hosteo).desc()).all()
+
+
+@bench.command('contadores')
+@click.option('--repeticiones', type=int, default=50)
+@click.option('--altas', type=int, default=200, help='Altas para medir el costo extra de los contadores.')
+def contadores(repeticiones, altas):
+    """Ranking del día desde contadores contra agrupar registros, y costo extra por alta.
+
+    Usa el día con más registros de la base; las altas se revierten al final.
+    """
+    R = RegistroDiarioHosteo
+    fecha, del_dia = db.session.execute(select(R.fecha, func.count()).group_by(R.fecha)
+                                        .order_by(func.count().desc()).limit(1)).first() or (None, 0)
+    if fecha is None:
+        raise click.ClickException('No hay registros; corre `flask generar-datos` primero')
+    equipo_id = db.session.scalar(select(Host.id_equipo).join(R, R.id_host == Host.id_host)
+                                  .where(R.fecha == fecha).limit(1))
+    mesero_id = db.session.scalar(select(R.id_mesero).where(R.fecha == fecha).limit(1))
+    click.echo(f'{fecha}: {del_dia} registros')
+
+    casos = (
+        ('ranking total', lambda: _ranking_agrupando(fecha), lambda: ranking_hosts(fecha)),
+        ('ranking equipo', lambda: _ranking_agrupando(fecha, equipo_id), lambda: ranking_hosts(fecha, equipo_id=equipo_id)),
+        ('top 20 meseros', lambda: db.session.query(R.id_mesero, func.count()).filter(R.fecha == fecha)
+                                     .group_by(R.id_mesero).order_by(func.count().desc()).limit(20).all(),
+         lambda: ranking_meseros(fecha)),
+        ('tarjetas mesero', lambda: db.session.query(func.count(), func.sum(R.numero_personas))
+                                      .filter(R.fecha == fecha, R.id_mesero == mesero_id).one(),
+         lambda: resumen_mesero(fecha, mesero_id)),
+    )
+    click.echo(f'{"consulta":<16} {"agrupando":>12} {"contadores":>12}')
+    for nombre, agrupando, contando in casos:
+        ms_agrupando, esperado = _medir_ms(agrupando, repeticiones)
+        ms_contando, obtenido = _medir_ms(contando, repeticiones)
+        if nombre.startswith('ranking'):
+            # Same hosts with the same counts; ties may come out in another order
+            assert sorted(map(tuple, esperado)) == sorted(map(tuple, obtenido)), f'{nombre}: contadores desalineados'
+        click.echo(f'{nombre:<16} {ms_agrupando:>9.2f} ms {ms_contando:>9.2f} ms')
+
+    hosts = db.session.scalars(select(Host.id_host).limit(20)).all()
+    filas = [dict(id_host=hosts[i % len(hosts)], id_mesero=mesero_id, fecha=fecha, hora=time(14, i % 60),
+                  numero_personas=2, confirmada=False) for i in range(altas)]
+
+    def alta(con_contadores):
+        inicio = _time.perf_counter()
+        for fila in filas:
+            db.session.execute(insert(R), [fila])
+            if con_contadores:
+                contar_altas([SimpleNamespace(**fila)])
+        db.session.flush()
+        ms = (_time.perf_counter() - inicio) * 1000 / altas
+        db.session.rollback()
+        return ms
+
+    click.echo(f'alta: {alta(False):.3f} ms sola, {alta(True):.3f} ms con contadores (por registro)')
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+@bench.command('fanout')
+@click.option('--suscriptores', type=int, default=1000)
+@click.option('--eventos', type=int, default=50)
+@click.option('--equipos', type=int, default=10, help='Canales equipo:<n> entre los que se reparten.')
+def fanout(suscriptores, eventos, equipos):
+    """Reparte eventos SSE a muchos suscriptores locales; mide memoria y latencia"""
+    b = Broker(max_cola=eventos + 1)
+
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    flujos = []
+    for i in range(suscriptores):
+        flujo = b.flujo_sse(b.suscribir('global', f'equipo:{i % equipos}'), heartbeat=30)
+        next(flujo)  # retry: preamble, leaves the generator parked on its queue
+        flujos.append(flujo)
+    por_conexion = (tracemalloc.get_traced_memory()[0] - antes) / suscriptores
+    tracemalloc.stop()
+
+    latencias = []
+    lock = threading.Lock()
+
+    def consumir(flujo):
+        propias = []
+        for _ in range(eventos):
+            datos = json.loads(next(flujo).split('data: ', 1)[1])
+            propias.append(_time.perf_counter() - datos['enviado'])
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=consumir, args=(f,), daemon=True) for f in flujos]
+    for hilo in hilos:
+        hilo.start()
+    inicio = _time.perf_counter()
+    for n in range(eventos):
+        # Every subscriber listens on 'global', so each event reaches all of them once
+        b.publicar(['global', f'equipo:{n % equipos}'], 'registro', {'enviado': _time.perf_counter()})
+    for hilo in hilos:
+        hilo.join()
+    total = _time.perf_counter() - inicio
+
+    entregas = suscriptores * eventos
+    click.echo(f'{suscriptores} suscriptores, {eventos} eventos, {entregas} entregas en {total:.2f} s')
+    click.echo(f'memoria por conexión: {por_conexion / 1024:.1f} KiB (heap de Python, sin hilo)')
+    click.echo(f'latencia  p50 {_percentil(latencias, 50) * 1000:.2f} ms  '
+               f'p95 {_percentil(latencias, 95) * 1000:.2f} ms  '
+               f'p99 {_percentil(latencias, 99) * 1000:.2f} ms  '
+               f'max {max(latencias) * 1000:.2f} ms')
+    assert len(latencias) == entregas and b.conexiones() == suscriptores
+
+
+def _medir_exportacion(desde, hasta):
+    # Consumes a CSV export like a download would: (filas, personas, bytes, segundos, pico)
+    personas_col = [nombre for nombre, _ in COLUMNAS_REGISTROS].index('numero_personas')
+    filas = personas = tamano = 0
+    tracemalloc.start()
+    inicio = _time.perf_counter()
+    for i, pedazo in enumerate(exportacion('registros', 'csv', desde, hasta)):
+        tamano += len(pedazo.encode())
+        lineas = csv.reader(io.StringIO(pedazo))
+        if i == 0:
+            continue  # header
+        for linea in lineas:
+            filas += 1
+            personas += int(linea[personas_col])
+    segundos = _time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return filas, personas, tamano, segundos, pico
+
+
+@bench.command('exportar')
+@solo_base_local
+@click.option('--filas', type=int, default=1_000_000, help='Registros mínimos en la base; siembra los que falten.')
+@click.option('--por-dia', type=int, default=2000, help='Registros sintéticos por día sembrado.')
+def exportar_bench(filas, por_dia):
+    """Exporta a CSV un rango chico y uno de --filas registros y compara memoria pico.
+
+    Valida que el archivo traiga todas las filas del rango y la misma suma de
+    personas que la base. La memoria pico (heap de Python) debe quedar plana
+    aunque el rango crezca diez veces; cargar el rango completo con .all()
+    crece con el número de filas. Siembra registros: sólo contra una base local.
+    """
+    R = RegistroDiarioHosteo
+    existentes = db.session.scalar(select(func.count(R.id_registro_hosteo)))
+    if existentes < filas:
+        antes = db.session.scalar(select(func.min(R.fecha))) or date.today()
+        dias = -(-(filas - existentes) // por_dia)
+        # Older than anything already there, so today's pages stay untouched
+        sembrar_historial(dias, por_dia, hasta=antes - timedelta(days=1))
+        click.echo(f'🌱 Sembrados {dias * por_dia} registros en {dias} días')
+
+    # Ranges ending at the newest day with about a tenth of --filas and --filas rows
+    hasta = db.session.scalar(select(func.max(R.fecha)))
+    por_fecha = db.session.execute(select(R.fecha, func.count()).group_by(R.fecha).order_by(R.fecha.desc())).all()
+    db.session.rollback()
+    acumulado, desde, desde_chico = 0, hasta, None
+    for fecha, conteo in por_fecha:
+        if acumulado >= filas:
+            break
+        acumulado += conteo
+        desde = fecha
+        if desde_chico is None and acumulado >= filas // 10:
+            desde_chico = fecha
+    chico = (desde_chico or desde, hasta)
+
+    click.echo(f'{"rango":<24} {"filas":>9} {"MB":>7} {"s":>6} {"filas/s":>9} {"pico MB":>8}')
+    fallas, picos = 0, []
+    for inicio, fin in (chico, (desde, hasta)):
+        esperado = db.session.execute(select(func.count(R.id_registro_hosteo), func.coalesce(func.sum(R.numero_personas), 0))
+                                      .where(R.fecha >= inicio, R.fecha <= fin)).one()
+        db.session.rollback()
+        n, personas, tamano, segundos, pico = _medir_exportacion(inicio, fin)
+        ok = (n, personas) == tuple(esperado)
+        fallas += not ok
+        picos.append(pico)
+        click.echo(f'{f"{inicio} .. {fin}":<24} {n:>9} {tamano / 2**20:>7.1f} {segundos:>6.2f} '
+                   f'{n / segundos if segundos else 0:>9.0f} {pico / 2**20:>8.2f}  '
+                   f'{"✅" if ok else f"❌ esperado {esperado[0]} filas / {esperado[1]} personas"}')
+
+    tracemalloc.start()
+    db.session.execute(consulta_registros(*chico)).all()
+    pico_todo = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.rollback()
+    click.echo(f'.all() del rango chico para comparar: pico {pico_todo / 2**20:.2f} MB')
+    click.echo('(los tiempos incluyen el costo de tracemalloc y de releer el CSV)')
+
+    # Flat: ten times the rows may not need more than twice the memory
+    plana = picos[1] <= 2 * picos[0] + 2**20
+    click.echo('✅ Memoria plana' if plana else '❌ La memoria crece con el rango')
+    if fallas or not plana:
+        raise SystemExit(1)
+
+
+_CONSULTAS_METRICA = re.compile(r'^db_statements_per_request_(sum|count)\{endpoint="([^"]+)"\} (\S+)$')
+
+
+class _ClientePrueba:
+    """Peticiones in-process con el test client de Flask"""
+
+    def __init__(self, app, cookies=True):
+        self.cliente = app.test_client(use_cookies=cookies)
+
+    def pedir(self, metodo, ruta, form=None, json_=None, headers=None):
+        resp = self.cliente.open(ruta, method=metodo, data=form, json=json_, headers=headers)
+        # The CLI app context outlives each request, so end the session like a real teardown would
+        db.session.remove()
+        return resp.status_code, resp.get_data()
+
+
+class _SinRedirecciones(_urlrequest.HTTPRedirectHandler):
+    # Same as the test client: measure the redirect itself, not the page after it
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ClienteHttp:
+    """Peticiones contra un servidor local ya levantado"""
+
+    def __init__(self, url, timeout=None):
+        self.url = url.rstrip('/')
+        self.abridor = _urlrequest.build_opener(_SinRedirecciones)
+        self.timeout = timeout
+
+    def pedir(self, metodo, ruta, form=None, json_=None, headers=None):
+        headers = dict(headers or {})
+        cuerpo = None
+        if form is not None:
+            cuerpo = _urlparse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_ is not None:
+            cuerpo = json.dumps(json_).encode()
+            headers['Content-Type'] = 'application/json'
+        peticion = _urlrequest.Request(self.url + ruta, data=cuerpo, method=metodo, headers=headers)
+        try:
+            with self.abridor.open(peticion, **({'timeout': self.timeout} if self.timeout else {})) as resp:
+                return resp.status, resp.read()
+        except _urlerror.HTTPError as e:
+            return e.code, e.read()
+
+
+def _consultas_por_endpoint(cliente, headers):
+    # Per-endpoint SQL counters as exposed by /metrics: {endpoint: (suma, conteo)}
+    status, cuerpo = cliente.pedir('GET', '/metrics', headers=headers)
+    if status != 200:
+        raise click.ClickException(f'/metrics respondió {status}; revisa METRICS_TOKEN')
+    valores = {}
+    for linea in cuerpo.decode().splitlines():
+        m = _CONSULTAS_METRICA.match(linea)
+        if m:
+            campo, endpoint, valor = m.groups()
+            valores.setdefault(endpoint, [0.0, 0.0])[campo == 'count'] = float(valor)
+    return valores
+
+
+def _credenciales_bench():
+    """Primer host, su líder y primer mesero con claves conocidas, y la cookie de token del mesero.
+
+    Las claves sólo se guardan como hash, así que no se pueden leer de la
+    base: se reasignan a 'bench-host-<id>', 'bench-lider-<id>' y
+    'bench-mesero-<id>'.
+    """
+    host = Host.query.order_by(Host.id_host).first()
+    mesero = Mesero.query.order_by(Mesero.id_mesero).first()
+    if not host or not mesero:
+        raise click.ClickException('Faltan hosts/meseros; corre `flask init-db` primero')
+    equipo = db.session.get(Equipo, host.id_equipo)
+    cred = SimpleNamespace(host_id=host.id_host, equipo_id=host.id_equipo, mesero_id=mesero.id_mesero,
+                           clave_host=f'bench-host-{host.id_host}', clave_lider=f'bench-lider-{equipo.id_equipo}',
+                           clave_mesero=f'bench-mesero-{mesero.id_mesero}')
+    for obj, clave in ((host, cred.clave_host), (equipo, cred.clave_lider), (mesero, cred.clave_mesero)):
+        # Only when it differs, so a rerun doesn't bump the catalogos version
+        if getattr(obj, COLUMNAS_CLAVE[type(obj)][1]) != huella_clave(clave):
+            asignar_clave(obj, clave)
+    db.session.commit()
+    cred.cookie = {'Cookie': f'{COOKIE_MESERO}={emitir_token_mesero(cred.mesero_id)}'}
+    return cred
+
+
+def _escenarios_rutas():
+    """(nombre, endpoint, método, ruta, form, json) para cada ruta de la app, y (mesero, headers)"""
+    cred = _credenciales_bench()
+    equipo_id = cred.equipo_id
+    host = SimpleNamespace(id_host=cred.host_id)
+    mesero = SimpleNamespace(id_mesero=cred.mesero_id)
+    fecha = db.session.scalar(select(func.max(RegistroDiarioHosteo.fecha))) or date.today()
+    rango = f'fecha_inicio={fecha - timedelta(days=29)}&fecha_fin={fecha}'
+    nuevo = {'id_host': host.id_host, 'id_mesero': mesero.id_mesero, 'numero_personas': 4}
+    return [
+        ('index', 'terraza.index', 'GET', '/', None, None),
+        ('access_host', 'terraza.access_host', 'GET', f'/access/host?clave={_urlparse.quote(cred.clave_host)}', None, None),
+        ('access_mesero', 'terraza.access_mesero', 'GET', f'/access/mesero?clave={_urlparse.quote(cred.clave_mesero)}', None, None),
+        ('access_lider', 'terraza.access_lider', 'GET', f'/access/lider?clave={_urlparse.quote(cred.clave_lider)}', None, None),
+        ('equipo GET', 'terraza.equipo_form', 'GET', f'/equipo/{equipo_id}', None, None),
+        # Runs before the confirm scenarios so the mesero always has a registro today
+        ('equipo POST', 'terraza.equipo_form', 'POST', f'/equipo/{equipo_id}', nuevo, None),
+        # The mesero routes authenticate with the token cookie (see rutas)
+        ('confirmar', 'terraza.confirmar_registro', 'POST', '/api/confirmar/{registro}', None, {'confirmada': True}),
+        ('mesero', 'terraza.vista_mesero', 'GET', f'/mesero/{mesero.id_mesero}', None, None),
+        ('mesero rango', 'terraza.vista_mesero', 'GET', f'/mesero/{mesero.id_mesero}?{rango}', None, None),
+        ('reporte', 'terraza.reporte_equipo', 'GET', f'/reporte/{equipo_id}?fecha={fecha}', None, None),
+        ('reporte rango', 'terraza.reporte_equipo', 'GET', f'/reporte/{equipo_id}?{rango}', None, None),
+        ('reporte host', 'terraza.reporte_host', 'GET', f'/reporte/{equipo_id}/host/{host.id_host}?fecha={fecha}', None, None),
+        ('reporte-total', 'terraza.reporte_total', 'GET', f'/reporte-total?fecha={fecha}', None, None),
+        ('reporte-total rango', 'terraza.reporte_total', 'GET', f'/reporte-total?{rango}', None, None),
+        ('tendencia', 'terraza.tendencia', 'GET', f'/api/tendencia?{rango}', None, None),
+    ], mesero.id_mesero, cred.cookie
+
+
+@bench.command('rutas')
+@solo_base_local
+@click.option('--url', default=None, help='Servidor local ya levantado (p. ej. http://127.0.0.1:5000); '
+                                          'por default usa el test client en este proceso.')
+@click.option('--repeticiones', type=int, default=50)
+@click.option('--calentamiento', type=int, default=5, help='Peticiones por ruta que no se miden.')
+@click.option('--base', 'ruta_base', type=click.Path(dir_okay=False), default='bench_rutas.json',
+              help='Archivo de resultados base contra el que se compara.')
+@click.option('--guardar', is_flag=True, help='Guarda esta corrida como la nueva base.')
+@click.option('--tolerancia', type=float, default=0.25, help='Aumento de p50 aceptado antes de marcar regresión.')
+def rutas(url, repeticiones, calentamiento, ruta_base, guardar, tolerancia):
+    """Mide p50/p95/p99 y consultas por request de cada ruta y compara con la base.
+
+    Escribe en la base (altas y confirmaciones): sólo contra una base local. Con
+    --url, el servidor debe usar la misma DATABASE_URL que este comando.
+    Termina con código 1 si alguna ruta empeora respecto a la base.
+    """
+    app = current_app._get_current_object()
+    cliente = _ClienteHttp(url) if url else _ClientePrueba(app)
+    token = app.config.get('METRICS_TOKEN')
+    headers_metricas = {'Authorization': f'Bearer {token}'} if token else None
+    escenarios, mesero_id, cookie = _escenarios_rutas()
+
+    resultados = {}
+    click.echo(f'{"ruta":<22} {"p50":>8} {"p95":>8} {"p99":>8} {"consultas":>10}')
+    for nombre, endpoint, metodo, ruta, form, json_ in escenarios:
+        if '{registro}' in ruta:
+            registro = db.session.scalar(select(func.max(RegistroDiarioHosteo.id_registro_hosteo))
+                                         .where(RegistroDiarioHosteo.id_mesero == mesero_id))
+            db.session.rollback()
+            ruta = ruta.format(registro=registro)
+        for _ in range(calentamiento):
+            cliente.pedir(metodo, ruta, form=form, json_=json_, headers=cookie)
+
+        antes = _consultas_por_endpoint(cliente, headers_metricas).get(endpoint, [0.0, 0.0])
+        latencias, estados = [], set()
+        for i in range(repeticiones):
+            if json_ and 'confirmada' in json_:
+                # Alternate so every request is a real write
+                json_ = dict(json_, confirmada=i % 2 == 0)
+            inicio = _time.perf_counter()
+            status, _ = cliente.pedir(metodo, ruta, form=form, json_=json_, headers=cookie)
+            latencias.append((_time.perf_counter() - inicio) * 1000)
+            estados.add(status)
+        despues = _consultas_por_endpoint(cliente, headers_metricas).get(endpoint, [0.0, 0.0])
+        peticiones = despues[1] - antes[1]
+        consultas = (despues[0] - antes[0]) / peticiones if peticiones else None
+
+        resultados[nombre] = {'p50': _percentil(latencias, 50), 'p95': _percentil(latencias, 95),
+                              'p99': _percentil(latencias, 99), 'consultas': consultas,
+                              'status': sorted(estados)}
+        r = resultados[nombre]
+        click.echo(f'{nombre:<22} {r["p50"]:>6.2f}ms {r["p95"]:>6.2f}ms {r["p99"]:>6.2f}ms '
+                   f'{"-" if consultas is None else f"{consultas:.1f}":>10}  {",".join(map(str, r["status"]))}')
+
+    corrida = {'motor': db.engine.dialect.name, 'url': url,
+               'registros': db.session.scalar(select(func.count(RegistroDiarioHosteo.id_registro_hosteo))),
+               'repeticiones': repeticiones, 'rutas': resultados}
+    db.session.rollback()
+
+    regresiones = []
+    try:
+        with open(ruta_base) as f:
+            base = json.load(f)
+    except FileNotFoundError:
+        base = None
+    if base and not guardar:
+        click.echo(f'\nComparando con {ruta_base} ({base["motor"]}, {base["registros"]} registros)')
+        for nombre, r in resultados.items():
+            previo = base['rutas'].get(nombre)
+            if previo is None:
+                continue
+            # p50 is compared because p95/p99 of a short run are dominated by a few outliers;
+            # the 1 ms floor keeps jitter on trivial routes from being flagged
+            if r['p50'] > previo['p50'] * (1 + tolerancia) and r['p50'] - previo['p50'] > 1:
+                regresiones.append(f'{nombre}: p50 {previo["p50"]:.2f} -> {r["p50"]:.2f} ms')
+            if r['consultas'] is not None and previo['consultas'] is not None \
+                    and r['consultas'] > previo['consultas'] + 0.5:
+                regresiones.append(f'{nombre}: consultas {previo["consultas"]:.1f} -> {r["consultas"]:.1f}')
+        for linea in regresiones:
+            click.echo(f'⚠️  REGRESIÓN {linea}')
+        if not regresiones:
+            click.echo('✅ Sin regresiones')
+    if guardar or base is None:
+        with open(ruta_base, 'w') as f:
+            json.dump(corrida, f, indent=2)
+        click.echo(f'\nBase guardada en {ruta_base}')
+    if regresiones:
+        raise SystemExit(1)
+
+
+class _ServidorHilos(BaseWSGIServer):
+    """Servidor local con un pool fijo de hilos, como un worker gthread de gunicorn.
+
+    El `threaded=True` de werkzeug abre un hilo por conexión y nunca se satura;
+    con un pool fijo sí se nota cuando los flujos SSE acaparan los hilos.
+    """
+
+    def __init__(self, app, hilos):
+        super().__init__('127.0.0.1', 0, app)
+        self.pool = ThreadPoolExecutor(hilos, thread_name_prefix='bench-http')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _escuchar_sse(url):
+    # Reads until the server ends the stream (cap reached, overflow or shutdown)
+    try:
+        with _urlrequest.urlopen(url) as resp:
+            while resp.readline():
+                pass
+    except (OSError, _urlerror.URLError):
+        pass
+
+
+def _conexiones_sse(cliente, headers):
+    try:
+        status, cuerpo = cliente.pedir('GET', '/metrics', headers=headers)
+    except (OSError, _urlerror.URLError):
+        # No free thread to answer: the streams took them all
+        return None
+    m = re.search(r'^sse_connections (\d+)$', cuerpo.decode(), re.M) if status == 200 else None
+    return int(m.group(1)) if m else None
+
+
+def _apagar(servidor, flujos, timeout):
+    # What gunicorn's SIGTERM hook does (gunicorn.conf.py): end the streams, then stop
+    inicio = _time.perf_counter()
+    broker_app.cerrar()
+    for hilo in flujos:
+        hilo.join(timeout=timeout)
+    vivos = sum(hilo.is_alive() for hilo in flujos)
+    servidor.shutdown()
+    servidor.pool.shutdown(wait=True)
+    servidor.server_close()
+    if flujos:
+        click.echo(f'Apagado: {len(flujos) - vivos}/{len(flujos)} flujos SSE cerrados en '
+                   f'{(_time.perf_counter() - inicio) * 1000:.0f} ms')
+
+
+@bench.command('concurrencia')
+@solo_base_local
+@click.option('--url', default=None, help='Servidor ya levantado (p. ej. gunicorn -c gunicorn.conf.py wsgi:app); '
+                                          'por default levanta uno local con --hilos hilos.')
+@click.option('--hilos', type=int, default=8, help='Hilos del servidor local (como THREADS en gunicorn).')
+@click.option('--clientes', type=int, multiple=True, default=(1, 4, 16))
+@click.option('--duracion', type=float, default=5.0, help='Segundos de carga por nivel de clientes.')
+@click.option('--sse', type=int, default=0, help='Flujos SSE que se abren antes de la carga y quedan abiertos.')
+@click.option('--timeout', type=float, default=10.0, help='Segundos antes de contar un request como error.')
+def concurrencia(url, hilos, clientes, duracion, sse, timeout):
+    """Throughput y p50/p95 con 1, 4 y 16 clientes concurrentes sobre una mezcla de rutas.
+
+    La mezcla es reporte, equipo y vista de mesero (GET) con altas por POST:
+    escribe en la base, así que sólo contra una base local. Con --sse, los
+    flujos abiertos no deben dejar sin hilos a los POST; al final el servidor
+    local se apaga como lo haría un worker y se mide cuánto tardan en cerrarse.
+    """
+    app = current_app._get_current_object()
+    token = app.config.get('METRICS_TOKEN')
+    headers_metricas = {'Authorization': f'Bearer {token}'} if token else None
+    escenarios, _, cookie = _escenarios_rutas()
+    escenarios = {e[0]: e for e in escenarios}
+    db.session.remove()
+    mezcla = [escenarios['reporte']] * 3 + [escenarios['equipo GET']] * 3 + \
+        [escenarios['mesero']] * 3 + [escenarios['equipo POST']]
+
+    servidor = None
+    if url is None:
+        # One line per request would drown the table
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        servidor = _ServidorHilos(app, hilos)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{servidor.server_port}'
+        click.echo(f'Servidor local en {url} con {hilos} hilos; '
+                   f'SSE_MAX_CONEXIONES={app.config["SSE_MAX_CONEXIONES"]}')
+    cliente_metricas = _ClienteHttp(url, timeout)
+
+    # Half on the global channel, half on the equipo the load writes to
+    canales = ['/stream/global', escenarios['equipo GET'][3].replace('/equipo/', '/stream/equipo/')]
+    flujos = []
+    try:
+        for i in range(sse):
+            hilo = threading.Thread(target=_escuchar_sse, args=(url + canales[i % 2],), daemon=True)
+            hilo.start()
+            flujos.append(hilo)
+        if sse:
+            _time.sleep(0.5)
+            abiertas = _conexiones_sse(cliente_metricas, headers_metricas)
+            click.echo(f'{sse} flujos SSE pedidos, {"?" if abiertas is None else abiertas} abiertos en el servidor')
+
+        click.echo(f'{"clientes":>8} {"req/s":>8} {"p50":>8} {"p95":>8} {"POST p95":>9} {"errores":>8}')
+        for n in clientes:
+            fin = _time.perf_counter() + duracion
+            muestras, lock = [], threading.Lock()
+
+            def cargar(semilla):
+                rng = random.Random(semilla)
+                cliente = _ClienteHttp(url, timeout)
+                propias = []
+                while _time.perf_counter() < fin:
+                    _, _, metodo, ruta, form, json_ = rng.choice(mezcla)
+                    inicio = _time.perf_counter()
+                    try:
+                        status, _ = cliente.pedir(metodo, ruta, form=form, json_=json_, headers=cookie)
+                    except (OSError, _urlerror.URLError):
+                        status = None
+                    propias.append((metodo, (_time.perf_counter() - inicio) * 1000, status))
+                with lock:
+                    muestras.extend(propias)
+
+            hilos_carga = [threading.Thread(target=cargar, args=(i,)) for i in range(n)]
+            for hilo in hilos_carga:
+                hilo.start()
+            for hilo in hilos_carga:
+                hilo.join()
+
+            latencias = [ms for _, ms, _ in muestras]
+            posts = [ms for metodo, ms, _ in muestras if metodo == 'POST']
+            errores = sum(1 for _, _, status in muestras if status is None or status >= 500)
+            click.echo(f'{n:>8} {len(muestras) / duracion:>8.1f} {_percentil(latencias, 50):>6.1f}ms '
+                       f'{_percentil(latencias, 95):>6.1f}ms '
+                       f'{f"{_percentil(posts, 95):.1f}ms" if posts else "-":>9} {errores:>8}')
+    finally:
+        if servidor is not None:
+            _apagar(servidor, flujos, timeout)
+
+
+def _contexto_mesero(filas):
+    equipo = SimpleNamespace(id_equipo=1)
+    registros = [SimpleNamespace(id_registro_hosteo=i, hora=time(13 + i % 11, i % 60),
+                                 host=SimpleNamespace(nombre_host=f'Host {i % 7}', equipo=equipo),
+                                 numero_personas=1 + i % 8, confirmada=i % 3 == 0)
+                 for i in range(filas)]
+    return dict(mesero=SimpleNamespace(id_mesero=1, nombre_mesero='Mesero'), registros=registros,
+                dias=[], rango_cerrado=False, paginacion={}, fecha_reporte=date.today().isoformat(),
+                fecha_inicio=None, fecha_fin=None,
+                total_hosteos=filas, confirmados=filas // 3, no_confirmados=filas - filas // 3,
+                total_personas=filas * 4, personas_confirmadas=filas)
+
+
+@bench.command('plantillas')
+@click.option('--hilos', default='1,4,16', help='Niveles de concurrencia separados por coma.')
+@click.option('--renders', type=int, default=200, help='Renders por hilo.')
+@click.option('--filas', type=int, default=50, help='Registros en la vista de mesero.')
+def plantillas(hilos, renders, filas):
+    """Render por request: inline con render_template_string (antes) contra template compilado (ahora)"""
+    app = current_app._get_current_object()
+    casos = {'index': {}, 'mesero': _contexto_mesero(filas)}
+    fuentes = {nombre: app.jinja_loader.get_source(app.jinja_env, f'{nombre}.html')[0] for nombre in casos}
+    modos = {
+        # What index() and vista_mesero() did: parse and compile the source on every call
+        'string': lambda nombre: render_template_string(fuentes[nombre], **casos[nombre]),
+        'archivo': lambda nombre: render_template(f'{nombre}.html', **casos[nombre]),
+    }
+
+    click.echo(f'{"vista":<8} {"modo":<8} {"hilos":>5} {"p50":>9} {"p95":>9} {"renders/s":>10}')
+    for nombre in casos:
+        for modo, renderizar in modos.items():
+            for n in (int(h) for h in hilos.split(',')):
+                latencias = []
+                lock = threading.Lock()
+
+                def trabajar():
+                    propias = []
+                    with app.test_request_context('/'):
+                        for _ in range(renders):
+                            inicio = _time.perf_counter()
+                            renderizar(nombre)
+                            propias.append(_time.perf_counter() - inicio)
+                    with lock:
+                        latencias.extend(propias)
+
+                hilos_ = [threading.Thread(target=trabajar) for _ in range(n)]
+                inicio = _time.perf_counter()
+                for hilo in hilos_:
+                    hilo.start()
+                for hilo in hilos_:
+                    hilo.join()
+                total = _time.perf_counter() - inicio
+                click.echo(f'{nombre:<8} {modo:<8} {n:>5} {_percentil(latencias, 50) * 1000:>7.3f}ms '
+                           f'{_percentil(latencias, 95) * 1000:>7.3f}ms {len(latencias) / total:>10.0f}')
+
+    # Cold start of a new worker: compile every template, or load it from the bytecode cache
+    nombres = [n for n in app.jinja_loader.list_templates() if n.endswith('.html')]
+    for etiqueta, con_bytecode in (('sin cache de bytecode', False), ('con cache de bytecode', True)):
+        if con_bytecode and app.jinja_env.bytecode_cache is None:
+            click.echo('JINJA_BYTECODE_CACHE_DIR vacío: sin cache de bytecode que medir')
+            break
+        if con_bytecode:
+            # Populate the disk cache the way the first worker would
+            for plantilla in nombres:
+                app.create_jinja_environment().get_template(plantilla)
+        entorno = app.create_jinja_environment()
+        if not con_bytecode:
+            entorno.bytecode_cache = None
+        inicio = _time.perf_counter()
+        for plantilla in nombres:
+            entorno.get_template(plantilla)
+        click.echo(f'arranque, {etiqueta}: {(_time.perf_counter() - inicio) * 1000:.1f} ms '
+                   f'para {len(nombres)} templates')
+
+
+_TOTAL_HOSTEOS = re.compile(rb'data-stat="total_hosteos">(\d+)<')
+
+
+@bench.command('replica')
+@solo_base_local
+def replica():
+    """Comprueba el enrutamiento primaria/réplica con dos bases locales.
+
+    Usa DATABASE_URL como primaria y DATABASE_REPLICA_URL como réplica; para
+    SQLite basta copiar el archivo (cp primaria.db replica.db). Como la copia no
+    se replica, las altas de este comando sólo existen en la primaria y los
+    reportes, que leen de la réplica, no deben verlas.
+    """
+    app = current_app._get_current_object()
+    engines = db.engines
+    if REPLICA not in engines:
+        raise click.ClickException('Configura DATABASE_REPLICA_URL con una copia local de la base')
+
+    conteos = defaultdict(Counter)
+    caso = [None]
+    for nombre, engine in (('primaria', engines[None]), ('réplica', engines[REPLICA])):
+        event.listen(engine, 'before_cursor_execute',
+                     lambda *args, nombre=nombre: conteos[caso[0]].update([nombre]))
+
+    cred = _credenciales_bench()
+    host = SimpleNamespace(id_host=cred.host_id, id_equipo=cred.equipo_id)
+    mesero = SimpleNamespace(id_mesero=cred.mesero_id)
+    hoy = datetime.now(ZoneInfo(app.config['TIMEZONE'])).date()
+    db.session.remove()
+    cliente = _ClientePrueba(app)
+
+    def pedir(nombre, metodo, ruta, **kwargs):
+        caso[0] = nombre
+        status, cuerpo = cliente.pedir(metodo, ruta, **kwargs)
+        caso[0] = None
+        return status, cuerpo
+
+    _, antes = pedir('reporte (antes)', 'GET', f'/reporte/{host.id_equipo}?fecha={hoy}')
+    for _ in range(3):
+        pedir('alta', 'POST', f'/equipo/{host.id_equipo}',
+              form={'id_host': host.id_host, 'id_mesero': mesero.id_mesero, 'numero_personas': 2})
+    registro = db.session.scalar(select(func.max(RegistroDiarioHosteo.id_registro_hosteo)))
+    db.session.remove()
+    pedir('confirmar', 'POST', f'/api/confirmar/{registro}', json_={'confirmada': True}, headers=cred.cookie)
+    pedir('equipo GET', 'GET', f'/equipo/{host.id_equipo}')
+    _, despues = pedir('reporte', 'GET', f'/reporte/{host.id_equipo}?fecha={hoy}')
+    pedir('reporte host', 'GET', f'/reporte/{host.id_equipo}/host/{host.id_host}?fecha={hoy}')
+    pedir('reporte-total', 'GET', f'/reporte-total?fecha={hoy}')
+    pedir('tendencia', 'GET', f'/api/tendencia?fecha_inicio={hoy - timedelta(days=6)}&fecha_fin={hoy}')
+
+    esperado = {'alta': 'primaria', 'confirmar': 'primaria', 'equipo GET': 'primaria',
+                'reporte': 'réplica', 'reporte host': 'réplica', 'reporte-total': 'réplica', 'tendencia': 'réplica'}
+    fallas = 0
+    click.echo(f'{"caso":<16} {"primaria":>9} {"réplica":>9}')
+    for nombre, destino in esperado.items():
+        c = conteos[nombre]
+        otro = 'réplica' if destino == 'primaria' else 'primaria'
+        ok = c[destino] > 0 and c[otro] == 0
+        fallas += not ok
+        click.echo(f'{nombre:<16} {c["primaria"]:>9} {c["réplica"]:>9}  {"✅" if ok else "❌"} esperado: {destino}')
+
+    # The copy is not replicated, so the report must still show the old total
+    total_antes, total_despues = (int(_TOTAL_HOSTEOS.search(html).group(1)) for html in (antes, despues))
+    ok = total_antes == total_despues
+    fallas += not ok
+    click.echo(f'total del reporte antes/después de 3 altas: {total_antes}/{total_despues}  '
+               f'{"✅ leído de la réplica" if ok else "❌ el reporte vio las altas de la primaria"}')
+    if fallas:
+        raise SystemExit(1)
+
+
+@bench.command('auth')
+@solo_base_local
+@click.option('--repeticiones', type=int, default=2000, help='Llamadas por caso en la parte de funciones.')
+@click.option('--peticiones', type=int, default=200, help='Peticiones por caso en la parte de rutas.')
+def auth(repeticiones, peticiones):
+    """Costo de autenticar a un mesero por request: clave en texto plano, hash con y sin cache, y token.
+
+    Reasigna claves conocidas al primer host, líder y mesero, y alterna la
+    confirmación de un registro del mesero: sólo contra una base local.
+    """
+    app = current_app._get_current_object()
+    cred = _credenciales_bench()
+    token = emitir_token_mesero(cred.mesero_id)
+    consultas = [0]
+    contar = lambda *args: consultas.__setitem__(0, consultas[0] + 1)
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        def sin_cache():
+            claves_cache.invalidar()
+            return mesero_por_clave(cred.clave_mesero)
+
+        casos = (
+            # What every access and confirmation ran before: equality on the plaintext column
+            ('texto plano (antes)', lambda: Mesero.query.filter_by(clave_mesero=cred.clave_mesero).first()),
+            ('hash, sin cache', sin_cache),
+            ('hash, en cache', lambda: mesero_por_clave(cred.clave_mesero)),
+            ('token firmado', lambda: mesero_del_token(token)),
+        )
+        click.echo(f'{"autenticación":<22} {"µs/llamada":>11} {"consultas":>10}')
+        for nombre, fn in casos:
+            fn()
+            consultas[0] = 0
+            ms, _ = _medir_ms(fn, repeticiones)
+            click.echo(f'{nombre:<22} {ms * 1000:>11.1f} {consultas[0] / repeticiones:>10.1f}')
+        db.session.rollback()
+
+        registro = db.session.scalar(select(func.max(RegistroDiarioHosteo.id_registro_hosteo))
+                                     .where(RegistroDiarioHosteo.id_mesero == cred.mesero_id))
+        if registro is None:
+            raise click.ClickException('El mesero no tiene registros; corre `flask bench rutas` o `flask generar-datos`')
+        db.session.remove()
+
+        # Cold cache = a worker whose cache expired or never saw this clave
+        rutas = (
+            ('confirmar, clave sin cache', 'POST', f'/api/confirmar/{registro}',
+             {'mesero_clave': cred.clave_mesero}, None, claves_cache.invalidar),
+            ('confirmar, clave en cache', 'POST', f'/api/confirmar/{registro}',
+             {'mesero_clave': cred.clave_mesero}, None, None),
+            ('confirmar, token', 'POST', f'/api/confirmar/{registro}', {}, cred.cookie, None),
+            ('mesero, token', 'GET', f'/mesero/{cred.mesero_id}', None, cred.cookie, None),
+            ('mesero, ?clave= (canje)', 'GET', f'/mesero/{cred.mesero_id}?clave={cred.clave_mesero}', None, None, None),
+        )
+        click.echo(f'\n{"ruta":<26} {"p50":>8} {"p95":>8} {"consultas":>10}')
+        for nombre, metodo, ruta, json_, headers, antes in rutas:
+            # No cookie jar: each case authenticates only with what it sends
+            cliente = _ClientePrueba(app, cookies=False)
+            latencias, estados = [], set()
+            consultas[0] = 0
+            for i in range(peticiones):
+                if antes:
+                    antes()
+                cuerpo = dict(json_, confirmada=i % 2 == 0) if json_ is not None else None
+                inicio = _time.perf_counter()
+                status, _ = cliente.pedir(metodo, ruta, json_=cuerpo, headers=headers)
+                latencias.append((_time.perf_counter() - inicio) * 1000)
+                estados.add(status)
+            click.echo(f'{nombre:<26} {_percentil(latencias, 50):>6.2f}ms {_percentil(latencias, 95):>6.2f}ms '
+                       f'{consultas[0] / peticiones:>10.1f}  {",".join(map(str, sorted(estados)))}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
@@ -0,0 +1,62 @@
+"""Cache en proceso con TTL y tamaño acotado (LRU).
+
+Cada proceso de la app tiene sus propias copias: una invalidación sólo limpia
+el proceso que hizo el cambio y los demás se ponen al día al vencer el TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Every cache created registers itself here so /metrics and the CLI can list them
+CACHES = {}
+
+
+class TTLCache:
+    """Mapa clave -> valor con vencimiento por TTL y desalojo LRU al llenarse"""
+
+    def __init__(self, nombre, maxsize=1024, ttl=300):
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[nombre] = self
+
+    def get(self, clave, cargar):
+        """Regresa el valor cacheado o lo calcula con `cargar()`.
+
+        Un resultado None no se guarda: las claves inválidas siempre van a la
+        base y un alta nueva se ve de inmediato.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                self._datos.move_to_end(clave)
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+
+        valor = cargar()
+        if valor is None:
+            return None
+        with self._lock:
+            self._datos[clave] = (ahora + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+        return valor
+
+    def invalidar(self, clave=None):
+        """Borra una clave, o todo el cache si no se indica ninguna"""
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'tamano': len(self._datos)}
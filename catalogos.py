@@ -0,0 +1,101 @@
+"""Datos de referencia cacheados: equipos, hosts, meseros y sus claves.
+
+Cambian muy rara vez, pero se consultan en cada acceso, en cada confirmación
+y en cada carga de la pantalla de equipo. Los valores cacheados son copias
+planas (SimpleNamespace) con los mismos atributos que leen los templates,
+nunca instancias del ORM ligadas a una sesión.
+"""
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from credenciales import huella_clave
+from models import Equipo, Host, Mesero
+
+_CAMPOS_EQUIPO = ('id_equipo', 'lider_equipo')
+_CAMPOS_HOST = ('id_host', 'id_equipo', 'nombre_host')
+_CAMPOS_MESERO = ('id_mesero', 'nombre_mesero')
+
+claves_cache = TTLCache('claves')
+referencias_cache = TTLCache('referencias')
+
+
+def configurar_caches(app):
+    for cache in (claves_cache, referencias_cache):
+        cache.ttl = app.config['REFERENCIAS_CACHE_TTL']
+        cache.maxsize = app.config['REFERENCIAS_CACHE_MAX']
+
+
+def invalidar_referencias():
+    claves_cache.invalidar()
+    referencias_cache.invalidar()
+
+
+def _foto(obj, campos):
+    return SimpleNamespace(**{c: getattr(obj, c) for c in campos}) if obj else None
+
+
+# Lookups by clave go through its HMAC: the plaintext is never queried nor
+# kept as a cache key. An empty clave never reaches the database
+def host_por_clave(clave):
+    if not clave:
+        return None
+    huella = huella_clave(clave)
+    return claves_cache.get(('host', huella), lambda: _foto(
+        Host.query.filter_by(clave_host_hash=huella).first(), _CAMPOS_HOST))
+
+def mesero_por_clave(clave):
+    if not clave:
+        return None
+    huella = huella_clave(clave)
+    return claves_cache.get(('mesero', huella), lambda: _foto(
+        Mesero.query.filter_by(clave_mesero_hash=huella).first(), _CAMPOS_MESERO))
+
+def equipo_por_clave_lider(clave):
+    if not clave:
+        return None
+    huella = huella_clave(clave)
+    return claves_cache.get(('lider', huella), lambda: _foto(
+        Equipo.query.filter_by(clave_lider_hash=huella).first(), _CAMPOS_EQUIPO))
+
+
+# Lookups by id and lists
+def get_equipo(equipo_id):
+    return referencias_cache.get(('equipo', equipo_id), lambda: _foto(
+        Equipo.query.get(equipo_id), _CAMPOS_EQUIPO))
+
+def get_host(host_id):
+    return referencias_cache.get(('host', host_id), lambda: _foto(
+        Host.query.get(host_id), _CAMPOS_HOST))
+
+def get_mesero(mesero_id):
+    return referencias_cache.get(('mesero', mesero_id), lambda: _foto(
+        Mesero.query.get(mesero_id), _CAMPOS_MESERO))
+
+def hosts_de_equipo(equipo_id):
+    return referencias_cache.get(('hosts', equipo_id), lambda: [
+        _foto(h, _CAMPOS_HOST) for h in Host.query.filter_by(id_equipo=equipo_id).all()])
+
+def lista_meseros():
+    return referencias_cache.get('meseros', lambda: [
+        _foto(m, _CAMPOS_MESERO) for m in Mesero.query.all()])
+
+
+# Invalidation hooks: any committed change to an Equipo, Host or Mesero drops
+# both caches. The flag is set on flush and acted on after commit so a
+# rolled-back change never evicts anything.
+_REFERENCIAS = (Equipo, Host, Mesero)
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_cambios(session, flush_context):
+    if any(isinstance(obj, _REFERENCIAS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['invalidar_referencias'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_tras_commit(session):
+    if session.info.pop('invalidar_referencias', False):
+        invalidar_referencias()
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marca(session):
+    session.info.pop('invalidar_referencias', None)
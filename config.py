@@ -3,10 +3,75 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def opciones_engine(url):
+    """Opciones del pool para una URL; las de tamaño sólo aplican fuera de SQLite"""
+    opciones = {
+        # Checks the connection on checkout: the hosted Postgres drops idle ones
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if url and not url.startswith('sqlite'):
+        opciones.update(
+            pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        )
+        timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+        if timeout_ms and url.startswith('postgres'):
+            # Sent as a startup option; the pooler in transaction mode may not accept it
+            opciones['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return opciones
+
+
 class Config:
     # Tu connection string de Supabase
     # Formato: postgresql://postgres:[PASSWORD]@[HOST]/postgres
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_engine(SQLALCHEMY_DATABASE_URI)
+    # Réplica de sólo lectura opcional para los reportes (ver enrutamiento.py)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = ({'replica': {'url': DATABASE_REPLICA_URL, **opciones_engine(DATABASE_REPLICA_URL)}}
+                        if DATABASE_REPLICA_URL else {})
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'tu-secret-key-super-segura')
-    TIMEZONE = 'America/Mexico_City'
\ No newline at end of file
+    # Llave del HMAC de las claves guardadas. Si cambia, las claves dejan de
+    # coincidir: fíjala aparte antes de rotar SECRET_KEY
+    CLAVE_HMAC_KEY = os.getenv('CLAVE_HMAC_KEY', SECRET_KEY)
+    # Vigencia del token de sesión de mesero (un turno) y cookies sólo por HTTPS
+    TOKEN_MESERO_SEGUNDOS = int(os.getenv('TOKEN_MESERO_SEGUNDOS', 12 * 3600))
+    SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', '0') == '1'
+    TIMEZONE = 'America/Mexico_City'
+    # Filas por página en las tablas de registros (paginación keyset)
+    REGISTROS_POR_PAGINA = int(os.getenv('REGISTROS_POR_PAGINA', 50))
+    # Cache en proceso de claves y catálogos (equipos, hosts, meseros)
+    REFERENCIAS_CACHE_TTL = int(os.getenv('REFERENCIAS_CACHE_TTL', 300))
+    REFERENCIAS_CACHE_MAX = int(os.getenv('REFERENCIAS_CACHE_MAX', 1024))
+    # Segundos entre pings de las conexiones SSE (/stream/...)
+    SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', 15))
+    # Conexiones SSE por proceso: cada una ocupa un hilo del worker, así que por
+    # default se deja la mitad de THREADS libre para requests cortos
+    SSE_MAX_CONEXIONES = int(os.getenv('SSE_MAX_CONEXIONES', max(1, int(os.getenv('THREADS', 32)) // 2)))
+    SSE_REINTENTO_MS = int(os.getenv('SSE_REINTENTO_MS', 30000))
+    # Máximo de cambios aceptados por POST /api/confirmar
+    MAX_CONFIRMACIONES_POR_LOTE = int(os.getenv('MAX_CONFIRMACIONES_POR_LOTE', 200))
+    # Ingesta por lote desde las tablets (POST /api/equipo/<id>/registros)
+    MAX_REGISTROS_POR_LOTE = int(os.getenv('MAX_REGISTROS_POR_LOTE', 200))
+    INGESTA_MAX_ANTIGUEDAD_HORAS = int(os.getenv('INGESTA_MAX_ANTIGUEDAD_HORAS', 24))
+    # Observabilidad: nivel del log de la app, umbral del log de requests
+    # lentos (0 = apagado) y token opcional para GET /metrics
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 0))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Templates: bytecode compilado en disco (sin definir = directorio privado
+    # de Jinja por usuario, '' = apagado) y cache de HTML de fragmentos de
+    # rangos cerrados (TTL en segundos, 0 = apagado)
+    JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR')
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 0))
+    FRAGMENT_CACHE_MAX = int(os.getenv('FRAGMENT_CACHE_MAX', 256))
+    # Retención: días con registros crudos en la base y destino de los archivos
+    # de `flask archivar-registros` (los cortes y resúmenes no se archivan)
+    RETENCION_DIAS = int(os.getenv('RETENCION_DIAS', 730))
+    ARCHIVO_DIR = os.getenv('ARCHIVO_DIR', 'archivo')
+    # Cache-Control max-age (segundos) de reportes de días cerrados
+    REPORTE_MAX_AGE_PASADO = int(os.getenv('REPORTE_MAX_AGE_PASADO', 86400))
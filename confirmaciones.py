@@ -0,0 +1,63 @@
+"""Confirmación de registros por lote para un mesero.
+
+Autoriza todo el lote con una consulta, aplica los cambios con un solo UPDATE
+y deja el commit a cargo de quien llama. El UPDATE sólo toca las filas cuyo
+valor es distinto del nuevo y regresa esas filas: los contadores, y el corte
+de los días cerrados, se ajustan con la diferencia dentro de la misma
+transacción, aunque otra petición cambie el mismo registro al mismo tiempo.
+"""
+from types import SimpleNamespace
+from sqlalchemy import case, update
+from models import db, RegistroDiarioHosteo
+from contadores import contar_confirmaciones
+from versiones import marcar_fechas
+
+_COLUMNAS = ('id_registro_hosteo', 'id_host', 'id_mesero', 'fecha', 'hora',
+             'numero_personas', 'confirmada')
+
+
+def aplicar_confirmaciones(mesero_id, pares, hoy):
+    """Aplica pares (id_registro_hosteo, confirmada) del mesero indicado.
+
+    Si un id se repite gana el último valor. Regresa (resultados, cambiados):
+    un dict por id con 'success' y 'confirmada' o 'error'/'status', y los
+    registros cuyo valor cambió realmente, ya con el valor nuevo, para
+    publicarlos después del commit.
+    """
+    deseados = {int(id_registro): bool(confirmada) for id_registro, confirmada in pares}
+    if not deseados:
+        return {}, []
+
+    actuales = dict(db.session.query(RegistroDiarioHosteo.id_registro_hosteo, RegistroDiarioHosteo.id_mesero)
+                    .filter(RegistroDiarioHosteo.id_registro_hosteo.in_(deseados)))
+
+    resultados, nuevos = {}, {}
+    for id_registro, confirmada in deseados.items():
+        if id_registro not in actuales:
+            resultados[id_registro] = {'success': False, 'error': 'No encontrado', 'status': 404}
+        elif actuales[id_registro] != mesero_id:
+            resultados[id_registro] = {'success': False, 'error': 'No autorizado', 'status': 403}
+        else:
+            resultados[id_registro] = {'success': True, 'confirmada': confirmada}
+            nuevos[id_registro] = confirmada
+
+    if not nuevos:
+        return resultados, []
+    # The value read above may already be stale: the UPDATE itself decides which
+    # rows change. A concurrent toggle to the same value waits for this row lock
+    # and then no longer matches, so each change is counted once
+    nuevo = case(nuevos, value=RegistroDiarioHosteo.id_registro_hosteo)
+    cambiados = [SimpleNamespace(**fila._mapping) for fila in db.session.execute(
+        update(RegistroDiarioHosteo)
+        .where(RegistroDiarioHosteo.id_registro_hosteo.in_(nuevos),
+               RegistroDiarioHosteo.id_mesero == mesero_id,
+               RegistroDiarioHosteo.confirmada.is_distinct_from(nuevo))
+        .values(confirmada=nuevo)
+        .returning(*(getattr(RegistroDiarioHosteo, c) for c in _COLUMNAS))
+        .execution_options(synchronize_session=False)
+    )]
+    if cambiados:
+        contar_confirmaciones(cambiados, hoy)
+        marcar_fechas({r.fecha for r in cambiados})
+
+    return resultados, cambiados
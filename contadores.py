@@ -0,0 +1,120 @@
+"""Contadores por (fecha, host) y (fecha, mesero) mantenidos en cada escritura.
+
+ResumenHostDiario y ResumenMeseroDiario ya no esperan al cierre del día: cada
+alta suma su mesa y sus personas, y cada cambio de confirmación mueve los
+conteos de confirmadas, en la misma transacción que el registro. Los rankings
+y las tarjetas del día leen una fila por host o mesero en lugar de agrupar
+todos los registros del día. `materializar_resumenes` los recalcula desde los
+registros (cierre nocturno y `flask reconciliar-contadores`).
+
+Una escritura tardía en un día cerrado (confirmación o alta capturada sin
+conexión) mueve además el corte del equipo ese día, si ya estaba
+materializado, con la misma suma: nunca rehace el día completo.
+"""
+from collections import defaultdict
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, CorteDiarioHosteo, DiaMaterializado, ResumenHostDiario, ResumenMeseroDiario
+from catalogos import get_host
+from cortes import bloquear_dias_cerrados
+from plantillas import marcar_fragmentos_obsoletos
+
+_UPSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+_CAMPOS = ('mesas', 'mesas_confirmadas', 'personas', 'personas_confirmadas')
+_CAMPOS_CORTE = ('mesas_totales', 'mesas_bajadas', 'mesas_quedadas', 'px_totales', 'px_bajadas', 'px_quedadas')
+# modelo, columna de la llave (junto con fecha), columnas que se suman
+_TABLAS = ((ResumenHostDiario, 'id_host', _CAMPOS),
+           (ResumenMeseroDiario, 'id_mesero', _CAMPOS),
+           (CorteDiarioHosteo, 'id_equipo', _CAMPOS_CORTE))
+_SENTENCIAS = {}
+
+
+def _deltas():
+    # modelo -> (fecha, id) -> one value per column in _TABLAS
+    return {modelo: defaultdict(lambda n=len(campos): [0] * n) for modelo, _, campos in _TABLAS}
+
+
+def _acumular(deltas, registro, mesas, confirmadas, hoy):
+    # Form posts leave strings in the ORM attributes until a refresh
+    personas = int(registro.numero_personas)
+    for modelo, columna in ((ResumenHostDiario, 'id_host'), (ResumenMeseroDiario, 'id_mesero')):
+        d = deltas[modelo][(registro.fecha, int(getattr(registro, columna)))]
+        d[0] += mesas
+        d[1] += confirmadas
+        d[2] += personas * mesas
+        d[3] += personas * confirmadas
+    if hoy is not None and registro.fecha < hoy:
+        quedadas = mesas - confirmadas
+        d = deltas[CorteDiarioHosteo][(registro.fecha, get_host(int(registro.id_host)).id_equipo)]
+        for i, valor in enumerate((mesas, confirmadas, quedadas,
+                                   personas * mesas, personas * confirmadas, personas * quedadas)):
+            d[i] += valor
+
+
+def _upsert(dialecto, modelo, columna, campos):
+    # Built once per table: constructing the upsert costs more than running it
+    if (dialecto, modelo) not in _SENTENCIAS:
+        stmt = _UPSERT[dialecto](modelo)
+        _SENTENCIAS[dialecto, modelo] = stmt.on_conflict_do_update(
+            index_elements=[columna, 'fecha'],
+            set_={c: getattr(modelo, c) + getattr(stmt.excluded, c) for c in campos})
+    return _SENTENCIAS[dialecto, modelo]
+
+
+def _solo_materializados(cortes):
+    # Days the nightly job has not reached yet get their corte from the registros then
+    fechas = {fecha for fecha, _ in cortes}
+    hechos = set(db.session.scalars(select(DiaMaterializado.fecha).where(DiaMaterializado.fecha.in_(fechas))))
+    return {llave: d for llave, d in cortes.items() if llave[0] in hechos}
+
+
+def _aplicar(deltas):
+    if deltas[CorteDiarioHosteo]:
+        # Waits for a rebuild of closed days in progress, and holds the next
+        # one off until this commits, before any of their counters move
+        bloquear_dias_cerrados(exclusivo=False)
+        deltas[CorteDiarioHosteo] = _solo_materializados(deltas[CorteDiarioHosteo])
+        # Rendered fragments of closed ranges may include these days
+        marcar_fragmentos_obsoletos(db.session)
+
+    dialecto = db.engine.dialect.name
+    for modelo, columna, campos in _TABLAS:
+        # Sorted so concurrent writers lock the counter rows in the same order
+        filas = [dict(zip(campos, d), fecha=fecha, **{columna: id_})
+                 for (fecha, id_), d in sorted(deltas[modelo].items()) if any(d)]
+        if not filas:
+            continue
+        if dialecto in _UPSERT:
+            stmt = _upsert(dialecto, modelo, columna, campos)
+            # Plain Core executemany; the ORM bulk-insert path adds overhead per call.
+            # Passing the clause still lets the routed session note the write.
+            db.session.connection(bind_arguments={'clause': stmt}).execute(stmt, filas)
+            continue
+        for fila in filas:
+            actualizadas = db.session.execute(
+                update(modelo)
+                .where(getattr(modelo, columna) == fila[columna], modelo.fecha == fila['fecha'])
+                .values({c: getattr(modelo, c) + fila[c] for c in campos})
+            ).rowcount
+            if not actualizadas:
+                db.session.execute(insert(modelo).values(fila))
+
+
+def contar_altas(registros, hoy=None):
+    """Suma registros nuevos (id_host, id_mesero, fecha, numero_personas, confirmada).
+
+    Con `hoy`, los registros de días anteriores también suman al corte de su
+    equipo y día.
+    """
+    deltas = _deltas()
+    for r in registros:
+        _acumular(deltas, r, 1, int(bool(r.confirmada)), hoy)
+    _aplicar(deltas)
+
+
+def contar_confirmaciones(cambiados, hoy=None):
+    """Ajusta confirmadas por registros cuyo `confirmada` ya trae el valor nuevo"""
+    deltas = _deltas()
+    for r in cambiados:
+        _acumular(deltas, r, 0, 1 if r.confirmada else -1, hoy)
+    _aplicar(deltas)
@@ -0,0 +1,193 @@
+"""Cortes y resúmenes diarios materializados a partir de los registros.
+
+Un corte resume un día cerrado de un equipo en CorteDiarioHosteo: personas y
+mesas totales, bajadas (confirmadas) y quedadas (no confirmadas). Los
+resúmenes por host y por mesero (ResumenHostDiario, ResumenMeseroDiario)
+guardan los mismos conteos con granularidad de un día. Los reportes de fechas
+pasadas y los rangos leen de aquí en lugar de recalcular desde los registros.
+Los días archivados ya no tienen registros: sus cortes y resúmenes son la
+única copia en la base y nunca se reemplazan. `dias_materializados` anota
+cada día ya calculado, tenga o no registros.
+"""
+from datetime import timedelta
+from sqlalchemy import case, func, select, text
+from models import (db, Host, RegistroDiarioHosteo, CorteDiarioHosteo,
+                    ResumenHostDiario, ResumenMeseroDiario, DiaArchivado, DiaMaterializado)
+from queries import resumen_tarjetas
+from plantillas import marcar_fragmentos_obsoletos
+
+# Transaction-level advisory lock (Postgres) between rebuilds of closed days and late writes to them
+_LLAVE_DIAS_CERRADOS = 7_202_604
+
+
+def bloquear_dias_cerrados(exclusivo):
+    """Toma el candado de días cerrados hasta el fin de la transacción.
+
+    Una reconstrucción lo toma exclusivo y las escrituras tardías compartido:
+    una reconstrucción no lee los registros mientras una confirmación a medias
+    ya los cambió, y dos reconstrucciones del mismo día no chocan en las
+    llaves únicas de cortes y resúmenes. En SQLite las escrituras ya van de
+    una en una.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    funcion = 'pg_advisory_xact_lock' if exclusivo else 'pg_advisory_xact_lock_shared'
+    db.session.execute(text(f'SELECT {funcion}(:llave)'), {'llave': _LLAVE_DIAS_CERRADOS})
+
+
+def _conteos():
+    confirmada = RegistroDiarioHosteo.confirmada.is_(True)
+    return (
+        func.count(RegistroDiarioHosteo.id_registro_hosteo),
+        func.count(case((confirmada, 1))),
+        func.coalesce(func.sum(RegistroDiarioHosteo.numero_personas), 0),
+        func.coalesce(func.sum(case((confirmada, RegistroDiarioHosteo.numero_personas), else_=0)), 0),
+    )
+
+
+def _agregados(columna, desde, hasta, equipo_id=None):
+    query = db.session.query(columna, RegistroDiarioHosteo.fecha, *_conteos())\
+        .join(Host, RegistroDiarioHosteo.id_host == Host.id_host)\
+        .filter(RegistroDiarioHosteo.fecha >= desde, RegistroDiarioHosteo.fecha <= hasta)
+    if equipo_id is not None:
+        query = query.filter(Host.id_equipo == equipo_id)
+    return query.group_by(columna, RegistroDiarioHosteo.fecha).all()
+
+
+def _sin_archivar(modelo, desde, hasta):
+    # Rebuilding an archived day from its (deleted) registros would erase it
+    return modelo.fecha.not_in(select(DiaArchivado.fecha).where(DiaArchivado.fecha >= desde,
+                                                                DiaArchivado.fecha <= hasta))
+
+
+def _borrar_rango(modelo, desde, hasta, *filtros):
+    modelo.query.filter(modelo.fecha >= desde, modelo.fecha <= hasta, _sin_archivar(modelo, desde, hasta),
+                        *filtros).delete(synchronize_session=False)
+
+
+def materializar_cortes(desde, hasta=None, equipo_id=None):
+    """Recalcula los cortes de [desde, hasta] desde los registros.
+
+    Reemplaza los cortes existentes del rango dentro de la transacción en
+    curso; el commit queda a cargo de quien llama. Regresa cuántos cortes
+    se escribieron.
+    """
+    hasta = hasta or desde
+    filas = _agregados(Host.id_equipo, desde, hasta, equipo_id)
+    filtros = [CorteDiarioHosteo.id_equipo == equipo_id] if equipo_id is not None else []
+    _borrar_rango(CorteDiarioHosteo, desde, hasta, *filtros)
+
+    db.session.add_all(
+        CorteDiarioHosteo(id_equipo=id_equipo,
+                          fecha=fecha,
+                          px_totales=px,
+                          px_bajadas=px_bajadas,
+                          px_quedadas=px - px_bajadas,
+                          mesas_totales=mesas,
+                          mesas_bajadas=mesas_bajadas,
+                          mesas_quedadas=mesas - mesas_bajadas)
+        for id_equipo, fecha, mesas, mesas_bajadas, px, px_bajadas in filas
+    )
+    return len(filas)
+
+
+def materializar_resumenes(desde, hasta=None):
+    """Recalcula los resúmenes por host y por mesero de [desde, hasta]"""
+    hasta = hasta or desde
+    escritos = 0
+    for modelo, columna, campo in ((ResumenHostDiario, RegistroDiarioHosteo.id_host, 'id_host'),
+                                   (ResumenMeseroDiario, RegistroDiarioHosteo.id_mesero, 'id_mesero')):
+        filas = _agregados(columna, desde, hasta)
+        _borrar_rango(modelo, desde, hasta)
+        db.session.add_all(
+            modelo(fecha=fecha,
+                   mesas=mesas,
+                   mesas_confirmadas=mesas_confirmadas,
+                   personas=personas,
+                   personas_confirmadas=personas_confirmadas,
+                   **{campo: id_})
+            for id_, fecha, mesas, mesas_confirmadas, personas, personas_confirmadas in filas
+        )
+        escritos += len(filas)
+    return escritos
+
+
+def verificar_resumenes(desde, hasta=None):
+    """Diferencias entre los resúmenes por host y mesero y los registros de [desde, hasta].
+
+    Regresa tuplas (tabla, fecha, id, esperado, guardado) con los conteos
+    (mesas, mesas_confirmadas, personas, personas_confirmadas); None de un
+    lado significa que la fila falta o sobra.
+    """
+    hasta = hasta or desde
+    diferencias = []
+    for modelo, columna, campo in ((ResumenHostDiario, RegistroDiarioHosteo.id_host, 'id_host'),
+                                   (ResumenMeseroDiario, RegistroDiarioHosteo.id_mesero, 'id_mesero')):
+        esperados = {(fecha, id_): tuple(conteos) for id_, fecha, *conteos in _agregados(columna, desde, hasta)}
+        guardados = {(fecha, id_): tuple(conteos) for fecha, id_, *conteos in db.session.query(
+            modelo.fecha, getattr(modelo, campo),
+            modelo.mesas, modelo.mesas_confirmadas, modelo.personas, modelo.personas_confirmadas
+        ).filter(modelo.fecha >= desde, modelo.fecha <= hasta, _sin_archivar(modelo, desde, hasta))}
+        for clave in sorted(esperados.keys() | guardados.keys()):
+            if esperados.get(clave) != guardados.get(clave):
+                diferencias.append((modelo.__tablename__, *clave, esperados.get(clave), guardados.get(clave)))
+    return diferencias
+
+
+def _dias(desde, hasta):
+    return [desde + timedelta(days=n) for n in range((hasta - desde).days + 1)]
+
+
+def materializar_dias(desde, hasta=None):
+    """Cortes y resúmenes de [desde, hasta]; regresa (cortes, resúmenes) escritos"""
+    hasta = hasta or desde
+    bloquear_dias_cerrados(exclusivo=True)
+    # Rendered fragments of closed ranges may include these days
+    marcar_fragmentos_obsoletos(db.session)
+    escritos = materializar_cortes(desde, hasta), materializar_resumenes(desde, hasta)
+    DiaMaterializado.query.filter(DiaMaterializado.fecha >= desde,
+                                  DiaMaterializado.fecha <= hasta).delete(synchronize_session=False)
+    db.session.add_all(DiaMaterializado(fecha=fecha) for fecha in _dias(desde, hasta))
+    return escritos
+
+
+def cortes_sin_materializar(desde, hasta, equipo_id=None):
+    """SELECT con las columnas de un corte para los días de [desde, hasta] sin materializar.
+
+    Suma por equipo los contadores por host, que van al corriente desde cada
+    alta: los reportes leen así los días que el cron nocturno aún no alcanza
+    sin escribir nada.
+    """
+    r = ResumenHostDiario
+    mesas, bajadas = func.sum(r.mesas), func.sum(r.mesas_confirmadas)
+    px, px_bajadas = func.sum(r.personas), func.sum(r.personas_confirmadas)
+    stmt = select(r.fecha.label('fecha'), Host.id_equipo.label('id_equipo'),
+                  mesas.label('mesas_totales'), bajadas.label('mesas_bajadas'),
+                  (mesas - bajadas).label('mesas_quedadas'),
+                  px.label('px_totales'), px_bajadas.label('px_bajadas'),
+                  (px - px_bajadas).label('px_quedadas'))\
+        .join(Host, r.id_host == Host.id_host)\
+        .where(r.fecha >= desde, r.fecha <= hasta,
+               r.fecha.not_in(select(DiaMaterializado.fecha).where(DiaMaterializado.fecha >= desde,
+                                                                   DiaMaterializado.fecha <= hasta)))
+    if equipo_id is not None:
+        stmt = stmt.where(Host.id_equipo == equipo_id)
+    return stmt.group_by(r.fecha, Host.id_equipo)
+
+
+def resumen_cortes(fecha, equipo_id=None):
+    """Tarjetas del reporte leídas de los cortes, o None si el día no tiene cortes"""
+    query = db.session.query(
+        func.count(CorteDiarioHosteo.id_corte_hosteo),
+        func.coalesce(func.sum(CorteDiarioHosteo.mesas_totales), 0),
+        func.coalesce(func.sum(CorteDiarioHosteo.mesas_bajadas), 0),
+        func.coalesce(func.sum(CorteDiarioHosteo.px_totales), 0),
+        func.coalesce(func.sum(CorteDiarioHosteo.px_bajadas), 0),
+    ).filter(CorteDiarioHosteo.fecha == fecha)
+    if equipo_id is not None:
+        query = query.filter(CorteDiarioHosteo.id_equipo == equipo_id)
+
+    cortes, mesas, mesas_bajadas, px, px_bajadas = query.one()
+    if not cortes:
+        return None
+    return resumen_tarjetas(mesas, mesas_bajadas, px, px_bajadas)
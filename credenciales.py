@@ -0,0 +1,89 @@
+"""Claves de acceso guardadas como hash y tokens firmados de sesión de mesero.
+
+Las claves de líder, host y mesero se guardan como HMAC-SHA256 con
+CLAVE_HMAC_KEY (por default, SECRET_KEY) en una columna indexada, y se buscan
+por ese hash. La base y los caches sólo comparan hashes: un atacante no
+puede acercar un hash byte por byte a uno válido, así que el tiempo de
+respuesta no dice qué tan cerca estuvo su intento.
+
+Al entrar con su clave, el mesero recibe un token firmado con SECRET_KEY en
+una cookie HttpOnly. Su vista, sus confirmaciones, su tendencia y su stream
+validan el token en el proceso, sin consultar la base, hasta que vence
+(TOKEN_MESERO_SEGUNDOS).
+"""
+import hashlib
+import hmac
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from models import Equipo, Host, Mesero
+
+COOKIE_MESERO = 'token_mesero'
+
+# modelo -> (columna heredada en texto plano, columna con el hash)
+COLUMNAS_CLAVE = {
+    Equipo: ('clave_lider', 'clave_lider_hash'),
+    Host: ('clave_host', 'clave_host_hash'),
+    Mesero: ('clave_mesero', 'clave_mesero_hash'),
+}
+
+
+def huella_clave(clave):
+    """HMAC-SHA256 hexadecimal de una clave; es lo único que se guarda y se consulta"""
+    llave = current_app.config['CLAVE_HMAC_KEY']
+    return hmac.new(llave.encode(), clave.encode(), hashlib.sha256).hexdigest()
+
+
+def asignar_clave(obj, clave):
+    """Asigna la clave de un equipo (líder), host o mesero guardando sólo su hash"""
+    texto, columna_hash = COLUMNAS_CLAVE[type(obj)]
+    setattr(obj, columna_hash, huella_clave(clave))
+    setattr(obj, texto, None)
+
+
+def migrar_claves(borrar_texto=False):
+    """Calcula el hash de cada clave heredada en texto plano.
+
+    Con `borrar_texto`, además vacía la columna en texto plano. Regresa
+    {tabla: filas actualizadas}; el commit queda a cargo de quien llama.
+    """
+    actualizadas = {}
+    for modelo, (texto, columna_hash) in COLUMNAS_CLAVE.items():
+        n = 0
+        for obj in modelo.query.filter(getattr(modelo, texto).isnot(None)):
+            huella = huella_clave(getattr(obj, texto))
+            if getattr(obj, columna_hash) != huella or borrar_texto:
+                setattr(obj, columna_hash, huella)
+                if borrar_texto:
+                    setattr(obj, texto, None)
+                n += 1
+        actualizadas[modelo.__tablename__] = n
+    return actualizadas
+
+
+def _firmador():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='token-mesero')
+
+
+def emitir_token_mesero(mesero_id):
+    return _firmador().dumps(mesero_id)
+
+
+def mesero_del_token(token):
+    """id del mesero de un token con firma válida y vigente, o None"""
+    if not token:
+        return None
+    try:
+        mesero_id = _firmador().loads(token, max_age=current_app.config['TOKEN_MESERO_SEGUNDOS'])
+    except BadSignature:
+        # Also covers SignatureExpired
+        return None
+    return mesero_id if isinstance(mesero_id, int) else None
+
+
+def con_token_mesero(respuesta, mesero_id):
+    """Agrega a la respuesta la cookie con un token nuevo del mesero"""
+    respuesta.set_cookie(COOKIE_MESERO, emitir_token_mesero(mesero_id),
+                         max_age=current_app.config['TOKEN_MESERO_SEGUNDOS'],
+                         httponly=True, samesite='Lax',
+                         secure=current_app.config['SESSION_COOKIE_SECURE'])
+    return respuesta
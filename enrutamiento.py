@@ -0,0 +1,49 @@
+"""Enrutamiento de lecturas a la réplica de Postgres.
+
+Con DATABASE_REPLICA_URL configurada, los SELECT de las vistas marcadas con
+@solo_lectura van a la réplica; todo lo demás (escrituras, vistas sin marca,
+CLI) usa la primaria. En cuanto la sesión escribe algo, el resto de sus
+lecturas vuelve a la primaria para ver sus propios cambios.
+"""
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA = 'replica'
+
+
+class SesionEnrutada(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['escribio'] = True
+            elif (isinstance(clause, Select) and not self.info.get('escribio')
+                  and has_app_context() and g.get('solo_lectura')):
+                replica = self._db.engines.get(REPLICA)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def solo_lectura(vista):
+    """Marca una vista cuyas consultas pueden leerse de la réplica.
+
+    La marca dura hasta el fin del request, no sólo de la vista: una
+    respuesta por streaming (stream_with_context) sigue leyendo de la réplica.
+    """
+    @wraps(vista)
+    def envuelta(*args, **kwargs):
+        g.solo_lectura = True
+        return vista(*args, **kwargs)
+    return envuelta
+
+
+def configurar_enrutamiento(app):
+    @app.teardown_request
+    def _quitar_solo_lectura(exc):
+        # Runs once the response is fully sent. g may outlive the request
+        # (an app context pushed by a CLI command or a test), so the mark goes here
+        g.pop('solo_lectura', None)
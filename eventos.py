@@ -0,0 +1,138 @@
+"""Fan-out en proceso de cambios de registros vía Server-Sent Events.
+
+Cada conexión SSE es una cola acotada suscrita a uno o más canales:
+'global', 'equipo:<id>' y 'mesero:<id>'. Las vistas publican después de su
+commit. El broker vive en memoria del proceso: con varios workers, cada uno
+sólo reparte los cambios que él mismo escribió.
+"""
+import json
+import queue
+import threading
+from collections import defaultdict
+
+from catalogos import get_host, get_mesero
+
+
+class Suscripcion:
+    def __init__(self, canales, max_cola):
+        self.canales = tuple(canales)
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.desbordada = False
+
+
+class Broker:
+    def __init__(self, max_cola=256):
+        self.max_cola = max_cola
+        self.cerrado = False
+        self._canales = defaultdict(set)
+        self._subs = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self, *canales, limite=None):
+        """Nueva suscripción, o None si el broker se está cerrando o ya hay `limite` abiertas"""
+        sub = Suscripcion(canales, self.max_cola)
+        with self._lock:
+            if self.cerrado or (limite is not None and len(self._subs) >= limite):
+                return None
+            self._subs.add(sub)
+            for canal in sub.canales:
+                self._canales[canal].add(sub)
+        return sub
+
+    def cancelar(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+            for canal in sub.canales:
+                subs = self._canales.get(canal)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._canales[canal]
+
+    def publicar(self, canales, tipo, datos):
+        """Encola el evento en cada suscriptor de los canales (sin duplicar).
+
+        Nunca bloquea: un cliente que no vacía su cola se marca como
+        desbordado y se desconecta; el navegador recarga la página al
+        reconectar.
+        """
+        # Serialized once here, not once per subscriber
+        mensaje = f'event: {tipo}\ndata: {json.dumps(datos)}\n\n'
+        with self._lock:
+            destinos = set().union(*(self._canales.get(c, ()) for c in canales))
+        for sub in destinos:
+            try:
+                sub.cola.put_nowait(mensaje)
+            except queue.Full:
+                sub.desbordada = True
+
+    def flujo_sse(self, sub, heartbeat=15):
+        """Generador del cuerpo text/event-stream para una suscripción"""
+        try:
+            yield 'retry: 3000\n\n'
+            while not sub.desbordada:
+                try:
+                    mensaje = sub.cola.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': ping\n\n'
+                    continue
+                if mensaje is None:
+                    # cerrar(): the worker is shutting down; EventSource reconnects elsewhere
+                    return
+                yield mensaje
+            yield 'event: recargar\ndata: {}\n\n'
+        finally:
+            self.cancelar(sub)
+
+    def cerrar(self):
+        """Termina todos los flujos abiertos y rechaza suscripciones nuevas.
+
+        Para el apagado ordenado de un worker: sin esto, cada conexión SSE
+        retendría su hilo hasta que venza el graceful timeout.
+        """
+        with self._lock:
+            self.cerrado = True
+            subs = list(self._subs)
+        for sub in subs:
+            try:
+                sub.cola.put_nowait(None)
+            except queue.Full:
+                sub.desbordada = True
+
+    def conexiones(self):
+        with self._lock:
+            return len(self._subs)
+
+
+broker = Broker()
+
+
+def _datos_registro(registro, id_equipo):
+    host = get_host(registro.id_host)
+    mesero = get_mesero(registro.id_mesero)
+    return {
+        'id_registro_hosteo': registro.id_registro_hosteo,
+        'id_equipo': id_equipo,
+        'id_mesero': registro.id_mesero,
+        'fecha': registro.fecha.isoformat(),
+        'hora': registro.hora.strftime('%H:%M'),
+        'host': host.nombre_host if host else 'N/D',
+        'mesero': mesero.nombre_mesero if mesero else 'N/D',
+        'numero_personas': registro.numero_personas,
+        'confirmada': bool(registro.confirmada),
+        # Lets a tablet match the event to the row it queued offline
+        'clave_idempotencia': getattr(registro, 'clave_idempotencia', None),
+    }
+
+
+def publicar_registro(registro, tipo='registro'):
+    """Publica un registro ya confirmado en la base a sus tres canales.
+
+    `tipo` es 'registro' para altas y 'confirmacion' para cambios de
+    confirmada.
+    """
+    host = get_host(registro.id_host)
+    id_equipo = host.id_equipo if host else None
+    canales = ['global', f'equipo:{id_equipo}', f'mesero:{registro.id_mesero}']
+    broker.publicar(canales, tipo, _datos_registro(registro, id_equipo))
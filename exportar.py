@@ -0,0 +1,182 @@
+"""Exportación por streaming de registros y cortes para contabilidad.
+
+Las filas salen de un cursor del lado del servidor (yield_per) y se escriben
+por bloques: la memoria depende del tamaño del bloque, no del rango. CSV
+siempre; Parquet (columnar, comprimido) sólo si pyarrow está instalado.
+"""
+import csv
+import io
+from datetime import time
+from sqlalchemy import literal, select, union_all
+from models import db, Equipo, Host, Mesero, RegistroDiarioHosteo, CorteDiarioHosteo
+from cortes import cortes_sin_materializar
+
+FILAS_POR_BLOQUE = 5000
+# Parquet writes one row group per block; tiny row groups compress poorly
+FILAS_POR_GRUPO_PARQUET = 65536
+
+FORMATOS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# (columna, tipo) in output order; the tipo drives the Parquet schema
+COLUMNAS_REGISTROS = (
+    ('id_registro_hosteo', 'int'), ('fecha', 'date'), ('hora', 'time'),
+    ('id_equipo', 'int'), ('lider_equipo', 'str'),
+    ('id_host', 'int'), ('nombre_host', 'str'),
+    ('id_mesero', 'int'), ('nombre_mesero', 'str'),
+    ('numero_personas', 'int'), ('confirmada', 'bool'),
+)
+COLUMNAS_CORTES = (
+    ('fecha', 'date'), ('id_equipo', 'int'), ('lider_equipo', 'str'),
+    ('mesas_totales', 'int'), ('mesas_bajadas', 'int'), ('mesas_quedadas', 'int'),
+    ('px_totales', 'int'), ('px_bajadas', 'int'), ('px_quedadas', 'int'),
+    ('total_mxn', 'float'),
+)
+
+
+def consulta_registros(desde, hasta, equipo_id=None):
+    """Registros crudos de [desde, hasta] con nombres de equipo, host y mesero"""
+    R = RegistroDiarioHosteo
+    stmt = select(R.id_registro_hosteo, R.fecha, R.hora, Host.id_equipo, Equipo.lider_equipo,
+                  R.id_host, Host.nombre_host, R.id_mesero, Mesero.nombre_mesero,
+                  R.numero_personas, R.confirmada)\
+        .join(Host, R.id_host == Host.id_host)\
+        .join(Equipo, Host.id_equipo == Equipo.id_equipo)\
+        .join(Mesero, R.id_mesero == Mesero.id_mesero)\
+        .where(R.fecha >= desde, R.fecha <= hasta)
+    if equipo_id is not None:
+        stmt = stmt.where(Host.id_equipo == equipo_id)
+    # Same order as ix_registro_fecha_hora, so rows can stream without a sort
+    return stmt.order_by(R.fecha, R.hora, R.id_registro_hosteo)
+
+
+def consulta_cortes(desde, hasta, equipo_id=None, cerrado_hasta=None):
+    """Cortes de [desde, hasta]; el día en curso no tiene corte.
+
+    Con `cerrado_hasta`, los días cerrados hasta esa fecha que el cron aún no
+    materializa salen de los contadores por host.
+    """
+    C = CorteDiarioHosteo
+    stmt = select(C.fecha, C.id_equipo, Equipo.lider_equipo,
+                  C.mesas_totales, C.mesas_bajadas, C.mesas_quedadas,
+                  C.px_totales, C.px_bajadas, C.px_quedadas, C.total_mxn)\
+        .join(Equipo, C.id_equipo == Equipo.id_equipo)\
+        .where(C.fecha >= desde, C.fecha <= hasta)
+    if equipo_id is not None:
+        stmt = stmt.where(C.id_equipo == equipo_id)
+    if cerrado_hasta is None:
+        return stmt.order_by(C.fecha, C.id_equipo)
+
+    p = cortes_sin_materializar(desde, cerrado_hasta, equipo_id).subquery()
+    pendientes = select(p.c.fecha, p.c.id_equipo, Equipo.lider_equipo,
+                        p.c.mesas_totales, p.c.mesas_bajadas, p.c.mesas_quedadas,
+                        p.c.px_totales, p.c.px_bajadas, p.c.px_quedadas, literal(0.0, C.total_mxn.type))\
+        .join(Equipo, p.c.id_equipo == Equipo.id_equipo)
+    todos = union_all(stmt, pendientes).subquery()
+    return select(todos).order_by(todos.c.fecha, todos.c.id_equipo)
+
+
+def bloques(stmt, por_bloque=FILAS_POR_BLOQUE):
+    """Filas de `stmt` en listas de hasta `por_bloque`, con cursor del lado del servidor"""
+    # yield_per implies stream_results: psycopg2 uses a named cursor instead of
+    # buffering the whole result on the client
+    resultado = db.session.execute(stmt.execution_options(yield_per=por_bloque))
+    try:
+        yield from resultado.partitions()
+    finally:
+        resultado.close()
+
+
+def _valor(valor):
+    # Captured times carry microseconds; accounting only needs seconds
+    if isinstance(valor, time):
+        return valor.replace(microsecond=0)
+    return valor
+
+
+def csv_por_bloques(columnas, filas_en_bloques):
+    """Texto CSV por bloques: encabezado y luego un pedazo por bloque de filas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM so Excel opens the accented names as UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(nombre for nombre, _ in columnas)
+    yield buffer.getvalue()
+    for bloque in filas_en_bloques:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([int(v) if isinstance(v, bool) else _valor(v) for v in fila] for fila in bloque)
+        yield buffer.getvalue()
+
+
+def parquet_disponible():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _SalidaPorPedazos:
+    # Minimal writable file for ParquetWriter: keeps what was written until drained
+    def __init__(self):
+        self.pedazos = []
+        self.posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self.pedazos.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos, self.pedazos = b''.join(self.pedazos), []
+        return datos
+
+
+def parquet_por_bloques(columnas, filas_en_bloques):
+    """Bytes de un archivo Parquet, un row group por bloque de filas (requiere pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {'int': pa.int64(), 'str': pa.string(), 'date': pa.date32(),
+             'time': pa.time32('s'), 'bool': pa.bool_(), 'float': pa.float64()}
+    esquema = pa.schema([(nombre, tipos[tipo]) for nombre, tipo in columnas])
+    salida = _SalidaPorPedazos()
+    with pq.ParquetWriter(salida, esquema, compression='zstd') as escritor:
+        for bloque in filas_en_bloques:
+            escritor.write_table(pa.table([pa.array([_valor(v) for v in col], type=campo.type)
+                                           for col, campo in zip(zip(*bloque), esquema)], schema=esquema))
+            yield salida.vaciar()
+    # The footer is written on close
+    yield salida.vaciar()
+
+
+def exportacion(tipo, formato, desde, hasta, equipo_id=None, cerrado_hasta=None):
+    """Generador del archivo completo: tipo 'registros' o 'cortes', formato 'csv' o 'parquet'.
+
+    `cerrado_hasta` es el último día cerrado del rango (ver consulta_cortes).
+    """
+    if tipo == 'registros':
+        columnas, stmt = COLUMNAS_REGISTROS, consulta_registros(desde, hasta, equipo_id)
+    else:
+        columnas, stmt = COLUMNAS_CORTES, consulta_cortes(desde, hasta, equipo_id, cerrado_hasta)
+    if formato == 'parquet':
+        return parquet_por_bloques(columnas, bloques(stmt, FILAS_POR_GRUPO_PARQUET))
+    return csv_por_bloques(columnas, bloques(stmt))
+
+
+def nombre_archivo(tipo, formato, desde, hasta, equipo_id=None):
+    equipo = f'_equipo{equipo_id}' if equipo_id is not None else ''
+    return f'{tipo}{equipo}_{desde}_{hasta}.{FORMATOS[formato][1]}'
@@ -0,0 +1,130 @@
+"""Datos sintéticos con volumen y forma realistas para pruebas de carga.
+
+Los registros siguen el día de la terraza: poco movimiento al abrir, pico de
+comida entre 14 y 16 h y pico de cena entre 20 y 22 h, más gente en fin de
+semana y mesas chicas mucho más comunes que las grandes. Todo sale de una
+semilla, así que dos corridas con los mismos parámetros generan lo mismo.
+"""
+import functools
+import random
+from datetime import time, timedelta
+from types import SimpleNamespace
+
+import click
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.engine import make_url
+
+from contadores import contar_altas
+from credenciales import huella_clave
+from models import db, Equipo, Host, Mesero, RegistroDiarioHosteo
+from versiones import marcar_fechas
+
+# Relative weight of each opening hour (13:00 - 23:59)
+PESO_HORA = {13: 3, 14: 8, 15: 9, 16: 5, 17: 3, 18: 4, 19: 6, 20: 9, 21: 10, 22: 6, 23: 2}
+# Monday .. Sunday
+PESO_DIA_SEMANA = (0.7, 0.75, 0.8, 0.9, 1.25, 1.5, 1.3)
+PESO_PERSONAS = {1: 6, 2: 30, 3: 16, 4: 22, 5: 8, 6: 8, 7: 3, 8: 4, 10: 2, 12: 1}
+
+_HORAS, _PESOS_HORA = zip(*PESO_HORA.items())
+_PERSONAS, _PESOS_PERSONAS = zip(*PESO_PERSONAS.items())
+# No host means a Unix socket on this machine
+_HOSTS_LOCALES = {None, '', 'localhost', '127.0.0.1', '::1'}
+
+
+def base_local(url):
+    """True para SQLite o una base en esta máquina"""
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' or url.host in _HOSTS_LOCALES
+
+
+def solo_base_local(comando):
+    """Para comandos que siembran datos sintéticos o tocan índices.
+
+    Agrega --permitir-remoto; sin esa opción, el comando se niega a correr si
+    DATABASE_URL no apunta a SQLite ni a esta máquina.
+    """
+    @click.option('--permitir-remoto', is_flag=True,
+                  help='Corre aunque DATABASE_URL no sea SQLite ni localhost.')
+    @functools.wraps(comando)
+    def envuelto(*args, permitir_remoto=False, **kwargs):
+        url = current_app.config['SQLALCHEMY_DATABASE_URI']
+        if not permitir_remoto and not base_local(url):
+            raise click.ClickException(f'{make_url(url).render_as_string(hide_password=True)} no es una base '
+                                       'local; este comando escribe en ella. Usa --permitir-remoto si es a propósito')
+        return comando(*args, **kwargs)
+    return envuelto
+
+
+def filas_del_dia(rng, fecha, hosts, meseros, cantidad, tasa_confirmacion=0.8):
+    """Registros sintéticos de un día como dicts listos para un INSERT masivo"""
+    horas = rng.choices(_HORAS, _PESOS_HORA, k=cantidad)
+    personas = rng.choices(_PERSONAS, _PESOS_PERSONAS, k=cantidad)
+    return [dict(id_host=rng.choice(hosts),
+                 id_mesero=rng.choice(meseros),
+                 fecha=fecha,
+                 hora=time(hora, rng.randint(0, 59), rng.randint(0, 59)),
+                 numero_personas=n,
+                 confirmada=rng.random() < tasa_confirmacion)
+            for hora, n in zip(horas, personas)]
+
+
+def registros_por_dia(rng, fecha, promedio):
+    # Weekday shape plus +-20% noise so no two weeks look identical
+    return max(0, round(promedio * PESO_DIA_SEMANA[fecha.weekday()] * rng.uniform(0.8, 1.2)))
+
+
+def generar_catalogos(equipos, hosts_por_equipo, meseros):
+    """Agrega equipos, hosts y meseros sintéticos con claves predecibles.
+
+    Las claves siguen el patrón 'gen-lider-<id>', 'gen-host-<id>' y
+    'gen-mesero-<id>' para que los benchmarks puedan entrar por /access/*.
+    """
+    ocupados = set(db.session.scalars(select(Equipo.id_equipo)))
+    # 777 is the control equipo behind /reporte-total
+    ocupados.add(777)
+    ids, siguiente = [], 1
+    while len(ids) < equipos:
+        if siguiente not in ocupados:
+            ids.append(siguiente)
+        siguiente += 1
+    nuevos = [Equipo(id_equipo=i, lider_equipo=f'Líder {i}', clave_lider_hash=huella_clave(f'gen-lider-{i}')) for i in ids]
+    db.session.add_all(nuevos)
+    db.session.flush()
+
+    hosts = [Host(id_equipo=e.id_equipo, nombre_host=f'Host {e.id_equipo}-{n + 1}')
+             for e in nuevos for n in range(hosts_por_equipo)]
+    lista_meseros = [Mesero(nombre_mesero=f'Mesero {n + 1}') for n in range(meseros)]
+    db.session.add_all(hosts + lista_meseros)
+    db.session.flush()
+    # Claves need the generated ids
+    for h in hosts:
+        h.clave_host_hash = huella_clave(f'gen-host-{h.id_host}')
+    for m in lista_meseros:
+        m.clave_mesero_hash = huella_clave(f'gen-mesero-{m.id_mesero}')
+    db.session.flush()
+    return nuevos, hosts, lista_meseros
+
+
+def generar_registros(desde, hasta, promedio_por_dia, semilla=2026, host_ids=None, mesero_ids=None):
+    """Inserta registros del rango [desde, hasta], un INSERT por día.
+
+    Regresa el total insertado. El commit queda a cargo de quien llama.
+    """
+    host_ids = host_ids or db.session.scalars(select(Host.id_host)).all()
+    mesero_ids = mesero_ids or db.session.scalars(select(Mesero.id_mesero)).all()
+    if not host_ids or not mesero_ids:
+        return 0
+
+    rng = random.Random(semilla)
+    total = 0
+    fecha = desde
+    while fecha <= hasta:
+        filas = filas_del_dia(rng, fecha, host_ids, mesero_ids, registros_por_dia(rng, fecha, promedio_por_dia))
+        if filas:
+            db.session.execute(insert(RegistroDiarioHosteo), filas)
+            contar_altas(SimpleNamespace(**f) for f in filas)
+            marcar_fechas([fecha])
+            total += len(filas)
+        fecha += timedelta(days=1)
+    return total
@@ -0,0 +1,45 @@
+"""Configuración de gunicorn: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Un proceso con muchos hilos: los requests son cortos y casi todo su tiempo es
+espera de la base, así que un proceso atiende varios a la vez con hilos
+(gthread). Los flujos SSE también ocupan un hilo cada uno; SSE_MAX_CONEXIONES
+los limita para que siempre queden hilos para las altas y confirmaciones.
+
+Un solo worker por default porque el broker de SSE vive en memoria del
+proceso: con WEB_CONCURRENCY > 1, un cambio escrito en un worker no llega a
+los flujos abiertos en los demás. Subirlo requiere antes repartir los eventos
+entre procesos (LISTEN/NOTIFY de Postgres o Redis pub/sub).
+"""
+import os
+import signal
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+# Keep in sync with the THREADS default in config.py (SSE_MAX_CONEXIONES)
+threads = int(os.getenv('THREADS', 32))
+timeout = int(os.getenv('WORKER_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 20))
+keepalive = 5
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = int(os.getenv('MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+# Each worker builds its own app: the engine pool, caches and SSE broker are per process
+preload_app = False
+accesslog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def post_worker_init(worker):
+    # SSE streams never finish on their own: on SIGTERM end them first so the
+    # graceful shutdown only waits for real requests, then let gunicorn proceed
+    from eventos import broker
+
+    salida_original = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        broker.cerrar()
+        salida_original(sig, frame)
+
+    worker.handle_exit = handle_exit
+    signal.signal(signal.SIGTERM, handle_exit)
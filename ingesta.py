@@ -0,0 +1,122 @@
+"""Ingesta por lote de registros capturados en las tablets de los hosts.
+
+Cada registro trae una clave de idempotencia generada en la tablet: un
+reintento del mismo lote (wifi intermitente, doble envío) no duplica filas.
+Los nuevos se insertan con un solo INSERT de varias filas; el commit queda a
+cargo de quien llama.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, RegistroDiarioHosteo
+from catalogos import hosts_de_equipo, lista_meseros
+from contadores import contar_altas
+from versiones import marcar_fechas
+
+_INSERT_IGNORANDO_DUPLICADOS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _marca_de_tiempo(valor, ahora, max_antiguedad):
+    """Hora local de captura enviada por la tablet, o `ahora` si no es creíble"""
+    try:
+        marca = datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return ahora
+    marca = marca.replace(tzinfo=ahora.tzinfo) if marca.tzinfo is None else marca.astimezone(ahora.tzinfo)
+    # Tablet clocks drift; trust them only within the offline window
+    if not ahora - max_antiguedad <= marca <= ahora + timedelta(minutes=5):
+        return ahora
+    return marca
+
+
+def _validar(item, hosts, meseros):
+    clave = item.get('clave_idempotencia')
+    if not isinstance(clave, str) or not 0 < len(clave) <= 64:
+        return None, 'clave_idempotencia inválida'
+    try:
+        id_host = int(item.get('id_host'))
+        id_mesero = int(item.get('id_mesero'))
+        numero_personas = int(item.get('numero_personas'))
+    except (TypeError, ValueError):
+        return clave, 'Datos incompletos'
+    if id_host not in hosts:
+        return clave, 'Host no pertenece al equipo'
+    if id_mesero not in meseros:
+        return clave, 'Mesero inválido'
+    if numero_personas < 1:
+        return clave, 'Número de personas inválido'
+    return clave, None
+
+
+def insertar_lote(equipo_id, items, ahora, max_antiguedad=timedelta(hours=24)):
+    """Inserta los registros nuevos del lote y reporta el estado de cada clave.
+
+    Regresa (resultados, nuevos): un dict por clave con 'success' y
+    'id_registro_hosteo' (más 'duplicado' si ya existía) o 'error', y los
+    registros recién insertados para publicarlos después del commit.
+    """
+    hosts = {h.id_host for h in hosts_de_equipo(equipo_id)}
+    meseros = {m.id_mesero for m in lista_meseros()}
+
+    resultados, filas = {}, {}
+    for item in items:
+        clave, error = _validar(item, hosts, meseros)
+        if clave is None:
+            continue
+        if error:
+            resultados[clave] = {'success': False, 'error': error}
+            continue
+        if clave in filas:
+            continue
+        marca = _marca_de_tiempo(item.get('registrado_en'), ahora, max_antiguedad)
+        filas[clave] = dict(clave_idempotencia=clave,
+                            id_host=int(item['id_host']),
+                            id_mesero=int(item['id_mesero']),
+                            numero_personas=int(item['numero_personas']),
+                            fecha=marca.date(),
+                            hora=marca.time().replace(tzinfo=None),
+                            confirmada=False)
+    if not filas:
+        return resultados, []
+
+    claves = list(filas)
+    columna_clave = RegistroDiarioHosteo.clave_idempotencia
+    existentes = dict(db.session.query(columna_clave, RegistroDiarioHosteo.id_registro_hosteo)
+                      .filter(columna_clave.in_(claves)))
+    por_insertar = [filas[c] for c in claves if c not in existentes]
+
+    insertados = {}
+    if por_insertar:
+        insert_dialecto = _INSERT_IGNORANDO_DUPLICADOS.get(db.engine.dialect.name)
+        if insert_dialecto is not None:
+            # A concurrent retry of the same batch may win the race; skip its rows.
+            # No conflict target: on a partitioned table the unique index is
+            # (clave_idempotencia, fecha), see retencion.py. RETURNING yields only
+            # the rows this statement inserted, so the ones the retry won count as
+            # duplicates, not as new
+            stmt = insert_dialecto(RegistroDiarioHosteo).values(por_insertar).on_conflict_do_nothing()
+            insertados = dict(db.session.execute(
+                stmt.returning(columna_clave, RegistroDiarioHosteo.id_registro_hosteo)).all())
+        else:
+            # Without the ignore a lost race raises, so every row here is new
+            db.session.execute(insert(RegistroDiarioHosteo).values(por_insertar))
+            insertados = dict(db.session.query(columna_clave, RegistroDiarioHosteo.id_registro_hosteo)
+                              .filter(columna_clave.in_([f['clave_idempotencia'] for f in por_insertar])))
+
+    ganadas = [c for c in claves if c not in existentes and c not in insertados]
+    if ganadas:
+        existentes.update(db.session.query(columna_clave, RegistroDiarioHosteo.id_registro_hosteo)
+                          .filter(columna_clave.in_(ganadas)))
+    nuevos = []
+    for clave in claves:
+        if clave in insertados:
+            resultados[clave] = {'success': True, 'id_registro_hosteo': insertados[clave]}
+            nuevos.append(SimpleNamespace(id_registro_hosteo=insertados[clave], **filas[clave]))
+        else:
+            resultados[clave] = {'success': True, 'id_registro_hosteo': existentes.get(clave), 'duplicado': True}
+
+    # Rows for closed days (captured offline before midnight) also add to their corte
+    contar_altas(nuevos, ahora.date())
+    marcar_fechas({r.fecha for r in nuevos})
+    return resultados, nuevos
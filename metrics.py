@@ -0,0 +1,199 @@
+"""Instrumentación por request expuesta en formato de texto de Prometheus.
+
+Cada request mide su latencia, cuántas sentencias SQL corrió y cuánto tardaron
+(eventos del Engine de SQLAlchemy) y el tiempo de render de sus templates.
+Los contadores viven en memoria del proceso: con varios workers, cada uno
+expone sólo los suyos.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cache import CACHES
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histograma:
+    """Histograma acumulativo por combinación de etiquetas"""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        # etiquetas -> [conteo por bucket..., suma, total]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valores, valor):
+        with self._lock:
+            serie = self._series.setdefault(tuple(valores), [0] * len(self.buckets) + [0.0, 0])
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for valores, serie in series:
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            for limite, conteo in zip((*self.buckets, '+Inf'), serie[:-2] + serie[-1:]):
+                le = 'le="%s"' % limite
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {conteo}')
+            lineas.append(f'{self.nombre}_sum{etiquetas} {serie[-2]:.6f}')
+            lineas.append(f'{self.nombre}_count{etiquetas} {serie[-1]}')
+        return lineas
+
+
+latencia = Histograma('http_request_duration_seconds', 'Latencia de cada request hasta armar la respuesta',
+                      ('endpoint', 'method', 'status'), BUCKETS_SEGUNDOS)
+consultas = Histograma('db_statements_per_request', 'Sentencias SQL ejecutadas por request',
+                       ('endpoint',), BUCKETS_CONSULTAS)
+tiempo_sql = Histograma('db_seconds_per_request', 'Tiempo total en SQL por request',
+                        ('endpoint',), BUCKETS_SEGUNDOS)
+render = Histograma('template_render_seconds', 'Tiempo de render por template',
+                    ('template',), BUCKETS_SEGUNDOS)
+HISTOGRAMAS = (latencia, consultas, tiempo_sql, render)
+
+
+class Medicion:
+    """Acumulado de un request; vive en `g` mientras dura"""
+
+    def __init__(self, guardar_sentencias):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.segundos_template = 0.0
+        # (sentencia, segundos); only kept when the slow-request log is on
+        self.sentencias = [] if guardar_sentencias else None
+        self._renders = []
+
+
+def _medicion():
+    return g.get('_medicion') if has_request_context() else None
+
+
+# Engine-wide listeners: statements run outside a request (CLI, benches) are ignored
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    if _medicion() is not None:
+        conn.info.setdefault('_inicio_sentencia', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion()
+    inicios = conn.info.get('_inicio_sentencia')
+    if medicion is None or not inicios:
+        return
+    segundos = time.perf_counter() - inicios.pop()
+    medicion.consultas += 1
+    medicion.segundos_sql += segundos
+    if medicion.sentencias is not None:
+        medicion.sentencias.append((statement, segundos))
+
+
+def _antes_de_render(app, template, context, **extra):
+    medicion = _medicion()
+    if medicion is not None:
+        medicion._renders.append(time.perf_counter())
+
+def _despues_de_render(app, template, context, **extra):
+    medicion = _medicion()
+    if medicion is None or not medicion._renders:
+        return
+    segundos = time.perf_counter() - medicion._renders.pop()
+    medicion.segundos_template += segundos
+    render.observar((template.name or 'inline',), segundos)
+
+
+def _resumen_sentencias(sentencias, limite=10):
+    # Group identical statements: an N+1 shows up as one line repeated many times
+    grupos = defaultdict(lambda: [0, 0.0])
+    for sentencia, segundos in sentencias:
+        grupo = grupos[' '.join(sentencia.split())]
+        grupo[0] += 1
+        grupo[1] += segundos
+    peores = sorted(grupos.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+    return '\n'.join(f'  x{veces:<4} {segundos * 1000:8.1f} ms  {sentencia[:300]}'
+                     for sentencia, (veces, segundos) in peores)
+
+
+def instrumentar(app):
+    """Registra los hooks de medición en la app.
+
+    Con SLOW_REQUEST_MS > 0, los requests que tarden más se escriben en el log
+    junto con sus sentencias SQL agrupadas, de la más costosa a la menos.
+    """
+    umbral_ms = app.config['SLOW_REQUEST_MS']
+    before_render_template.connect(_antes_de_render, app)
+    template_rendered.connect(_despues_de_render, app)
+
+    @app.before_request
+    def _iniciar_medicion():
+        g._medicion = Medicion(guardar_sentencias=umbral_ms > 0)
+
+    def _registrar(status):
+        medicion = g.pop('_medicion', None)
+        if medicion is None:
+            return
+        segundos = time.perf_counter() - medicion.inicio
+        endpoint = request.endpoint or 'sin_ruta'
+        latencia.observar((endpoint, request.method, status), segundos)
+        consultas.observar((endpoint,), medicion.consultas)
+        tiempo_sql.observar((endpoint,), medicion.segundos_sql)
+
+        if umbral_ms and segundos * 1000 >= umbral_ms:
+            app.logger.warning(
+                'Request lento: %s %s -> %s en %.1f ms (SQL: %d sentencias, %.1f ms; templates: %.1f ms)\n%s',
+                request.method, request.full_path.rstrip('?'), status, segundos * 1000,
+                medicion.consultas, medicion.segundos_sql * 1000, medicion.segundos_template * 1000,
+                _resumen_sentencias(medicion.sentencias))
+
+    @app.after_request
+    def _registrar_respuesta(response):
+        _registrar(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _registrar_error(exc):
+        # after_request already popped the medicion unless the view raised
+        if exc is not None:
+            _registrar(500)
+
+
+def exposicion(extra=()):
+    """Texto para /metrics: histogramas, caches y los gauges que pase la app"""
+    lineas = []
+    for histograma in HISTOGRAMAS:
+        lineas.extend(histograma.exponer())
+
+    stats = {nombre: cache.stats() for nombre, cache in sorted(CACHES.items())}
+    for metrica, campo, tipo, ayuda in (
+            ('cache_hits_total', 'hits', 'counter', 'Lecturas servidas desde el cache'),
+            ('cache_misses_total', 'misses', 'counter', 'Lecturas que fueron a la base'),
+            ('cache_entries', 'tamano', 'gauge', 'Entradas vigentes en el cache')):
+        lineas += [f'# HELP {metrica} {ayuda}', f'# TYPE {metrica} {tipo}']
+        lineas += [f'{metrica}{_etiquetas(("cache",), (nombre,))} {s[campo]}' for nombre, s in stats.items()]
+
+    for metrica, ayuda, valor in extra:
+        lineas += [f'# HELP {metrica} {ayuda}', f'# TYPE {metrica} gauge', f'{metrica} {valor}']
+    return '\n'.join(lineas) + '\n'
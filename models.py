@@ -1,16 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from enrutamiento import SesionEnrutada
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 
 class Equipo(db.Model):
     __tablename__ = 'equipos'
     
     id_equipo = db.Column(db.Integer, primary_key=True)
     lider_equipo = db.Column(db.String(100), nullable=False)
+    # Texto plano heredado; `flask migrar-claves --borrar-texto` lo vacía
     clave_lider = db.Column(db.String(120), unique=True, nullable=True)
+    # HMAC de la clave (ver credenciales.py); las búsquedas sólo usan esta columna
+    clave_lider_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)
     hosts = db.relationship('Host', backref='equipo', lazy=True)
     cortes = db.relationship('CorteDiarioHosteo', backref='equipo', lazy=True)
 
@@ -18,9 +22,12 @@ class Host(db.Model):
     __tablename__ = 'hosts'
     
     id_host = db.Column(db.Integer, primary_key=True)
-    id_equipo = db.Column(db.Integer, db.ForeignKey('equipos.id_equipo'), nullable=False)
+    id_equipo = db.Column(db.Integer, db.ForeignKey('equipos.id_equipo'), nullable=False, index=True)
     nombre_host = db.Column(db.String(100), nullable=False)
+    # Texto plano heredado; `flask migrar-claves --borrar-texto` lo vacía
     clave_host = db.Column(db.String(120), unique=True, nullable=True)
+    # HMAC de la clave (ver credenciales.py); las búsquedas sólo usan esta columna
+    clave_host_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)
     
     registros = db.relationship('RegistroDiarioHosteo', backref='host', lazy=True)
 
@@ -29,12 +36,25 @@ class Mesero(db.Model):
     
     id_mesero = db.Column(db.Integer, primary_key=True)
     nombre_mesero = db.Column(db.String(100), nullable=False)
+    # Texto plano heredado; `flask migrar-claves --borrar-texto` lo vacía
     clave_mesero = db.Column(db.String(120), unique=True, nullable=True)
+    # HMAC de la clave (ver credenciales.py); las búsquedas sólo usan esta columna
+    clave_mesero_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)
     
     registros = db.relationship('RegistroDiarioHosteo', backref='mesero', lazy=True)
 
 class RegistroDiarioHosteo(db.Model):
     __tablename__ = 'registro_diario_hosteos'
+    __table_args__ = (
+        # Reportes por día filtran fecha + host (vía equipo); max(fecha) global usa el prefijo
+        db.Index('ix_registro_fecha_host', 'fecha', 'id_host'),
+        # Vista de mesero: fecha = X AND id_mesero = Y, y max(fecha) por mesero
+        db.Index('ix_registro_mesero_fecha', 'id_mesero', 'fecha'),
+        # Paginación keyset de las tablas del día: ORDER BY hora DESC, id DESC
+        db.Index('ix_registro_fecha_hora', 'fecha', 'hora', 'id_registro_hosteo'),
+        # Reintentos de la ingesta por lote: una misma clave nunca se inserta dos veces
+        db.Index('ux_registro_idempotencia', 'clave_idempotencia', unique=True),
+    )
     
     id_registro_hosteo = db.Column(db.Integer, primary_key=True)
     id_host = db.Column(db.Integer, db.ForeignKey('hosts.id_host'), nullable=False)
@@ -43,6 +63,7 @@ class RegistroDiarioHosteo(db.Model):
     numero_personas = db.Column(db.Integer, nullable=False)
     id_mesero = db.Column(db.Integer, db.ForeignKey('meseros.id_mesero'), nullable=False)
     confirmada = db.Column(db.Boolean, default=False)
+    clave_idempotencia = db.Column(db.String(64), nullable=True)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -54,6 +75,10 @@ class RegistroDiarioHosteo(db.Model):
 
 class CorteDiarioHosteo(db.Model):
     __tablename__ = 'corte_diario_hosteos'
+    __table_args__ = (
+        # Un corte por equipo y día; también es el índice de lectura de reportes
+        db.Index('ux_corte_equipo_fecha', 'id_equipo', 'fecha', unique=True),
+    )
     
     id_corte_hosteo = db.Column(db.Integer, primary_key=True)
     id_equipo = db.Column(db.Integer, db.ForeignKey('equipos.id_equipo'), nullable=False)
@@ -64,4 +89,60 @@ class CorteDiarioHosteo(db.Model):
     mesas_totales = db.Column(db.Integer, default=0)
     mesas_bajadas = db.Column(db.Integer, default=0)
     mesas_quedadas = db.Column(db.Integer, default=0)
-    total_mxn = db.Column(db.Float, default=0.0)
\ No newline at end of file
+    total_mxn = db.Column(db.Float, default=0.0)
+
+class ResumenHostDiario(db.Model):
+    __tablename__ = 'resumen_host_diario'
+    __table_args__ = (
+        db.Index('ux_resumen_host_fecha', 'id_host', 'fecha', unique=True),
+        # Ranking del día: fecha = X ORDER BY mesas DESC
+        db.Index('ix_resumen_host_ranking', 'fecha', 'mesas'),
+    )
+
+    id_resumen_host = db.Column(db.Integer, primary_key=True)
+    id_host = db.Column(db.Integer, db.ForeignKey('hosts.id_host'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    mesas = db.Column(db.Integer, default=0)
+    mesas_confirmadas = db.Column(db.Integer, default=0)
+    personas = db.Column(db.Integer, default=0)
+    personas_confirmadas = db.Column(db.Integer, default=0)
+
+
+class ResumenMeseroDiario(db.Model):
+    __tablename__ = 'resumen_mesero_diario'
+    __table_args__ = (
+        db.Index('ux_resumen_mesero_fecha', 'id_mesero', 'fecha', unique=True),
+        db.Index('ix_resumen_mesero_ranking', 'fecha', 'mesas'),
+    )
+
+    id_resumen_mesero = db.Column(db.Integer, primary_key=True)
+    id_mesero = db.Column(db.Integer, db.ForeignKey('meseros.id_mesero'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    mesas = db.Column(db.Integer, default=0)
+    mesas_confirmadas = db.Column(db.Integer, default=0)
+    personas = db.Column(db.Integer, default=0)
+    personas_confirmadas = db.Column(db.Integer, default=0)
+
+class DiaArchivado(db.Model):
+    __tablename__ = 'dias_archivados'
+
+    # Días cuyos registros crudos ya sólo viven en el archivo (ver retencion.py);
+    # sus cortes y resúmenes se conservan y no se vuelven a materializar
+    fecha = db.Column(db.Date, primary_key=True)
+    registros = db.Column(db.Integer, nullable=False)
+    archivo = db.Column(db.String(255), nullable=False)
+    archivado_en = db.Column(db.DateTime, nullable=False)
+
+class DiaMaterializado(db.Model):
+    __tablename__ = 'dias_materializados'
+
+    # Días cerrados con cortes y resúmenes ya calculados, aunque no hayan tenido
+    # registros (esos días no dejan ninguna fila de corte)
+    fecha = db.Column(db.Date, primary_key=True)
+
+class VersionDatos(db.Model):
+    __tablename__ = 'version_datos'
+
+    # 'fecha:AAAA-MM-DD' por día con registros, 'catalogos' para equipos/hosts/meseros
+    clave = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -0,0 +1,97 @@
+"""Entorno de Jinja: cache de bytecode en disco y cache de fragmentos.
+
+Los templates se compilan una vez por proceso (Jinja guarda el resultado en
+memoria); el cache de bytecode guarda esa compilación en disco para que los
+workers nuevos no tengan que repetirla. El cache de fragmentos guarda HTML ya
+renderizado de partes costosas que no cambian, como las tablas por día de
+rangos cerrados.
+"""
+import hashlib
+import os
+import stat
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+
+fragmentos_cache = TTLCache('fragmentos')
+
+
+class FragmentoExtension(Extension):
+    """{% fragmento 'nombre', clave %}...{% endfragmento %}
+
+    Con una clave distinta de None (y el cache encendido) el cuerpo se
+    renderiza una vez y se reutiliza hasta que vence el TTL o se invalida.
+    """
+    tags = {'fragmento'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragmentos=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        parser.stream.expect('comma')
+        args.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(('name:endfragmento',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_renderizar', args), [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, nombre, clave, caller):
+        cache = self.environment.fragmentos
+        if cache is None or clave is None:
+            return caller()
+        return cache.get((nombre, clave), caller)
+
+
+def _directorio_privado(directorio):
+    # The cached bytecode is unmarshalled and run: anyone who can write there runs code as us
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    estado = os.lstat(directorio)
+    if (not stat.S_ISDIR(estado.st_mode) or estado.st_uid != os.getuid()
+            or estado.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+        raise RuntimeError(f'JINJA_BYTECODE_CACHE_DIR={directorio} debe ser un directorio del usuario '
+                           'del proceso, sin permiso de escritura para otros')
+    return directorio
+
+
+def configurar_plantillas(app):
+    """Debe llamarse antes del primer render: Flask crea jinja_env una sola vez"""
+    opciones = {'extensions': [*app.jinja_options.get('extensions', ()), FragmentoExtension]}
+    directorio = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directorio is None:
+        # Jinja's own per-user directory, created 0700 and checked to be ours
+        opciones['bytecode_cache'] = FileSystemBytecodeCache()
+    elif directorio:
+        opciones['bytecode_cache'] = FileSystemBytecodeCache(_directorio_privado(directorio))
+    app.jinja_options = {**app.jinja_options, **opciones}
+
+    fragmentos_cache.ttl = app.config['FRAGMENT_CACHE_TTL']
+    fragmentos_cache.maxsize = app.config['FRAGMENT_CACHE_MAX']
+    app.jinja_env.fragmentos = fragmentos_cache if fragmentos_cache.ttl > 0 else None
+
+
+def huella_plantillas(app):
+    """Hash del contenido de los templates; cambia con cada deploy que los toque"""
+    huella = hashlib.sha1()
+    for nombre in sorted(app.jinja_loader.list_templates()):
+        huella.update(nombre.encode())
+        huella.update(app.jinja_loader.get_source(app.jinja_env, nombre)[0].encode())
+    return huella.hexdigest()[:12]
+
+
+def marcar_fragmentos_obsoletos(session):
+    # Called when a closed day changes; the cache is dropped once the change is committed
+    session.info['invalidar_fragmentos'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_tras_commit(session):
+    if session.info.pop('invalidar_fragmentos', False):
+        fragmentos_cache.invalidar()
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marca(session):
+    session.info.pop('invalidar_fragmentos', None)
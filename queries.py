@@ -0,0 +1,168 @@
+from datetime import time
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import contains_eager, joinedload
+from models import (db, Host, Mesero, RegistroDiarioHosteo, ResumenHostDiario, ResumenMeseroDiario,
+                    DiaArchivado)
+
+
+# Helpers to pick latest date with data. They read the per-day counters, which
+# cover today and outlive archived registros, instead of the registros table
+def consulta_ultima_fecha(equipo_id=None, host_id=None, mesero_id=None):
+    """Consulta de la última fecha con datos; `flask bench planes` mide la misma"""
+    if mesero_id is not None:
+        return db.session.query(func.max(ResumenMeseroDiario.fecha))\
+            .filter(ResumenMeseroDiario.id_mesero == mesero_id)
+    query = db.session.query(func.max(ResumenHostDiario.fecha))
+    if equipo_id is not None:
+        query = query.join(Host, ResumenHostDiario.id_host == Host.id_host)\
+            .filter(Host.id_equipo == equipo_id)
+    if host_id is not None:
+        query = query.filter(ResumenHostDiario.id_host == host_id)
+    return query
+
+def get_latest_fecha_equipo(equipo_id):
+    return consulta_ultima_fecha(equipo_id=equipo_id).scalar()
+
+def get_latest_fecha_mesero(mesero_id):
+    return consulta_ultima_fecha(mesero_id=mesero_id).scalar()
+
+def get_latest_fecha_host(host_id):
+    return consulta_ultima_fecha(host_id=host_id).scalar()
+
+def get_latest_fecha_global():
+    return consulta_ultima_fecha().scalar()
+
+def dia_archivado(fecha):
+    """True si los registros crudos de la fecha ya se movieron al archivo"""
+    return db.session.get(DiaArchivado, fecha) is not None
+
+
+def registros_del_dia(fecha, equipo_id=None, host_id=None, mesero_id=None):
+    """Registros de una fecha con host, equipo y mesero ya cargados.
+
+    Los templates leen registro.host.nombre_host, registro.host.equipo y
+    registro.mesero.nombre_mesero; con los backrefs lazy=True eso dispara
+    un SELECT extra por fila. Aquí se resuelve todo en una sola consulta
+    con JOINs, sin importar cuántos registros tenga el día.
+    """
+    query = RegistroDiarioHosteo.query\
+        .join(RegistroDiarioHosteo.host)\
+        .options(
+            contains_eager(RegistroDiarioHosteo.host).joinedload(Host.equipo),
+            joinedload(RegistroDiarioHosteo.mesero),
+        )\
+        .filter(RegistroDiarioHosteo.fecha == fecha)
+
+    if equipo_id is not None:
+        query = query.filter(Host.id_equipo == equipo_id)
+    if host_id is not None:
+        query = query.filter(RegistroDiarioHosteo.id_host == host_id)
+    if mesero_id is not None:
+        query = query.filter(RegistroDiarioHosteo.id_mesero == mesero_id)
+
+    # id breaks ties between registros captured in the same second so the
+    # order is total and keyset pages never skip or repeat rows
+    return query.order_by(RegistroDiarioHosteo.hora.desc(),
+                          RegistroDiarioHosteo.id_registro_hosteo.desc())
+
+
+def parse_cursor(valor):
+    """Cursor 'HH:MM:SS[.ffffff]_<id>' -> (hora, id), o None si no es válido"""
+    try:
+        hora, id_registro = (valor or '').split('_')
+        return time.fromisoformat(hora), int(id_registro)
+    except ValueError:
+        return None
+
+def pagina_registros(query, cursor=None, limite=50):
+    """Una página de registros_del_dia() con paginación keyset sobre (hora, id).
+
+    Regresa (registros, cursor_siguiente); el cursor es None en la última
+    página. No usa OFFSET, así que pedir la página N cuesta lo mismo que la
+    primera.
+    """
+    if cursor is not None:
+        hora, id_registro = cursor
+        query = query.filter(or_(
+            RegistroDiarioHosteo.hora < hora,
+            and_(RegistroDiarioHosteo.hora == hora,
+                 RegistroDiarioHosteo.id_registro_hosteo < id_registro)
+        ))
+    registros = query.limit(limite + 1).all()
+    if len(registros) <= limite:
+        return registros, None
+    registros = registros[:limite]
+    ultimo = registros[-1]
+    return registros, f'{ultimo.hora.isoformat()}_{ultimo.id_registro_hosteo}'
+
+
+def resumen_tarjetas(total_hosteos, confirmados, total_personas, personas_confirmadas):
+    # Same keys the report templates take as stat-card kwargs
+    return dict(total_hosteos=total_hosteos,
+                confirmados=confirmados,
+                no_confirmados=total_hosteos - confirmados,
+                total_personas=total_personas,
+                personas_confirmadas=personas_confirmadas)
+
+
+def consulta_ranking_hosts(fecha, equipo_id=None, host_id=None):
+    """Consulta del ranking de hosts del día leído de los contadores por (fecha, host).
+
+    Una fila por host con registros, ya ordenadas por ix_resumen_host_ranking;
+    no toca los registros del día. Las primeras cinco columnas conservan el
+    orden que lee reporte.html (nombre_host, id_host, total, personas,
+    host_equipo_id).
+    """
+    r = ResumenHostDiario
+    query = db.session.query(
+        Host.nombre_host,
+        Host.id_host,
+        r.mesas.label('total'),
+        r.personas.label('personas'),
+        Host.id_equipo.label('host_equipo_id'),
+        r.mesas_confirmadas.label('confirmados'),
+        r.personas_confirmadas.label('personas_confirmadas'),
+    ).join(Host, r.id_host == Host.id_host).filter(r.fecha == fecha)
+
+    if equipo_id is not None:
+        query = query.filter(Host.id_equipo == equipo_id)
+    if host_id is not None:
+        query = query.filter(r.id_host == host_id)
+
+    return query.order_by(r.mesas.desc(), r.id_host)
+
+def ranking_hosts(fecha, equipo_id=None, host_id=None, limite=None):
+    """Filas de consulta_ranking_hosts(), las primeras `limite` si se indica"""
+    query = consulta_ranking_hosts(fecha, equipo_id, host_id)
+    return (query.limit(limite) if limite else query).all()
+
+def consulta_ranking_meseros(fecha, limite=20):
+    """Consulta del top de meseros del día por mesas, leído de los contadores por (fecha, mesero)"""
+    r = ResumenMeseroDiario
+    return db.session.query(
+        Mesero.nombre_mesero,
+        Mesero.id_mesero,
+        r.mesas.label('total'),
+        r.personas.label('personas'),
+        r.mesas_confirmadas.label('confirmados'),
+        r.personas_confirmadas.label('personas_confirmadas'),
+    ).join(Mesero, r.id_mesero == Mesero.id_mesero).filter(r.fecha == fecha)\
+        .order_by(r.mesas.desc(), r.id_mesero).limit(limite)
+
+def ranking_meseros(fecha, limite=20):
+    """Top de meseros del día por mesas"""
+    return consulta_ranking_meseros(fecha, limite).all()
+
+def resumen_desde_ranking(ranking):
+    """Tarjetas del reporte sumando las filas del ranking (una por host, no por registro)"""
+    return resumen_tarjetas(sum(r.total for r in ranking),
+                    sum(r.confirmados for r in ranking),
+                    sum(r.personas for r in ranking),
+                    sum(r.personas_confirmadas for r in ranking))
+
+def resumen_mesero(fecha, mesero_id):
+    """Tarjetas de la vista de mesero: la fila de su contador del día"""
+    r = ResumenMeseroDiario
+    fila = db.session.query(r.mesas, r.mesas_confirmadas, r.personas, r.personas_confirmadas)\
+        .filter(r.id_mesero == mesero_id, r.fecha == fecha).first()
+    return resumen_tarjetas(*(fila or (0, 0, 0, 0)))
@@ -0,0 +1,123 @@
+"""Reportes por rango de fechas a partir de cortes y resúmenes diarios.
+
+Los días cerrados del rango se leen de las tablas materializadas (una fila por
+día y equipo, host o mesero) y el día en curso, si cae en el rango, del
+agregado en vivo. El costo crece con los días del rango, no con los registros.
+Leer un rango nunca escribe: los días cerrados que el cron nocturno aún no
+materializa salen de los contadores por host.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import func
+from models import db, Host, Mesero, CorteDiarioHosteo, ResumenHostDiario, ResumenMeseroDiario
+from cortes import cortes_sin_materializar
+from queries import ranking_hosts, resumen_desde_ranking, resumen_mesero, resumen_tarjetas
+
+# Same shape as the rows of queries.ranking_hosts, which reporte.html indexes
+FilaRanking = namedtuple('FilaRanking', 'nombre_host id_host total personas host_equipo_id '
+                                        'confirmados personas_confirmadas')
+
+
+def _columnas(equipo_id, host_id, mesero_id):
+    if host_id is not None:
+        m = ResumenHostDiario
+        return m, (m.mesas, m.mesas_confirmadas, m.personas, m.personas_confirmadas), [m.id_host == host_id]
+    if mesero_id is not None:
+        m = ResumenMeseroDiario
+        return m, (m.mesas, m.mesas_confirmadas, m.personas, m.personas_confirmadas), [m.id_mesero == mesero_id]
+    m = CorteDiarioHosteo
+    filtros = [m.id_equipo == equipo_id] if equipo_id is not None else []
+    return m, (m.mesas_totales, m.mesas_bajadas, m.px_totales, m.px_bajadas), filtros
+
+
+def cerrar_rango(desde, hasta, hoy):
+    """Último día cerrado del rango, o None si el rango empieza hoy o después"""
+    cerrado_hasta = min(hasta, hoy - timedelta(days=1))
+    return cerrado_hasta if desde <= cerrado_hasta else None
+
+
+def serie_diaria(desde, hasta, hoy, equipo_id=None, host_id=None, mesero_id=None):
+    """Conteos por día del rango para un equipo, host, mesero o el total"""
+    serie = []
+    cerrado_hasta = cerrar_rango(desde, hasta, hoy)
+    if cerrado_hasta is not None:
+        modelo, columnas, filtros = _columnas(equipo_id, host_id, mesero_id)
+        filas = db.session.query(modelo.fecha, *(func.sum(c) for c in columnas))\
+            .filter(modelo.fecha >= desde, modelo.fecha <= cerrado_hasta, *filtros)\
+            .group_by(modelo.fecha).order_by(modelo.fecha).all()
+        if modelo is CorteDiarioHosteo:
+            pendientes = cortes_sin_materializar(desde, cerrado_hasta, equipo_id).subquery()
+            p = pendientes.c
+            filas += db.session.query(p.fecha, *(func.sum(c) for c in (p.mesas_totales, p.mesas_bajadas,
+                                                                       p.px_totales, p.px_bajadas)))\
+                .group_by(p.fecha).all()
+            filas.sort(key=lambda fila: fila[0])
+        serie = [dict(fecha=fecha, **resumen_tarjetas(*conteos)) for fecha, *conteos in filas]
+
+    if desde <= hoy <= hasta:
+        if mesero_id is not None:
+            resumen = resumen_mesero(hoy, mesero_id)
+        else:
+            resumen = resumen_desde_ranking(ranking_hosts(hoy, equipo_id=equipo_id, host_id=host_id))
+        if resumen['total_hosteos']:
+            serie.append(dict(fecha=hoy, **resumen))
+    return serie
+
+
+def resumen_serie(serie):
+    """Tarjetas del rango completo sumando la serie diaria"""
+    return resumen_tarjetas(sum(d['total_hosteos'] for d in serie),
+                            sum(d['confirmados'] for d in serie),
+                            sum(d['total_personas'] for d in serie),
+                            sum(d['personas_confirmadas'] for d in serie))
+
+
+def ranking_hosts_rango(desde, hasta, hoy, equipo_id=None):
+    """Ranking de hosts acumulado en el rango, con las columnas de ranking_hosts"""
+    acumulado = {}
+
+    def sumar(nombre_host, id_host, total, personas, host_equipo_id, confirmados, personas_confirmadas):
+        previo = acumulado.get(id_host)
+        if previo:
+            total += previo.total
+            personas += previo.personas
+            confirmados += previo.confirmados
+            personas_confirmadas += previo.personas_confirmadas
+        acumulado[id_host] = FilaRanking(nombre_host, id_host, total, personas, host_equipo_id,
+                                         confirmados, personas_confirmadas)
+
+    cerrado_hasta = cerrar_rango(desde, hasta, hoy)
+    if cerrado_hasta is not None:
+        r = ResumenHostDiario
+        query = db.session.query(
+            Host.nombre_host, Host.id_host,
+            func.sum(r.mesas), func.sum(r.personas), Host.id_equipo,
+            func.sum(r.mesas_confirmadas), func.sum(r.personas_confirmadas)
+        ).join(Host, r.id_host == Host.id_host)\
+         .filter(r.fecha >= desde, r.fecha <= cerrado_hasta)
+        if equipo_id is not None:
+            query = query.filter(Host.id_equipo == equipo_id)
+        for fila in query.group_by(Host.nombre_host, Host.id_host, Host.id_equipo):
+            sumar(*fila)
+
+    if desde <= hoy <= hasta:
+        for fila in ranking_hosts(hoy, equipo_id=equipo_id):
+            sumar(*fila)
+
+    return sorted(acumulado.values(), key=lambda f: f.total, reverse=True)
+
+
+def ranking_meseros_rango(desde, hasta, limite=20):
+    """Top de meseros del rango con las columnas de queries.ranking_meseros"""
+    # The per-mesero counters also cover today, so one query spans the whole range
+    r = ResumenMeseroDiario
+    mesas = func.sum(r.mesas)
+    return db.session.query(
+        Mesero.nombre_mesero, Mesero.id_mesero,
+        mesas.label('total'), func.sum(r.personas).label('personas'),
+        func.sum(r.mesas_confirmadas).label('confirmados'),
+        func.sum(r.personas_confirmadas).label('personas_confirmadas'),
+    ).join(Mesero, r.id_mesero == Mesero.id_mesero)\
+     .filter(r.fecha >= desde, r.fecha <= hasta)\
+     .group_by(Mesero.nombre_mesero, Mesero.id_mesero)\
+     .order_by(mesas.desc(), Mesero.id_mesero).limit(limite).all()
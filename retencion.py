@@ -0,0 +1,193 @@
+"""Retención de registros: particiones mensuales en Postgres y archivo en frío.
+
+`registro_diario_hosteos` puede convertirse en una tabla particionada por mes
+de `fecha`. Cada mes vive en su propia tabla con sus propios índices, así que
+el vacuum y los índices que toca cada alta son los del mes en curso, no los de
+años de historial, y un mes archivado se quita con un DROP en lugar de un
+DELETE fila por fila. Una partición DEFAULT recibe cualquier fecha que no
+tenga partición propia.
+
+Archivar un mes deja sus cortes y resúmenes materializados (de ahí leen los
+reportes de días pasados), escribe sus registros crudos a un archivo y los
+borra de la base; `dias_archivados` anota qué días ya no tienen registros.
+"""
+import gzip
+import os
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from models import db, RegistroDiarioHosteo, DiaArchivado
+from cortes import materializar_dias
+from exportar import exportacion, nombre_archivo
+from versiones import marcar_fechas
+
+TABLA = RegistroDiarioHosteo.__tablename__
+PARTICION_DEFAULT = f'{TABLA}_default'
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def siguiente_mes(fecha):
+    return (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def nombre_particion(mes):
+    return f'{TABLA}_{mes:%Y_%m}'
+
+
+def _sql(sentencia, **parametros):
+    return db.session.execute(text(sentencia), parametros)
+
+
+def particionada():
+    """True si registro_diario_hosteos ya es una tabla particionada (sólo Postgres)"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return _sql('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:tabla)',
+                tabla=TABLA).first() is not None
+
+
+def particiones():
+    """Primer día de cada mes que ya tiene partición propia"""
+    nombres = _sql('SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                   'WHERE i.inhparent = to_regclass(:tabla)', tabla=TABLA).scalars()
+    prefijo = f'{TABLA}_'
+    return {datetime.strptime(n[len(prefijo):], '%Y_%m').date()
+            for n in nombres if n != PARTICION_DEFAULT and n.startswith(prefijo)}
+
+
+def _crear_particion(mes):
+    nombre, fin = nombre_particion(mes), siguiente_mes(mes)
+    rango = f"FROM ('{mes}') TO ('{fin}')"
+    en_default = 0
+    if _sql('SELECT to_regclass(:tabla)', tabla=PARTICION_DEFAULT).scalar():
+        en_default = _sql(f'SELECT count(*) FROM {PARTICION_DEFAULT} WHERE fecha >= :mes AND fecha < :fin',
+                          mes=mes, fin=fin).scalar()
+    if not en_default:
+        _sql(f'CREATE TABLE {nombre} PARTITION OF {TABLA} FOR VALUES {rango}')
+        return 0
+    # Postgres refuses a new partition while DEFAULT holds rows of its range:
+    # move them into a plain table first and attach it afterwards
+    _sql(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)')
+    _sql(f'WITH movidas AS (DELETE FROM {PARTICION_DEFAULT} WHERE fecha >= :mes AND fecha < :fin RETURNING *) '
+         f'INSERT INTO {nombre} SELECT * FROM movidas', mes=mes, fin=fin)
+    _sql(f'ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES {rango}')
+    return en_default
+
+
+def crear_particiones(desde, hasta):
+    """Crea las particiones faltantes de los meses de [desde, hasta].
+
+    Regresa [(mes, filas movidas desde DEFAULT)] de las creadas; el commit
+    queda a cargo de quien llama.
+    """
+    existentes = particiones()
+    creadas = []
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        if mes not in existentes:
+            creadas.append((mes, _crear_particion(mes)))
+        mes = siguiente_mes(mes)
+    return creadas
+
+
+def particionar_registros(hasta):
+    """Convierte registro_diario_hosteos en tabla particionada por mes.
+
+    Crea las particiones del primer registro hasta el mes de `hasta` más la
+    DEFAULT, copia todas las filas y reconstruye llaves e índices con los
+    mismos nombres. Todo va en la transacción en curso y bloquea la tabla hasta
+    el commit: es para una ventana sin tráfico. Regresa las filas copiadas.
+    """
+    anterior = f'{TABLA}_sin_particion'
+    minimo = db.session.query(func.min(RegistroDiarioHosteo.fecha)).scalar() or hasta
+    _sql(f'ALTER TABLE {TABLA} RENAME TO {anterior}')
+    secuencia = _sql("SELECT pg_get_serial_sequence(:tabla, 'id_registro_hosteo')", tabla=anterior).scalar()
+    # LIKE keeps column order, NOT NULLs and the id default (nextval of the same sequence)
+    _sql(f'CREATE TABLE {TABLA} (LIKE {anterior} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)')
+    _sql(f'CREATE TABLE {PARTICION_DEFAULT} PARTITION OF {TABLA} DEFAULT')
+    crear_particiones(minimo, hasta)
+    copiadas = _sql(f'INSERT INTO {TABLA} SELECT * FROM {anterior}').rowcount
+    if secuencia:
+        # The serial sequence belongs to the old table and would be dropped with it
+        _sql(f'ALTER SEQUENCE {secuencia} OWNED BY {TABLA}.id_registro_hosteo')
+    _sql(f'DROP TABLE {anterior}')
+
+    # Keys and indexes go in after the copy (one build instead of per-row
+    # maintenance) and once the old names are free. The primary key, and any
+    # unique index, of a partitioned table must include the partition key
+    _sql(f'ALTER TABLE {TABLA} ADD PRIMARY KEY (id_registro_hosteo, fecha)')
+    tabla = RegistroDiarioHosteo.__table__
+    for fk in tabla.foreign_keys:
+        _sql(f'ALTER TABLE {TABLA} ADD FOREIGN KEY ({fk.parent.name}) '
+             f'REFERENCES {fk.column.table.name} ({fk.column.name})')
+    for indice in tabla.indexes:
+        columnas = [c.name for c in indice.columns]
+        if indice.unique and 'fecha' not in columnas:
+            # ux_registro_idempotencia becomes unique per day; ingesta still
+            # looks the clave up across all days before inserting
+            columnas.append('fecha')
+        _sql(f'CREATE {"UNIQUE " if indice.unique else ""}INDEX {indice.name} ON {TABLA} ({", ".join(columnas)})')
+    _sql(f'ANALYZE {TABLA}')
+    return copiadas
+
+
+def meses_por_archivar(hasta):
+    """[(mes, [(fecha, registros), ...])] de los días hasta `hasta` que aún tienen registros"""
+    por_mes = defaultdict(list)
+    for fecha, registros in db.session.query(RegistroDiarioHosteo.fecha, func.count())\
+            .filter(RegistroDiarioHosteo.fecha <= hasta)\
+            .group_by(RegistroDiarioHosteo.fecha).order_by(RegistroDiarioHosteo.fecha):
+        por_mes[inicio_mes(fecha)].append((fecha, registros))
+    return sorted(por_mes.items())
+
+
+def _escribir_archivo(desde, hasta, directorio, formato):
+    os.makedirs(directorio, exist_ok=True)
+    nombre = nombre_archivo('registros', formato, desde, hasta)
+    if formato == 'csv':
+        nombre += '.gz'
+    ruta = os.path.join(directorio, nombre)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as crudo:
+        with gzip.GzipFile(fileobj=crudo, mode='wb') if formato == 'csv' else nullcontext(crudo) as f:
+            for pedazo in exportacion('registros', formato, desde, hasta):
+                f.write(pedazo.encode('utf-8') if isinstance(pedazo, str) else pedazo)
+        # The file must be on disk before the rows it holds are deleted
+        crudo.flush()
+        os.fsync(crudo.fileno())
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def archivar_mes(mes, dias, hasta, directorio, formato, ahora):
+    """Archiva los `dias` [(fecha, registros)] del mes que empieza en `mes`, hasta `hasta`.
+
+    Materializa sus cortes y resúmenes, escribe los registros crudos al
+    archivo, los borra (DROP de la partición si el mes entero queda
+    archivado) y anota los días en `dias_archivados`. Regresa la ruta del
+    archivo; el commit queda a cargo de quien llama.
+    """
+    desde, fin_mes = dias[0][0], siguiente_mes(mes) - timedelta(days=1)
+    fin = min(fin_mes, hasta)
+    if db.engine.dialect.name == 'postgresql':
+        # A late confirmation waits for the commit, so the cortes, the file
+        # and the delete all see the same rows
+        _sql(f'LOCK TABLE {TABLA} IN SHARE MODE')
+    materializar_dias(desde, fin)
+    ruta = _escribir_archivo(desde, fin, directorio, formato)
+
+    if fin == fin_mes and particionada() and mes in particiones():
+        _sql(f'DROP TABLE {nombre_particion(mes)}')
+    else:
+        RegistroDiarioHosteo.query.filter(RegistroDiarioHosteo.fecha >= desde,
+                                          RegistroDiarioHosteo.fecha <= fin).delete(synchronize_session=False)
+    db.session.add_all(DiaArchivado(fecha=fecha, registros=registros, archivo=os.path.basename(ruta),
+                                    archivado_en=ahora)
+                       for fecha, registros in dias)
+    # Their report pages lose the registros table
+    marcar_fechas(fecha for fecha, _ in dias)
+    return ruta
@@ -0,0 +1,116 @@
+"""Fixtures de las pruebas: apps independientes sobre bases SQLite temporales."""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import create_app, get_cdmx_time
+from cache import CACHES
+from config import Config, opciones_engine
+from contadores import contar_altas
+from cortes import materializar_dias
+from credenciales import COOKIE_MESERO, emitir_token_mesero
+from enrutamiento import REPLICA
+from generador import filas_del_dia, generar_catalogos
+from models import db, Equipo, RegistroDiarioHosteo
+from versiones import marcar_fechas
+
+
+@pytest.fixture
+def nueva_app(tmp_path):
+    """Fábrica de apps, cada una con su propia base SQLite vacía y, si se pide, una réplica"""
+    apps = []
+
+    def crear(replica=False):
+        url = f'sqlite:///{tmp_path / f"terraza{len(apps)}.db"}'
+
+        class ConfigPrueba(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = url
+            SQLALCHEMY_ENGINE_OPTIONS = opciones_engine(url)
+            # The "replica" is a second engine on the same file: same data, separate connections
+            SQLALCHEMY_BINDS = {REPLICA: {'url': url, **opciones_engine(url)}} if replica else {}
+            JINJA_BYTECODE_CACHE_DIR = ''
+
+        app = create_app(ConfigPrueba)
+        with app.app_context():
+            # Only the primary: the replica bind's metadata stays on `db` once any app declared it
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield crear
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(nueva_app):
+    return nueva_app()
+
+
+def limpiar_caches():
+    # The reference and fragment caches are per process, shared by every app
+    for cache in CACHES.values():
+        cache.invalidar()
+
+
+def poblar(app, por_dia, semilla=2026):
+    """Catálogos sintéticos y `por_dia` registros de hoy y de ayer (ya materializado).
+
+    Regresa los ids y fechas que usan las rutas de las pruebas.
+    """
+    hoy = get_cdmx_time().date()
+    ayer = hoy - timedelta(days=1)
+    rng = random.Random(semilla)
+    with app.app_context():
+        # 777 is the control equipo behind /reporte-total, as in init-db
+        db.session.add(Equipo(id_equipo=777, lider_equipo='Control'))
+        equipos, hosts, meseros = generar_catalogos(2, 3, 4)
+        host_ids = [h.id_host for h in hosts]
+        mesero_ids = [m.id_mesero for m in meseros]
+        for fecha in (ayer, hoy):
+            filas = filas_del_dia(rng, fecha, host_ids, mesero_ids, por_dia)
+            db.session.execute(insert(RegistroDiarioHosteo), filas)
+            contar_altas(SimpleNamespace(**f) for f in filas)
+            marcar_fechas([fecha])
+        materializar_dias(ayer)
+        db.session.commit()
+        ids = dict(equipo=equipos[0].id_equipo, host=hosts[0].id_host, mesero=meseros[0].id_mesero,
+                   hoy=hoy, ayer=ayer)
+    limpiar_caches()
+    return ids
+
+
+def cliente_mesero(app, mesero_id):
+    """Cliente de prueba con la cookie de sesión del mesero"""
+    cliente = app.test_client()
+    with app.app_context():
+        cliente.set_cookie(COOKIE_MESERO, emitir_token_mesero(mesero_id))
+    return cliente
+
+
+@contextmanager
+def contar_sentencias(app, bind=None):
+    """Cuenta las sentencias SQL que manda la app dentro del bloque, y cuántas escriben.
+
+    `bind` elige el engine (None es la primaria).
+    """
+    conteo = SimpleNamespace(total=0, escrituras=0)
+
+    def contar(conn, cursor, statement, *args):
+        conteo.total += 1
+        if statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            conteo.escrituras += 1
+
+    with app.app_context():
+        engine = db.engines[bind]
+    event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        yield conteo
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
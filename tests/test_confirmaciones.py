@@ -0,0 +1,123 @@
+"""Confirmaciones tardías sobre días cerrados."""
+import threading
+from datetime import time, timedelta
+
+from conftest import cliente_mesero, poblar
+from contadores import contar_altas
+from cortes import materializar_cortes, verificar_resumenes
+from models import db, CorteDiarioHosteo, RegistroDiarioHosteo
+
+
+def cortes_del_dia(fecha):
+    c = CorteDiarioHosteo
+    return sorted(db.session.query(c.id_equipo, c.mesas_totales, c.mesas_bajadas, c.mesas_quedadas,
+                                   c.px_totales, c.px_bajadas, c.px_quedadas).filter(c.fecha == fecha))
+
+
+def test_confirmaciones_concurrentes_en_dia_cerrado(app):
+    ids = poblar(app, 40)
+    ayer = ids['ayer']
+    with app.app_context():
+        por_mesero = {}
+        for r in RegistroDiarioHosteo.query.filter_by(fecha=ayer).order_by(RegistroDiarioHosteo.id_registro_hosteo):
+            por_mesero.setdefault(r.id_mesero, []).append(
+                {'id_registro_hosteo': r.id_registro_hosteo, 'confirmada': not r.confirmada})
+        lotes = list(por_mesero.items())[:2]
+        antes = cortes_del_dia(ayer)
+    assert len(lotes) == 2
+
+    salida = threading.Barrier(len(lotes))
+    respuestas = []
+
+    def confirmar(mesero_id, confirmaciones):
+        cliente = cliente_mesero(app, mesero_id)
+        salida.wait()
+        respuestas.append(cliente.post('/api/confirmar', json={'confirmaciones': confirmaciones}))
+
+    hilos = [threading.Thread(target=confirmar, args=lote) for lote in lotes]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert [r.status_code for r in respuestas] == [200, 200]
+    assert all(r.get_json()['success'] for r in respuestas)
+    with app.app_context():
+        despues = cortes_del_dia(ayer)
+        assert despues != antes
+        # The adjusted cortes match a rebuild from the registros
+        materializar_cortes(ayer)
+        assert cortes_del_dia(ayer) == despues
+        assert verificar_resumenes(ayer) == []
+        db.session.rollback()
+
+
+def test_confirmacion_de_dia_sin_materializar_no_crea_corte(app):
+    ids = poblar(app, 20)
+    pendiente = ids['ayer'] - timedelta(days=1)
+    with app.app_context():
+        registro = RegistroDiarioHosteo(id_host=ids['host'], id_mesero=ids['mesero'], numero_personas=2,
+                                        fecha=pendiente, hora=time(14), confirmada=False)
+        db.session.add(registro)
+        contar_altas([registro])
+        db.session.commit()
+        registro_id = registro.id_registro_hosteo
+
+    respuesta = cliente_mesero(app, ids['mesero']).post(f'/api/confirmar/{registro_id}', json={'confirmada': True})
+    assert respuesta.status_code == 200
+    with app.app_context():
+        # A partial corte would pass for the whole day; the nightly job builds it from the registros
+        assert cortes_del_dia(pendiente) == []
+        assert verificar_resumenes(pendiente) == []
+
+
+def test_confirmada_que_no_es_booleano_se_rechaza(app):
+    ids = poblar(app, 20)
+    with app.app_context():
+        registro = RegistroDiarioHosteo.query.filter_by(id_mesero=ids['mesero'], fecha=ids['hoy']).first()
+        registro_id, original = registro.id_registro_hosteo, registro.confirmada
+    cliente = cliente_mesero(app, ids['mesero'])
+
+    for valor in ('false', 'true', 0, 1, None):
+        assert cliente.post(f'/api/confirmar/{registro_id}', json={'confirmada': valor}).status_code == 400
+        lote = {'confirmaciones': [{'id_registro_hosteo': registro_id, 'confirmada': valor}]}
+        assert cliente.post('/api/confirmar', json=lote).status_code == 400
+    with app.app_context():
+        assert db.session.get(RegistroDiarioHosteo, registro_id).confirmada is original
+
+    respuesta = cliente.post(f'/api/confirmar/{registro_id}', json={'confirmada': not original})
+    assert respuesta.get_json() == {'success': True, 'confirmada': not original}
+
+
+def test_mismo_registro_confirmado_dos_veces_a_la_vez_cuenta_una(app):
+    ids = poblar(app, 40)
+    ayer = ids['ayer']
+    with app.app_context():
+        registro = RegistroDiarioHosteo.query.filter_by(fecha=ayer, confirmada=False)\
+            .order_by(RegistroDiarioHosteo.id_registro_hosteo).first()
+        registro_id, mesero_id = registro.id_registro_hosteo, registro.id_mesero
+        antes = cortes_del_dia(ayer)
+
+    salida = threading.Barrier(2)
+    respuestas = []
+
+    def confirmar():
+        cliente = cliente_mesero(app, mesero_id)
+        salida.wait()
+        respuestas.append(cliente.post('/api/confirmar', json={'confirmaciones': [
+            {'id_registro_hosteo': registro_id, 'confirmada': True}]}))
+
+    hilos = [threading.Thread(target=confirmar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert [r.status_code for r in respuestas] == [200, 200]
+    with app.app_context():
+        despues = cortes_del_dia(ayer)
+        assert despues != antes
+        assert verificar_resumenes(ayer) == []
+        materializar_cortes(ayer)
+        assert cortes_del_dia(ayer) == despues
+        db.session.rollback()
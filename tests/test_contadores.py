@@ -0,0 +1,21 @@
+"""Contadores por host y mesero y su reconciliación."""
+from app import reconciliar_contadores
+from conftest import poblar
+from models import db, ResumenHostDiario
+from versiones import version_reporte
+
+
+def test_reparar_contadores_cambia_la_version_del_dia(app):
+    ids = poblar(app, 20)
+    with app.app_context():
+        db.session.query(ResumenHostDiario).filter_by(fecha=ids['hoy'], id_host=ids['host'])\
+            .update({ResumenHostDiario.mesas: ResumenHostDiario.mesas + 5})
+        db.session.commit()
+        antes = version_reporte(ids['hoy'], ids['hoy'])
+
+    resultado = app.test_cli_runner().invoke(reconciliar_contadores, ['--reparar'])
+    assert resultado.exit_code == 0, resultado.output
+    with app.app_context():
+        # A cached report of the repaired day must not revalidate with the old ETag
+        assert version_reporte(ids['hoy'], ids['hoy']) != antes
+        assert app.test_cli_runner().invoke(reconciliar_contadores).exit_code == 0
@@ -0,0 +1,55 @@
+"""Cortes y resúmenes materializados de días cerrados."""
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from conftest import contar_sentencias, poblar
+from contadores import contar_altas
+from cortes import materializar_dias
+from generador import filas_del_dia
+from models import db, DiaMaterializado, Host, Mesero, RegistroDiarioHosteo
+
+
+def registros_pendientes(app, fecha, cantidad):
+    # Registros of a closed day the nightly job has not reached yet
+    with app.app_context():
+        hosts = [h for (h,) in db.session.query(Host.id_host)]
+        meseros = [m for (m,) in db.session.query(Mesero.id_mesero)]
+        filas = filas_del_dia(random.Random(7), fecha, hosts, meseros, cantidad)
+        db.session.execute(insert(RegistroDiarioHosteo), filas)
+        contar_altas(SimpleNamespace(**f) for f in filas)
+        db.session.commit()
+
+
+def test_dia_cerrado_sin_registros_queda_anotado(app):
+    ids = poblar(app, 20)
+    vacio = ids['ayer'] - timedelta(days=1)
+    with app.app_context():
+        assert materializar_dias(vacio) == (0, 0)
+        db.session.commit()
+        assert db.session.get(DiaMaterializado, vacio) is not None
+
+
+def test_rango_con_dias_sin_materializar_no_escribe(app):
+    ids = poblar(app, 20)
+    pendiente = ids['ayer'] - timedelta(days=1)
+    registros_pendientes(app, pendiente, 30)
+    cliente = app.test_client()
+    rango = f'fecha_inicio={pendiente}&fecha_fin={ids["hoy"]}'
+    rutas = [f'/api/tendencia?{rango}', f'/api/tendencia?{rango}&ambito=equipo&id={ids["equipo"]}',
+             f'/reporte-total?{rango}', f'/reporte/{ids["equipo"]}?{rango}', f'/exportar/cortes?{rango}']
+
+    with contar_sentencias(app) as conteo:
+        antes = [cliente.get(ruta).data for ruta in rutas]
+    assert conteo.escrituras == 0
+    with app.app_context():
+        assert db.session.get(DiaMaterializado, pendiente) is None
+        materializar_dias(pendiente)
+        db.session.commit()
+
+    # The pending day read from the host counters matches its materialized corte
+    assert [cliente.get(ruta).data for ruta in rutas] == antes
+    serie = cliente.get(rutas[0]).get_json()['serie']
+    assert [d['fecha'] for d in serie] == [str(pendiente), str(ids['ayer']), str(ids['hoy'])]
@@ -0,0 +1,29 @@
+"""Lecturas de las vistas @solo_lectura enrutadas a la réplica."""
+from conftest import contar_sentencias, poblar
+from enrutamiento import REPLICA
+
+
+def test_exportacion_por_streaming_lee_de_la_replica(nueva_app):
+    app = nueva_app(replica=True)
+    ids = poblar(app, 30)
+    cliente = app.test_client()
+    with contar_sentencias(app) as primaria, contar_sentencias(app, REPLICA) as replica:
+        respuesta = cliente.get(f'/exportar/registros?fecha={ids["hoy"]}')
+        # The body is generated while it is read, after the view returned
+        filas = respuesta.get_data(as_text=True).splitlines()
+    assert respuesta.status_code == 200
+    assert len(filas) == 31
+    assert replica.total > 0
+    assert primaria.total == 0
+
+
+def test_la_marca_no_sobrevive_al_request(nueva_app):
+    app = nueva_app(replica=True)
+    ids = poblar(app, 5)
+    cliente = app.test_client()
+    with app.app_context():
+        # With an outer app context, g is shared by every request in it
+        cliente.get(f'/reporte/{ids["equipo"]}')
+        with contar_sentencias(app, REPLICA) as replica:
+            assert cliente.get(f'/equipo/{ids["equipo"]}').status_code == 200
+    assert replica.total == 0
@@ -0,0 +1,43 @@
+"""Comandos de datos sintéticos y benchmarks."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import generar_datos
+from bench import planes
+from generador import base_local
+
+
+@pytest.mark.parametrize('url, local', [
+    ('sqlite:///terraza.db', True),
+    ('postgresql://postgres:pw@localhost/terraza', True),
+    ('postgresql://postgres:pw@127.0.0.1:5432/terraza', True),
+    ('postgresql:///terraza', True),
+    ('postgresql://postgres:pw@db.abcd.supabase.co:5432/postgres', False),
+])
+def test_base_local(url, local):
+    assert base_local(url) is local
+
+
+def test_bench_planes_se_niega_contra_base_remota(app):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://postgres:pw@db.abcd.supabase.co/postgres'
+    resultado = app.test_cli_runner().invoke(planes)
+    assert resultado.exit_code != 0
+    assert '--permitir-remoto' in resultado.output
+    assert 'pw' not in resultado.output
+
+
+def test_los_workers_no_importan_el_arnes_de_benchmarks(tmp_path):
+    codigo = 'import sys, wsgi; sys.exit(1 if "bench" in sys.modules else 0)'
+    entorno = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp_path / "terraza.db"}')
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, '-c', codigo], cwd=raiz, env=entorno).returncode == 0
+
+
+def test_generar_datos_se_niega_contra_base_remota(app):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://postgres:pw@db.abcd.supabase.co/postgres'
+    resultado = app.test_cli_runner().invoke(generar_datos)
+    assert resultado.exit_code != 0
+    assert '--permitir-remoto' in resultado.output
@@ -0,0 +1,46 @@
+"""Ingesta por lote idempotente desde las tablets."""
+from sqlalchemy import event
+
+from app import get_cdmx_time
+from conftest import poblar
+from ingesta import insertar_lote
+from models import db, ResumenHostDiario
+
+
+def mesas_del_host(host_id, fecha):
+    return db.session.query(ResumenHostDiario.mesas).filter_by(id_host=host_id, fecha=fecha).scalar() or 0
+
+
+def test_clave_ganada_por_reintento_concurrente_cuenta_como_duplicado(app):
+    ids = poblar(app, 5)
+    ahora = get_cdmx_time()
+    lote = [dict(clave_idempotencia=clave, id_host=ids['host'], id_mesero=ids['mesero'], numero_personas=2,
+                 registrado_en=ahora.isoformat())
+            for clave in ('tablet-1', 'tablet-2')]
+
+    def reintento(conn, cursor, statement, parameters, context, executemany):
+        # A retry of the same batch commits 'tablet-1' between the lookup and the insert
+        if statement.startswith('INSERT INTO registro_diario_hosteos') and not ganada:
+            ganada.append(True)
+            cursor.execute('INSERT INTO registro_diario_hosteos (clave_idempotencia, id_host, id_mesero, '
+                           'numero_personas, fecha, hora, confirmada) VALUES (?, ?, ?, 2, ?, ?, 0)',
+                           ('tablet-1', ids['host'], ids['mesero'], ahora.date().isoformat(),
+                            ahora.time().isoformat()))
+
+    ganada = []
+    with app.app_context():
+        antes = mesas_del_host(ids['host'], ahora.date())
+        event.listen(db.engine, 'before_cursor_execute', reintento)
+        try:
+            resultados, nuevos = insertar_lote(ids['equipo'], lote, ahora)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', reintento)
+        db.session.commit()
+
+        assert ganada
+        assert resultados['tablet-1']['duplicado'] is True
+        assert resultados['tablet-1']['id_registro_hosteo'] is not None
+        assert 'duplicado' not in resultados['tablet-2']
+        assert [r.clave_idempotencia for r in nuevos] == ['tablet-2']
+        # Only the row this request inserted was counted
+        assert mesas_del_host(ids['host'], ahora.date()) == antes + 1
@@ -0,0 +1,34 @@
+"""Cache de bytecode de los templates."""
+import os
+
+import pytest
+from flask import Flask
+
+from plantillas import configurar_plantillas
+
+
+def app_con_bytecode(directorio):
+    app = Flask(__name__)
+    app.config.update(JINJA_BYTECODE_CACHE_DIR=directorio, FRAGMENT_CACHE_TTL=0, FRAGMENT_CACHE_MAX=1)
+    configurar_plantillas(app)
+    return app
+
+
+def test_sin_directorio_usa_el_privado_de_jinja():
+    cache = app_con_bytecode(None).jinja_env.bytecode_cache
+    assert f'-{os.getuid()}' in os.path.basename(cache.directory)
+    assert os.stat(cache.directory).st_mode & 0o777 == 0o700
+
+
+def test_directorio_nuevo_queda_privado(tmp_path):
+    directorio = tmp_path / 'jinja'
+    assert app_con_bytecode(str(directorio)).jinja_env.bytecode_cache.directory == str(directorio)
+    assert directorio.stat().st_mode & 0o077 == 0
+
+
+def test_directorio_que_otros_pueden_escribir_se_rechaza(tmp_path):
+    directorio = tmp_path / 'compartido'
+    directorio.mkdir()
+    directorio.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        app_con_bytecode(str(directorio))
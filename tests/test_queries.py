@@ -0,0 +1,37 @@
+"""Las vistas mandan el mismo número de sentencias con N o con 10·N registros."""
+import pytest
+
+from conftest import cliente_mesero, contar_sentencias, limpiar_caches, poblar
+
+N = 20
+
+RUTAS = [
+    '/equipo/{equipo}',
+    '/equipo/{equipo}?host_id={host}',
+    '/mesero/{mesero}',
+    '/mesero/{mesero}?fecha={ayer}',
+    '/reporte/{equipo}',
+    '/reporte/{equipo}?fecha={ayer}',
+    '/reporte/{equipo}?fecha_inicio={ayer}&fecha_fin={hoy}',
+    '/reporte/{equipo}/host/{host}',
+    '/reporte/{equipo}/host/{host}?fecha={ayer}',
+    '/reporte-total',
+    '/reporte-total?fecha={ayer}',
+    '/reporte-total?fecha_inicio={ayer}&fecha_fin={hoy}',
+]
+
+
+def sentencias(app, ids, ruta):
+    cliente = cliente_mesero(app, ids['mesero'])
+    limpiar_caches()
+    with contar_sentencias(app) as conteo:
+        respuesta = cliente.get(ruta.format(**ids))
+    assert respuesta.status_code == 200, respuesta.status_code
+    return conteo.total
+
+
+@pytest.mark.parametrize('ruta', RUTAS)
+def test_sentencias_no_crecen_con_los_registros(nueva_app, ruta):
+    chica, grande = nueva_app(), nueva_app()
+    ids_chica, ids_grande = poblar(chica, N), poblar(grande, 10 * N)
+    assert sentencias(chica, ids_chica, ruta) == sentencias(grande, ids_grande, ruta)
@@ -0,0 +1,45 @@
+"""Encabezados de cache de las páginas de reporte."""
+from conftest import limpiar_caches, poblar
+from models import db, RegistroDiarioHosteo, ResumenHostDiario, ResumenMeseroDiario
+
+
+def test_ultimo_dia_por_default_no_queda_en_cache(app):
+    ids = poblar(app, 20)
+    with app.app_context():
+        # Before today's first alta the latest day with data is yesterday
+        for modelo in (RegistroDiarioHosteo, ResumenHostDiario, ResumenMeseroDiario):
+            modelo.query.filter(modelo.fecha == ids['hoy']).delete()
+        db.session.commit()
+    limpiar_caches()
+    cliente = app.test_client()
+    rutas = ('/reporte-total', f'/reporte/{ids["equipo"]}', f'/reporte/{ids["equipo"]}/host/{ids["host"]}')
+
+    for ruta in rutas:
+        for url in (ruta, f'{ruta}?fecha=ayer'):
+            respuesta = cliente.get(url)
+            assert respuesta.status_code == 200
+            assert respuesta.cache_control.no_cache and respuesta.cache_control.max_age is None, url
+        fija = cliente.get(f'{ruta}?fecha={ids["ayer"]}')
+        assert fija.cache_control.max_age == app.config['REPORTE_MAX_AGE_PASADO']
+
+
+def test_en_vivo_sabe_la_fecha_de_la_pagina(app):
+    ids = poblar(app, 20)
+    cliente = app.test_client()
+    for url in ('/reporte-total', f'/reporte/{ids["equipo"]}', f'/equipo/{ids["equipo"]}'):
+        html = cliente.get(url).get_data(as_text=True)
+        assert f'const fechaPagina = "{ids["hoy"]}";' in html, url
+
+
+def test_parametros_ajenos_no_rompen_la_paginacion(app):
+    ids = poblar(app, 40)
+    app.config['REGISTROS_POR_PAGINA'] = 5
+    cliente = app.test_client()
+    ajenos = 'equipo_id=5&endpoint=x&mesero_id=3&_external=1&_anchor=y'
+    for ruta in ('/reporte-total', f'/reporte/{ids["equipo"]}', f'/reporte/{ids["equipo"]}/host/{ids["host"]}',
+                 f'/equipo/{ids["equipo"]}'):
+        respuesta = cliente.get(f'{ruta}?fecha={ids["hoy"]}&{ajenos}')
+        assert respuesta.status_code == 200, ruta
+        html = respuesta.get_data(as_text=True)
+        assert 'despues=' in html, ruta
+        assert 'endpoint=' not in html and 'http://' not in html and '#y' not in html, ruta
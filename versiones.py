@@ -0,0 +1,67 @@
+"""Versiones de datos por día para ETags y GET condicionales de los reportes.
+
+Cada escritura que cambia los registros de una fecha incrementa el contador de
+esa fecha en la misma transacción; un cambio en equipos, hosts o meseros
+incrementa el de 'catalogos'. Un reporte sólo depende de los contadores de sus
+fechas, así que leerlos basta para saber si la página del cliente sigue
+vigente sin correr ninguna de las consultas pesadas.
+"""
+from sqlalchemy import case, event, func, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, VersionDatos
+
+CATALOGOS = 'catalogos'
+_UPSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def clave_fecha(fecha):
+    return f'fecha:{fecha.isoformat()}'
+
+
+def marcar_fechas(fechas):
+    """Anota las fechas cuyos registros cambian en la transacción en curso"""
+    db.session.info.setdefault('versiones', set()).update(clave_fecha(f) for f in fechas)
+
+
+def version_reporte(desde, hasta):
+    """(catalogos, datos): contadores de las que depende un reporte de [desde, hasta]"""
+    en_rango = VersionDatos.clave.between(clave_fecha(desde), clave_fecha(hasta))
+    es_catalogo = VersionDatos.clave == CATALOGOS
+    fila = db.session.query(
+        func.coalesce(func.sum(case((es_catalogo, VersionDatos.version), else_=0)), 0),
+        # Counters only grow, so their sum changes whenever any day in the range does
+        func.coalesce(func.sum(case((en_rango, VersionDatos.version), else_=0)), 0),
+    ).filter(or_(es_catalogo, en_rango)).one()
+    return int(fila[0]), int(fila[1])
+
+
+def _incrementar(session, claves):
+    # Sorted so concurrent writers always lock the rows in the same order
+    claves = sorted(claves)
+    upsert = _UPSERT.get(session.get_bind().dialect.name)
+    if upsert is not None:
+        stmt = upsert(VersionDatos).values([{'clave': c, 'version': 1} for c in claves])
+        session.execute(stmt.on_conflict_do_update(index_elements=['clave'],
+                                                   set_={'version': stmt.excluded.version + VersionDatos.version}))
+        return
+    for clave in claves:
+        actualizadas = session.execute(update(VersionDatos).where(VersionDatos.clave == clave)
+                                       .values(version=VersionDatos.version + 1)).rowcount
+        if not actualizadas:
+            session.execute(insert(VersionDatos).values(clave=clave, version=1))
+
+
+@event.listens_for(Session, 'before_commit')
+def _incrementar_antes_de_commit(session):
+    # Flush first: the catalogos flag is set by catalogos' after_flush hook
+    session.flush()
+    claves = session.info.pop('versiones', set())
+    if session.info.get('invalidar_referencias'):
+        claves.add(CATALOGOS)
+    if claves:
+        _incrementar(session, claves)
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_versiones(session):
+    session.info.pop('versiones', None)